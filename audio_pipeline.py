@@ -0,0 +1,388 @@
+"""
+Strumieniowe przechwytywanie wypowiedzi z prostym VAD (energia + zero-crossing rate).
+
+Dźwięk czytamy ramkami 20–30 ms, trzymamy w prealokowanym buforze pierścieniowym
+i kończymy wypowiedź, gdy tylko po mowie pojawi się wystarczająco długa cisza
+(próg ciszy maleje wraz z długością wypowiedzi), zamiast czekać stałe pause_threshold.
+
+Źródłem może być sr.Microphone albo FileAudioSource (plik WAV) – ten sam interfejs
+(stream.read, SAMPLE_RATE, SAMPLE_WIDTH, CHUNK), więc pipeline działa też bez mikrofonu.
+"""
+
+import queue
+import threading
+import wave
+
+import numpy as np
+import speech_recognition as sr
+
+from instrumentation import log
+
+FRAME_MS = 20
+PRE_ROLL_MS = 300          # ile dźwięku sprzed początku mowy dołączamy do wypowiedzi
+MIN_SPEECH_MS = 120        # krótsze "wypowiedzi" traktujemy jako trzask
+END_SILENCE_START_MS = 700  # cisza kończąca krótką wypowiedź...
+END_SILENCE_MIN_MS = 300    # ...i długą (po END_SILENCE_RAMP_MS mowy)
+END_SILENCE_RAMP_MS = 1500
+MAX_UTTERANCE_SECONDS = 30  # limit wypowiedzi, gdy phrase_time_limit=None (jak w speech_recognition)
+
+
+class RingBuffer:
+    """Prealokowany bufor pierścieniowy próbek int16."""
+
+    def __init__(self, capacity):
+        self._data = np.zeros(capacity, dtype=np.int16)
+        self.capacity = capacity
+        self._end = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def clear(self):
+        self._end = 0
+        self._size = 0
+
+    def write(self, samples):
+        n = len(samples)
+        if n >= self.capacity:
+            self._data[:] = samples[-self.capacity:]
+            self._end = 0
+            self._size = self.capacity
+            return
+        first = min(n, self.capacity - self._end)
+        self._data[self._end:self._end + first] = samples[:first]
+        if first < n:
+            self._data[:n - first] = samples[first:]
+        self._end = (self._end + n) % self.capacity
+        self._size = min(self.capacity, self._size + n)
+
+    def read(self, count=None):
+        """Ostatnie `count` próbek (domyślnie wszystkie), w kolejności chronologicznej."""
+        count = self._size if count is None else min(count, self._size)
+        start = (self._end - count) % self.capacity
+        if start + count <= self.capacity:
+            return self._data[start:start + count].copy()
+        return np.concatenate((self._data[start:], self._data[:self._end]))
+
+
+class FrameVAD:
+    """
+    Decyzja mowa/cisza dla pojedynczej ramki.
+    Mowa = energia (RMS) wyraźnie nad adaptacyjnym poziomem szumu, a ZCR w zakresie typowym
+    dla głosu (szum szerokopasmowy ma wysoki ZCR). Bardzo głośne ramki przechodzą zawsze.
+    """
+
+    def __init__(self, energy_threshold=250, ratio=2.5, zcr_max=0.4):
+        self.min_energy = energy_threshold * 0.5
+        self.ratio = ratio
+        self.zcr_max = zcr_max
+        self.noise = energy_threshold / ratio
+
+    def threshold(self):
+        return max(self.min_energy, self.noise * self.ratio)
+
+    def is_speech(self, frame):
+        x = frame.astype(np.float32)
+        rms = float(np.sqrt(np.mean(x * x))) if len(x) else 0.0
+        signs = np.signbit(x)
+        zcr = float(np.count_nonzero(signs[1:] != signs[:-1])) / max(1, len(x) - 1)
+        thr = self.threshold()
+        speech = rms > thr * 2 or (rms > thr and zcr <= self.zcr_max)
+        if not speech:
+            # Poziom szumu śledzimy tylko na ramkach bez mowy
+            self.noise = 0.95 * self.noise + 0.05 * rms
+        return speech
+
+
+def end_silence_ms(speech_ms):
+    """Im dłużej ktoś mówi, tym krótsza cisza wystarcza, by uznać koniec wypowiedzi."""
+    ramp = min(1.0, speech_ms / END_SILENCE_RAMP_MS)
+    return END_SILENCE_START_MS - (END_SILENCE_START_MS - END_SILENCE_MIN_MS) * ramp
+
+
+def iter_frames(source, frame_ms=FRAME_MS):
+    """Czyta ze źródła i zwraca kolejne ramki int16 po `frame_ms` ms (do końca strumienia)."""
+    frame_len = int(source.SAMPLE_RATE * frame_ms / 1000)
+    pending = np.zeros(0, dtype=np.int16)
+    while True:
+        data = source.stream.read(source.CHUNK)
+        if not data:
+            return
+        pending = np.concatenate((pending, np.frombuffer(data, dtype=np.int16)))
+        n_full = len(pending) // frame_len
+        for i in range(n_full):
+            yield pending[i * frame_len:(i + 1) * frame_len]
+        pending = pending[n_full * frame_len:]
+
+
+def capture_utterance(source, energy_threshold=250, timeout=5, phrase_time_limit=5,
+                      frame_ms=FRAME_MS, frames=None, vad=None, on_frame=None):
+    """
+    Czeka na mowę (maks. `timeout` s), nagrywa wypowiedź i zwraca sr.AudioData,
+    gdy tylko po mowie pojawi się adaptacyjnie dobrana cisza.
+    Rzuca sr.WaitTimeoutError, jeśli mowa się nie pojawiła.
+    `frames` pozwala podać własny iterator ramek (np. ze wspólnej sesji audio).
+    `on_frame(samples)` dostaje na bieżąco dźwięk wypowiedzi (np. dla rozpoznawania strumieniowego).
+    phrase_time_limit=None oznacza limit MAX_UTTERANCE_SECONDS.
+    """
+    if source.SAMPLE_WIDTH != 2:
+        raise ValueError("capture_utterance obsługuje tylko 16-bitowe próbki")
+    phrase_time_limit = phrase_time_limit or MAX_UTTERANCE_SECONDS
+    sample_rate = source.SAMPLE_RATE
+    vad = vad or FrameVAD(energy_threshold)
+    frames = frames if frames is not None else iter_frames(source, frame_ms)
+
+    pre_roll = RingBuffer(int(sample_rate * PRE_ROLL_MS / 1000))
+    utterance = RingBuffer(int(sample_rate * (phrase_time_limit + PRE_ROLL_MS / 1000)))
+    waited_ms = 0.0
+    speech_ms = 0.0
+    silence_ms = 0.0
+    in_speech = False
+
+    for frame in frames:
+        ms = len(frame) * 1000.0 / sample_rate
+        speech = vad.is_speech(frame)
+        if not in_speech:
+            pre_roll.write(frame)
+            if speech:
+                in_speech = True
+                utterance.write(pre_roll.read())
+                if on_frame:
+                    on_frame(pre_roll.read())
+                speech_ms = ms
+                silence_ms = 0.0
+                continue
+            waited_ms += ms
+            if timeout and waited_ms >= timeout * 1000:
+                raise sr.WaitTimeoutError("Nie wykryto mowy (timeout).")
+            continue
+
+        utterance.write(frame)
+        if on_frame:
+            on_frame(frame)
+        if speech:
+            speech_ms += ms
+            silence_ms = 0.0
+        else:
+            silence_ms += ms
+            if silence_ms >= end_silence_ms(speech_ms):
+                if speech_ms < MIN_SPEECH_MS:
+                    # Krótki trzask – wracamy do czekania na mowę
+                    in_speech = False
+                    utterance.clear()
+                    pre_roll.clear()
+                    continue
+                break
+        if speech_ms + silence_ms >= phrase_time_limit * 1000:
+            break
+
+    if not in_speech:
+        raise sr.WaitTimeoutError("Nie wykryto mowy (koniec strumienia).")
+    return sr.AudioData(utterance.read().tobytes(), sample_rate, 2)
+
+
+# --------------------
+#  Wspólna sesja audio
+# --------------------
+class AudioSourceError(RuntimeError):
+    """Wątek czytający sesji audio przerwał się błędem (np. odłączony mikrofon)."""
+
+
+class FrameSubscription:
+    """
+    Kolejka ramek jednego odbiorcy sesji. Przy przepełnieniu wyrzucamy najstarsze ramki,
+    żeby wolny odbiorca nie blokował innych ani wątku czytającego.
+    Gdy sesja padnie, iteracja (po odebraniu zaległych ramek) rzuca AudioSourceError,
+    a nie kończy się po cichu jak przy zwykłym stop().
+    """
+
+    def __init__(self, session, max_frames):
+        self.session = session
+        self._queue = queue.Queue(maxsize=max_frames)
+        self.closed = False
+
+    def put(self, frame):
+        while True:
+            try:
+                self._queue.put_nowait(frame)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def close(self):
+        self.closed = True
+
+    def __iter__(self):
+        while not self.closed:
+            try:
+                frame = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                if not self.session.running:
+                    break
+                continue
+            yield frame
+        if self.session.error is not None:
+            raise AudioSourceError(f"Błąd odczytu audio: {self.session.error}") from self.session.error
+
+
+def _close_source(source):
+    try:
+        source.__exit__(None, None, None)
+    except Exception as e:
+        log.warning("AudioSession", "Błąd zamykania źródła audio: %s", e)
+
+
+class AudioSession:
+    """
+    Jedno, długo otwarte wejście audio (domyślnie sr.Microphone) współdzielone przez
+    nasłuch hotwordu i zapytania push-to-talk. Wątek czytający dzieli strumień na ramki
+    FRAME_MS i rozsyła je do wszystkich subskrybentów – bez ponownego otwierania urządzenia
+    i bez walki o mikrofon.
+    """
+
+    def __init__(self, source_factory=sr.Microphone, frame_ms=FRAME_MS):
+        self.source_factory = source_factory
+        self.frame_ms = frame_ms
+        self.source = None
+        self.running = False
+        self.error = None  # wyjątek, którym przerwał się wątek czytający
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._thread = None
+        # Stan bieżącego wątku czytającego: {"done": wyszedł z pętli, "close": ma sam zamknąć źródło}
+        self._reader_state = None
+
+    @property
+    def SAMPLE_RATE(self):
+        return self.source.SAMPLE_RATE
+
+    @property
+    def SAMPLE_WIDTH(self):
+        return self.source.SAMPLE_WIDTH
+
+    def start(self):
+        if self.running:
+            return self
+        self.source = self.source_factory()
+        self.source.__enter__()
+        self.running = True
+        self._reader_state = {"done": False, "close": False}
+        self._thread = threading.Thread(target=self._reader_loop, args=(self.source, self._reader_state), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        thread, state, source = self._thread, self._reader_state, self.source
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=1.0)
+        self._thread = None
+        with self._lock:
+            for sub in self._subscribers:
+                sub.close()
+            self._subscribers.clear()
+            if state is not None and not state["done"]:
+                # Wątek czytający wisi jeszcze w stream.read – zamknięcie strumienia pod nim byłoby
+                # użyciem po zamknięciu; zamknie źródło sam, gdy wyjdzie z pętli
+                state["close"] = True
+                source = None
+        if source is not None:
+            _close_source(source)
+
+    def subscribe(self, max_seconds=10):
+        """Nowy odbiorca ramek (bufor na `max_seconds` dźwięku)."""
+        sub = FrameSubscription(self, max(1, int(max_seconds * 1000 / self.frame_ms)))
+        with self._lock:
+            self._subscribers.append(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        sub.close()
+        with self._lock:
+            if sub in self._subscribers:
+                self._subscribers.remove(sub)
+
+    def _reader_loop(self, source, state):
+        try:
+            for frame in iter_frames(source, self.frame_ms):
+                if not self.running:
+                    break
+                with self._lock:
+                    subscribers = list(self._subscribers)
+                for sub in subscribers:
+                    sub.put(frame)
+        except Exception as e:
+            log.error("AudioSession", "Błąd odczytu audio: %s", e)
+            self.error = e
+        finally:
+            with self._lock:
+                if self._reader_state is state:
+                    # Nie gasimy sesji uruchomionej ponownie po stop(), gdy ten wątek jeszcze wisiał
+                    self.running = False
+                state["done"] = True
+                close = state["close"]
+            if close:
+                _close_source(source)
+
+    def capture_utterance(self, **kwargs):
+        """capture_utterance na ramkach z tej sesji (zamiast otwierać mikrofon)."""
+        sub = self.subscribe()
+        try:
+            return capture_utterance(self, frames=iter(sub), frame_ms=self.frame_ms, **kwargs)
+        finally:
+            self.unsubscribe(sub)
+
+    def ambient_rms(self, duration):
+        """Średni poziom (RMS) tła z `duration` sekund – do kalibracji progu energii."""
+        sub = self.subscribe(max_seconds=duration + 1)
+        values = []
+        needed = int(duration * 1000 / self.frame_ms)
+        try:
+            for frame in sub:
+                x = frame.astype(np.float32)
+                values.append(float(np.sqrt(np.mean(x * x))))
+                if len(values) >= needed:
+                    break
+        finally:
+            self.unsubscribe(sub)
+        return float(np.mean(values)) if values else 0.0
+
+
+class _WaveStream:
+    def __init__(self, wav):
+        self._wav = wav
+
+    def read(self, n_frames):
+        return self._wav.readframes(n_frames)
+
+
+class FileAudioSource:
+    """
+    Źródło dźwięku z pliku WAV (16-bit mono) o interfejsie jak sr.Microphone –
+    do testów i odtwarzania nagrań bez mikrofonu.
+    """
+
+    CHUNK = 1024
+
+    def __init__(self, path):
+        self.path = path
+        self.stream = None
+        self._wav = None
+
+    def __enter__(self):
+        self._wav = wave.open(self.path, "rb")
+        if self._wav.getnchannels() != 1:
+            self._wav.close()
+            raise ValueError("FileAudioSource obsługuje tylko pliki mono")
+        self.SAMPLE_RATE = self._wav.getframerate()
+        self.SAMPLE_WIDTH = self._wav.getsampwidth()
+        self.stream = _WaveStream(self._wav)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._wav.close()
+        self.stream = None
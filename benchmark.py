@@ -0,0 +1,407 @@
+"""
+Benchmarki wydajności: wyszukiwanie, operacje na bazie, config i odświeżanie listy.
+
+Na syntetycznych bazach profili (domyślnie 1k / 10k / 100k wpisów, opcjonalnie do 1M)
+mierzy opóźnienia p50/p99 i przepustowość, a wynik zapisuje do JSON, żeby porównywać przebiegi.
+
+Przykłady:
+    python benchmark.py
+    python benchmark.py --sizes 1000 1000000 --output wyniki.json
+    python benchmark.py --compare poprzednie.json
+
+Benchmark pracuje na plikach tymczasowych – nie rusza config.json ani baz profili
+(poza odczytem config.json przez search_entries, który czyta z niego korekty).
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+import database
+import instrumentation
+import search
+import search_index
+from config import ConfigStore, _read_config_file, DEFAULT_CONFIG
+from entry_list import EntryListModel, format_entry
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+SEARCH_QUERIES = 200
+CRUD_OPERATIONS = 500
+CONFIG_HIGHLIGHTS = [0, 1000, 10000, 100000]
+CONFIG_REPEATS = 20
+LIST_REFRESH_REPEATS = 10
+VISIBLE_ROWS = 40
+SEED = 1234
+
+# Słowa do syntetycznych opisów – typowe nazwy usług, kategorie i miejsca
+SERVICES = [
+    "Gmail", "Onet Poczta", "WP Poczta", "Interia", "Allegro", "OLX", "Facebook", "Instagram",
+    "Steam", "Epic Games", "Netflix", "Spotify", "PKO BP", "mBank", "ING Bank Śląski", "Pekao",
+    "Santander", "Orange", "Play", "Plus", "T-Mobile", "ZUS PUE", "ePUAP", "Profil Zaufany",
+    "Librus", "Vulcan", "Empik", "Ceneo", "InPost", "Poczta Polska", "Żabka", "Biedronka",
+    "Lidl Plus", "Uber", "Bolt", "PKP Intercity", "Jakdojade", "GitHub", "Discord", "Microsoft",
+]
+QUALIFIERS = [
+    "praca", "prywatne", "firma", "dom", "rodzina", "szkoła", "studia", "zapasowe", "stare",
+    "nowe", "główne", "testowe", "księgowość", "sklep", "serwis", "administrator", "klient",
+]
+PLACES = [
+    "Warszawa", "Kraków", "Łódź", "Wrocław", "Poznań", "Gdańsk", "Szczecin", "Bydgoszcz",
+    "Lublin", "Białystok", "Katowice", "Gdynia", "Częstochowa", "Radom", "Rzeszów", "Toruń",
+]
+NAMES = [
+    "jan", "anna", "piotr", "katarzyna", "tomasz", "magdalena", "paweł", "agnieszka",
+    "michał", "joanna", "krzysztof", "małgorzata", "łukasz", "zofia", "wojciech", "ewa",
+]
+
+
+# --------------------
+#  Dane syntetyczne
+# --------------------
+def make_description(rng):
+    parts = [rng.choice(SERVICES), rng.choice(QUALIFIERS)]
+    if rng.random() < 0.4:
+        parts.append(rng.choice(PLACES))
+    if rng.random() < 0.2:
+        parts.append(str(rng.randint(1, 99)))
+    return " ".join(parts)
+
+
+def make_login(rng):
+    name = rng.choice(NAMES)
+    return f"{name}.{rng.choice(NAMES)}{rng.randint(1, 9999)}@{rng.choice(['gmail.com', 'wp.pl', 'onet.pl', 'o2.pl'])}"
+
+
+def make_password(rng):
+    alphabet = "abcdefghijkmnopqrstuvwxyzABCDEFGHJKLMNPQRSTUVWXYZ23456789!@#$%"
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(10, 20)))
+
+
+def iter_synthetic_entries(count, seed=SEED):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield make_login(rng), make_password(rng), make_description(rng)
+
+
+def make_query(rng):
+    """Zapytanie jak z rozpoznawania mowy: fragment opisu, czasem z literówką."""
+    words = make_description(rng).lower().split()
+    query = " ".join(words[:rng.randint(1, min(3, len(words)))])
+    if len(query) > 4 and rng.random() < 0.3:
+        i = rng.randrange(len(query) - 1)
+        query = query[:i] + query[i + 1] + query[i] + query[i + 2:]
+    return query
+
+
+def create_profile_db(directory, size):
+    """Tworzy bazę profilu z `size` syntetycznymi wpisami. Zwraca (ścieżka, sekundy)."""
+    path = os.path.join(directory, f"bench_{size}.db")
+    database.init_db(path)
+    start = time.perf_counter()
+    database.add_entries_bulk(iter_synthetic_entries(size), chunk_size=20000, path=path)
+    return path, time.perf_counter() - start
+
+
+# --------------------
+#  Pomiary
+# --------------------
+def latency_stats(samples):
+    """p50/p99/średnia/max w milisekundach z listy czasów w sekundach."""
+    ms = sorted(s * 1000.0 for s in samples)
+    if not ms:
+        return {}
+
+    def percentile(p):
+        return ms[min(len(ms) - 1, int(round(p / 100.0 * (len(ms) - 1))))]
+
+    return {
+        "count": len(ms),
+        "p50_ms": round(percentile(50), 4),
+        "p99_ms": round(percentile(99), 4),
+        "mean_ms": round(statistics.fmean(ms), 4),
+        "max_ms": round(ms[-1], 4),
+    }
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def throughput(count, seconds):
+    return round(count / seconds, 1) if seconds > 0 else None
+
+
+def bench_search(db_path, queries):
+    """search_entries (search.py) – zimny start indeksu i p50/p99 zapytań na ciepłym indeksie."""
+    database.set_db_path(db_path)
+    search_index.invalidate(db_path)
+    # Logi [DEBUG] idą do /dev/null – formatowanie zostaje w pomiarze, wypisywanie na konsolę nie
+    with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+        cold, _ = timed(search.search_entries, queries[0])
+        samples = [timed(search.search_entries, query)[0] for query in queries]
+        batch = [queries[i:i + 5] for i in range(0, min(len(queries), 50), 5)]
+        batch_samples = [timed(search.search_entries_batch, keywords)[0] for keywords in batch]
+    result = {"cold_first_query_ms": round(cold * 1000.0, 3)}
+    result.update(latency_stats(samples))
+    result["batch_5_hypotheses"] = latency_stats(batch_samples)
+    return result
+
+
+def bench_crud(db_path, operations, seed=SEED):
+    """Przepustowość add/get/update/delete (po jednym wpisie na transakcję) i odczytu całej tabeli."""
+    database.set_db_path(db_path)
+    rng = random.Random(seed + 1)
+    entries = list(iter_synthetic_entries(operations, seed=seed + 2))
+
+    ids = []
+    add_samples = []
+    for login, haslo, opis in entries:
+        t, entry_id = timed(database.add_entry, login, haslo, opis)
+        add_samples.append(t)
+        ids.append(entry_id)
+
+    get_samples = [timed(database.get_entry_by_id, entry_id)[0] for entry_id in ids]
+
+    update_samples = []
+    for entry_id in ids:
+        update_samples.append(timed(database.update_entry, entry_id, make_login(rng), make_password(rng), make_description(rng))[0])
+
+    delete_samples = [timed(database.delete_entry, entry_id)[0] for entry_id in ids]
+
+    read_all, rows = timed(database.get_all_entries, db_path)
+    stream_start = time.perf_counter()
+    streamed = sum(1 for _ in database.iter_entries(db_path))
+    stream_seconds = time.perf_counter() - stream_start
+
+    result = {}
+    for name, samples in (("add", add_samples), ("get", get_samples),
+                          ("update", update_samples), ("delete", delete_samples)):
+        stats = latency_stats(samples)
+        stats["ops_per_s"] = throughput(len(samples), sum(samples))
+        result[name] = stats
+    result["get_all_entries"] = {"rows": len(rows), "ms": round(read_all * 1000.0, 3),
+                                 "rows_per_s": throughput(len(rows), read_all)}
+    result["iter_entries"] = {"rows": streamed, "ms": round(stream_seconds * 1000.0, 3),
+                              "rows_per_s": throughput(streamed, stream_seconds)}
+    return result
+
+
+def bench_bulk_insert(directory, size):
+    path = os.path.join(directory, f"bulk_{size}.db")
+    database.init_db(path)
+    seconds, count = timed(database.add_entries_bulk, iter_synthetic_entries(size, seed=SEED + 3), path=path)
+    return {"rows": count, "ms": round(seconds * 1000.0, 3), "rows_per_s": throughput(count, seconds)}
+
+
+def bench_list_refresh(db_path, repeats=LIST_REFRESH_REPEATS):
+    """
+    Odświeżenie listy jak w gui.update_entries_list, bez okna: wiersze z indeksu posortowane
+    po id -> EntryListModel.set_rows -> teksty widocznego okna. Jeśli jest dostępny ekran,
+    mierzymy dodatkowo prawdziwy VirtualEntryList w ukrytym oknie Tk.
+    """
+    index = search_index.get_index(db_path)
+    colors = {entry_id: "green" for entry_id in index.ids[:1000]}
+    model = EntryListModel()
+
+    def refresh_model():
+        with index.lock:
+            entries = [index.rows[entry_id] for entry_id in sorted(index.ids)]
+        model.set_rows(entries, colors)
+        return [model.text_at(pos) for pos in range(min(VISIBLE_ROWS, len(model)))]
+
+    result = {"model": latency_stats([timed(refresh_model)[0] for _ in range(repeats)])}
+    result["format_all_rows_ms"] = round(timed(lambda: [format_entry(row) for row in index.rows.values()])[0] * 1000.0, 3)
+
+    try:
+        import tkinter as tk
+        from entry_list import VirtualEntryList
+        root = tk.Tk()
+    except Exception as e:
+        result["tk"] = {"skipped": f"brak Tk/ekranu: {e}"}
+        return result
+    try:
+        root.withdraw()
+        widget = VirtualEntryList(root, width=50, height=VISIBLE_ROWS)
+        widget.grid()
+
+        def refresh_widget():
+            with index.lock:
+                entries = [index.rows[entry_id] for entry_id in sorted(index.ids)]
+            widget.set_rows(entries, colors)
+            root.update_idletasks()
+
+        result["tk"] = latency_stats([timed(refresh_widget)[0] for _ in range(repeats)])
+    finally:
+        root.destroy()
+    return result
+
+
+def bench_config(directory, highlight_counts=CONFIG_HIGHLIGHTS, repeats=CONFIG_REPEATS):
+    """Koszt odczytu/zapisu configu w zależności od liczby highlight_states."""
+    results = {}
+    for count in highlight_counts:
+        path = os.path.join(directory, f"config_{count}.json")
+        data = json.loads(json.dumps(DEFAULT_CONFIG))
+        data["highlight_states"] = {str(i): "green" for i in range(count)}
+        store = ConfigStore(path, debounce=3600)
+
+        write_samples = []
+        for i in range(repeats):
+            data["highlight_states"][str(i)] = "blue" if i % 2 else "green"
+            start = time.perf_counter()
+            store.save(data)
+            store.flush()
+            write_samples.append(time.perf_counter() - start)
+
+        read_samples = [timed(_read_config_file, path)[0] for _ in range(repeats)]
+        cached_samples = [timed(store.get)[0] for _ in range(repeats)]
+        save_samples = []
+        for _ in range(repeats):
+            t, _ = timed(store.save, data)
+            save_samples.append(t)
+        store.flush()
+
+        results[str(count)] = {
+            "file_kb": round(os.path.getsize(path) / 1024.0, 1),
+            "save_config_debounced": latency_stats(save_samples),
+            "save_and_flush": latency_stats(write_samples),
+            "load_from_disk": latency_stats(read_samples),
+            "load_config_cached": latency_stats(cached_samples),
+        }
+    return results
+
+
+# --------------------
+#  Uruchomienie
+# --------------------
+def run(sizes, queries_per_size=SEARCH_QUERIES, crud_ops=CRUD_OPERATIONS, keep_dir=None):
+    directory = keep_dir or tempfile.mkdtemp(prefix="accoundbinder-bench-")
+    os.makedirs(directory, exist_ok=True)
+    previous_db_path = database.DB_PATH
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "sqlite": sqlite3.sqlite_version,
+            "sizes": sizes,
+            "seed": SEED,
+        },
+        "sizes": {},
+    }
+    try:
+        for size in sizes:
+            print(f"[benchmark] Profil {size} wpisów...")
+            db_path, build_seconds = create_profile_db(directory, size)
+            rng = random.Random(SEED + size)
+            queries = [make_query(rng) for _ in range(queries_per_size)]
+
+            entry = {
+                "build": {"rows": size, "ms": round(build_seconds * 1000.0, 3),
+                          "rows_per_s": throughput(size, build_seconds)},
+            }
+            search_index.invalidate(db_path)
+            load_seconds, _ = timed(search_index.get_index, db_path)
+            entry["index_load_ms"] = round(load_seconds * 1000.0, 3)
+            entry["search_entries"] = bench_search(db_path, queries)
+            entry["crud"] = bench_crud(db_path, min(crud_ops, size))
+            entry["list_refresh"] = bench_list_refresh(db_path)
+            report["sizes"][str(size)] = entry
+            print(f"[benchmark] Profil {size}: {json.dumps(summary_line(entry), ensure_ascii=False)}")
+
+            search_index.invalidate(db_path)
+            database.close_all_connections()
+
+        bulk_size = max(sizes)
+        print(f"[benchmark] Import masowy {bulk_size} wpisów...")
+        report["bulk_insert"] = bench_bulk_insert(directory, bulk_size)
+        print("[benchmark] Config...")
+        report["config"] = bench_config(directory)
+        # Histogramy spanów zebrane przy okazji (search, db, index) – wszystkie rozmiary razem
+        report["spans"] = instrumentation.snapshot()
+    finally:
+        database.close_all_connections()
+        if previous_db_path:
+            database.set_db_path(previous_db_path)
+        if keep_dir is None:
+            shutil.rmtree(directory, ignore_errors=True)
+    return report
+
+
+def summary_line(entry):
+    search = entry.get("search_entries", {})
+    crud = entry.get("crud", {})
+    return {
+        "search_p50_ms": search.get("p50_ms"),
+        "search_p99_ms": search.get("p99_ms"),
+        "add_ops_per_s": crud.get("add", {}).get("ops_per_s"),
+        "list_refresh_p50_ms": entry.get("list_refresh", {}).get("model", {}).get("p50_ms"),
+    }
+
+
+def flatten(data, prefix=""):
+    """{"a": {"b": 1}} -> {"a.b": 1} – tylko wartości liczbowe."""
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(old_report, new_report, threshold=0.10):
+    """Wypisuje metryki opóźnień (_ms), które zmieniły się o więcej niż `threshold`."""
+    old = flatten({k: v for k, v in old_report.items() if k != "meta"})
+    new = flatten({k: v for k, v in new_report.items() if k != "meta"})
+    changes = []
+    for name in sorted(set(old) & set(new)):
+        if not name.endswith("_ms") or not old[name]:
+            continue
+        ratio = new[name] / old[name]
+        if abs(ratio - 1.0) >= threshold:
+            changes.append((name, old[name], new[name], ratio))
+    for name, before, after, ratio in changes:
+        mark = "WOLNIEJ" if ratio > 1 else "szybciej"
+        print(f"{mark:9} {name}: {before:.3f} -> {after:.3f} ms (x{ratio:.2f})")
+    if not changes:
+        print(f"Brak zmian opóźnień powyżej {threshold:.0%}.")
+    return changes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AccoundBinder – benchmarki wydajności")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="Rozmiary syntetycznych profili (liczba wpisów)")
+    parser.add_argument("--queries", type=int, default=SEARCH_QUERIES, help="Liczba zapytań na profil")
+    parser.add_argument("--crud-ops", type=int, default=CRUD_OPERATIONS, help="Liczba operacji CRUD na profil")
+    parser.add_argument("--output", default="benchmark_results.json", help="Plik wynikowy JSON")
+    parser.add_argument("--compare", help="Poprzedni plik wynikowy do porównania")
+    parser.add_argument("--keep-dir", help="Katalog na bazy testowe (nie jest usuwany)")
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes, queries_per_size=args.queries, crud_ops=args.crud_ops, keep_dir=args.keep_dir)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"[benchmark] Zapisano wyniki do {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(json.load(f), report)
+    return report
+
+
+if __name__ == "__main__":
+    main()
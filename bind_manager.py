@@ -0,0 +1,155 @@
+"""
+Kolejka uzbrojonych wpisów (login/hasło) obsługiwana hookami tylko na dwóch klawiszach.
+
+Zamiast hook_key/unhook_key przy każdym wyborze wpisu, BindManager zakłada hook_key
+(z blokowaniem) na klawisz loginu i hasła raz – przy starcie i przy zmianie klawiszy
+(set_keys). Pozostałe klawisze w ogóle nie przechodzą przez nasz kod. W hooku:
+- klawisz loginu  -> wpisuje login kolejnego uzbrojonego wpisu,
+- klawisz hasła   -> wpisuje hasło kolejnego uzbrojonego wpisu,
+- gdy kolejka jest pusta, klawisz przechodzi bez zmian.
+Loginy i hasła mają osobne kolejki, więc przy kilku kontach wystarczy naciskać
+na przemian login / hasło – każde naciśnięcie bierze następny wpis. Naciśnięcie w trakcie
+wpisywania trafia do kolejki injektora (wpisze się po bieżącym), a nie do okna.
+"""
+
+import threading
+from collections import deque
+
+from instrumentation import log
+
+LOGIN = "login"
+PASSWORD = "password"
+
+
+class BindManager:
+    """
+    `submit(text, label, entry_id)` – funkcja wpisująca (np. przez injector),
+    `on_change(armed_count)` – powiadomienie o zmianie liczby uzbrojonych wpisów (wątek hooka lub GUI),
+    `is_injected(key_name)` – True, gdy zdarzenie to znak wpisywany właśnie przez injector
+    (np. "1" w haśle przy klawiszu loginu "1"); takie zdarzenia przechodzą bez zmian
+    i nie zużywają kolejnych wpisów.
+    """
+
+    def __init__(self, submit, on_change=None, is_injected=None, keyboard_module=None):
+        self.submit = submit
+        self.on_change = on_change
+        self.is_injected = is_injected
+        self._keyboard = keyboard_module
+        self._lock = threading.Lock()
+        self._queues = {LOGIN: deque(), PASSWORD: deque()}
+        self._actions = {}
+        self._pressed = set()
+        self._hooks = None
+
+    # --- hook ---
+
+    def start(self):
+        """Zakłada hooki (z blokowaniem) tylko na klawisze loginu i hasła."""
+        if self._hooks is not None:
+            return self
+        if self._keyboard is None:
+            import keyboard
+            self._keyboard = keyboard
+        self._hooks = []
+        self._hook_keys()
+        return self
+
+    def stop(self):
+        if self._hooks is not None:
+            self._unhook_keys()
+            self._hooks = None
+
+    def set_keys(self, login_key, password_key):
+        with self._lock:
+            self._actions = {login_key.lower(): LOGIN, password_key.lower(): PASSWORD}
+            self._pressed.clear()
+        if self._hooks is not None:
+            self._unhook_keys()
+            self._hook_keys()
+
+    def _hook_keys(self):
+        for name in self._actions:
+            # Osobny callback na klawisz: keyboard trzyma hooki w słowniku po callbacku, więc ten sam
+            # self._on_event dla dwóch klawiszy sprawiłby, że drugi unhook_key nie odblokuje klawisza
+            callback = lambda event: self._on_event(event)
+            try:
+                self._hooks.append(self._keyboard.hook_key(name, callback, suppress=True))
+            except ValueError as e:
+                # Np. przycisk myszy albo nazwa nieznana bibliotece keyboard
+                log.warning("binds", "Nie można podpiąć klawisza '%s': %s", name, e)
+
+    def _unhook_keys(self):
+        hooks, self._hooks = self._hooks, []
+        for hook in hooks:
+            self._keyboard.unhook_key(hook)
+
+    def _on_event(self, event):
+        """Callback hooka. Zwraca False, gdy klawisz ma zostać zablokowany."""
+        name = (event.name or "").lower()
+        if self.is_injected is not None and self.is_injected(name):
+            return True
+        action = self._actions.get(name)
+        if action is None:
+            return True
+        with self._lock:
+            queue = self._queues[action]
+            if event.event_type == "up":
+                if name in self._pressed:
+                    self._pressed.discard(name)
+                    return False
+                return True
+            if name in self._pressed:
+                # Autorepeat trzymanego klawisza – nie zużywamy kolejnych wpisów
+                return False
+            if not queue:
+                return True
+            self._pressed.add(name)
+            entry_id, text = queue.popleft()
+            armed = self._armed_count()
+        # Hook tylko zleca wpisanie i od razu wraca; w trakcie innego wpisywania zadanie czeka w kolejce injektora
+        self.submit(text, action, entry_id)
+        self._notify(armed)
+        return False
+
+    # --- kolejka ---
+
+    def arm(self, entry_id, login, haslo):
+        """Dopisuje wpis na koniec kolejki (login i hasło)."""
+        with self._lock:
+            self._queues[LOGIN].append((entry_id, login))
+            self._queues[PASSWORD].append((entry_id, haslo))
+            armed = self._armed_count()
+        self._notify(armed)
+
+    def disarm(self, entry_id):
+        """Usuwa niezużyte login/hasło danego wpisu z kolejek."""
+        with self._lock:
+            for action, queue in self._queues.items():
+                self._queues[action] = deque(item for item in queue if item[0] != entry_id)
+            armed = self._armed_count()
+        self._notify(armed)
+
+    def clear(self):
+        with self._lock:
+            for queue in self._queues.values():
+                queue.clear()
+        self._notify(0)
+
+    def armed_ids(self):
+        """ID wpisów, które mają jeszcze niewpisany login lub hasło (w kolejności uzbrojenia)."""
+        with self._lock:
+            return self._armed_ids()
+
+    def _longest_queue(self):
+        # Obie kolejki to końcówki tej samej kolejności uzbrojenia – dłuższa zawiera wszystkie wpisy
+        return max(self._queues.values(), key=len)
+
+    def _armed_ids(self):
+        return [entry_id for entry_id, _ in self._longest_queue()]
+
+    def _armed_count(self):
+        return len(self._longest_queue())
+
+    def _notify(self, armed):
+        if self.on_change:
+            self.on_change(armed)
@@ -0,0 +1,120 @@
+"""
+Masowy import / eksport wpisów profilu (CSV lub JSONL).
+Oba kierunki działają strumieniowo i raportują prędkość (wiersze/s).
+"""
+
+import csv
+import json
+import os
+import time
+
+import database
+
+FIELDS = ("login", "haslo", "opis")
+REPORT_EVERY_SECONDS = 1.0
+
+
+def detect_format(path, fmt=None):
+    """Format z parametru albo z rozszerzenia pliku (.csv / .jsonl)."""
+    if fmt:
+        return fmt.lower()
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".jsonl", ".ndjson"):
+        return "jsonl"
+    return "csv"
+
+
+def _read_csv(f):
+    reader = csv.reader(f)
+    header = next(reader, None)
+    if header is None:
+        return
+    lowered = [h.strip().lower() for h in header]
+    if all(field in lowered for field in FIELDS):
+        positions = [lowered.index(field) for field in FIELDS]
+    else:
+        # Brak nagłówka – pierwszy wiersz to już dane w kolejności login, haslo, opis
+        positions = [0, 1, 2]
+        if len(header) >= 3:
+            yield tuple(header[p] for p in positions)
+    for row in reader:
+        if len(row) > max(positions):
+            yield tuple(row[p] for p in positions)
+
+
+def _read_jsonl(f):
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+        item = json.loads(line)
+        yield tuple(str(item[field]) for field in FIELDS)
+
+
+def iter_file_entries(path, fmt=None):
+    """Strumieniowo czyta krotki (login, haslo, opis) z pliku CSV/JSONL."""
+    fmt = detect_format(path, fmt)
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if fmt == "jsonl":
+            yield from _read_jsonl(f)
+        else:
+            yield from _read_csv(f)
+
+
+class RateReporter:
+    """Wypisuje postęp i prędkość operacji co REPORT_EVERY_SECONDS."""
+
+    def __init__(self, label):
+        self.label = label
+        self.start = time.perf_counter()
+        self.last_report = self.start
+
+    def update(self, count, force=False):
+        now = time.perf_counter()
+        if force or now - self.last_report >= REPORT_EVERY_SECONDS:
+            self.last_report = now
+            elapsed = max(now - self.start, 1e-9)
+            print(f"[{self.label}] {count} wierszy, {count / elapsed:.0f} wierszy/s")
+
+    def finish(self, count):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        print(f"[{self.label}] Zakończono: {count} wierszy w {elapsed:.2f} s ({count / elapsed:.0f} wierszy/s)")
+        return count / elapsed
+
+
+def import_file(path, db_path, fmt=None, chunk_size=database.BULK_CHUNK_SIZE):
+    """Importuje plik do bazy `db_path`. Zwraca (liczba_wierszy, wiersze_na_sekunde)."""
+    database.init_db(db_path)
+    reporter = RateReporter("import")
+    count = database.add_entries_bulk(
+        iter_file_entries(path, fmt),
+        chunk_size=chunk_size,
+        path=db_path,
+        on_chunk=reporter.update
+    )
+    return count, reporter.finish(count)
+
+
+def export_file(path, db_path, fmt=None):
+    """Eksportuje wszystkie wpisy z bazy `db_path` do pliku. Zwraca (liczba_wierszy, wiersze_na_sekunde)."""
+    fmt = detect_format(path, fmt)
+    database.init_db(db_path)
+    reporter = RateReporter("export")
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        if fmt == "jsonl":
+            for row in database.iter_entries(db_path):
+                f.write(json.dumps(dict(zip(FIELDS, row[1:4])), ensure_ascii=False))
+                f.write("\n")
+                count += 1
+                if count % 1000 == 0:
+                    reporter.update(count)
+        else:
+            writer = csv.writer(f)
+            writer.writerow(FIELDS)
+            for row in database.iter_entries(db_path):
+                writer.writerow(row[1:4])
+                count += 1
+                if count % 1000 == 0:
+                    reporter.update(count)
+    return count, reporter.finish(count)
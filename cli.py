@@ -0,0 +1,129 @@
+"""
+Narzędzia wiersza poleceń (bez GUI).
+
+Przykłady:
+    python cli.py import konta.csv --profile Default
+    python cli.py export konta.jsonl --profile Praca
+    python cli.py serve --profiles Default Praca
+    python cli.py search allegro --all-profiles
+    python cli.py loadtest --clients 16 --requests 200 allegro gmail bank
+"""
+
+import argparse
+import json
+import sys
+
+from config import load_config, profile_db_path
+import database
+
+
+def _resolve_profile(app_state, profile_name):
+    profile_name = profile_name or app_state["current_profile"]
+    if profile_name not in app_state["profiles"]:
+        print(f"Profil '{profile_name}' nie istnieje!")
+        sys.exit(1)
+    return profile_name, profile_db_path(app_state, profile_name)
+
+
+def cmd_import(args):
+    import bulk
+    app_state = load_config()
+    profile_name, db_path = _resolve_profile(app_state, args.profile)
+    print(f"Import '{args.file}' do profilu '{profile_name}' ({db_path})")
+    bulk.import_file(args.file, db_path, fmt=args.format, chunk_size=args.chunk_size)
+
+
+def cmd_export(args):
+    import bulk
+    app_state = load_config()
+    profile_name, db_path = _resolve_profile(app_state, args.profile)
+    print(f"Eksport profilu '{profile_name}' ({db_path}) do '{args.file}'")
+    bulk.export_file(args.file, db_path, fmt=args.format)
+
+
+def cmd_serve(args):
+    import search_server
+    search_server.serve(port=args.port, profiles=args.profiles)
+
+
+def cmd_search(args):
+    import search_server
+    params = {"profile": args.profile, "all_profiles": args.all_profiles, "limit": args.limit}
+    try:
+        with search_server.SearchClient() as client:
+            results = client.search(args.query, **params)
+    except (ConnectionError, OSError):
+        # Serwer nie działa – szukamy lokalnie (indeks budowany w tym procesie)
+        try:
+            results = search_server.SearchEngine().search(args.query, **params)
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
+    except RuntimeError as e:
+        print(e)
+        sys.exit(1)
+    for hit in results:
+        print(json.dumps(hit, ensure_ascii=False))
+
+
+def cmd_loadtest(args):
+    import search_server
+    try:
+        with search_server.SearchClient() as client:
+            client.request("ping")
+        result = search_server.load_test(args.queries, clients=args.clients, requests_per_client=args.requests)
+    except (ConnectionError, OSError) as e:
+        print(f"Nie można połączyć się z serwerem: {e}")
+        sys.exit(1)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="AccoundBinder – operacje bez GUI")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_import = sub.add_parser("import", help="Masowy import wpisów z CSV/JSONL")
+    p_import.add_argument("file", help="Plik wejściowy (.csv lub .jsonl)")
+    p_import.add_argument("--profile", help="Nazwa profilu (domyślnie aktualny)")
+    p_import.add_argument("--format", choices=["csv", "jsonl"], help="Wymuszenie formatu pliku")
+    p_import.add_argument("--chunk-size", type=int, default=database.BULK_CHUNK_SIZE,
+                          help="Ile wierszy na jedną transakcję")
+    p_import.set_defaults(func=cmd_import)
+
+    p_export = sub.add_parser("export", help="Eksport wszystkich wpisów do CSV/JSONL")
+    p_export.add_argument("file", help="Plik wyjściowy (.csv lub .jsonl)")
+    p_export.add_argument("--profile", help="Nazwa profilu (domyślnie aktualny)")
+    p_export.add_argument("--format", choices=["csv", "jsonl"], help="Wymuszenie formatu pliku")
+    p_export.set_defaults(func=cmd_export)
+
+    p_serve = sub.add_parser("serve", help="Serwer wyszukiwania bez GUI (127.0.0.1, JSON lines)")
+    p_serve.add_argument("--port", type=int, default=0, help="Port (domyślnie wolny, zapisany w search_server.json)")
+    p_serve.add_argument("--profiles", nargs="*", help="Profile, których indeksy ładujemy od razu")
+    p_serve.set_defaults(func=cmd_serve)
+
+    p_search = sub.add_parser("search", help="Wyszukiwanie (przez serwer, jeśli działa)")
+    p_search.add_argument("query", help="Szukana fraza")
+    p_search.add_argument("--profile", help="Nazwa profilu (domyślnie aktualny)")
+    p_search.add_argument("--all-profiles", action="store_true", help="Szukaj we wszystkich profilach")
+    p_search.add_argument("--limit", type=int, default=10, help="Maksymalna liczba wyników")
+    p_search.set_defaults(func=cmd_search)
+
+    p_load = sub.add_parser("loadtest", help="Test obciążenia działającego serwera")
+    p_load.add_argument("queries", nargs="+", help="Zapytania (używane po kolei)")
+    p_load.add_argument("--clients", type=int, default=8, help="Liczba równoległych klientów")
+    p_load.add_argument("--requests", type=int, default=100, help="Zapytań na klienta")
+    p_load.set_defaults(func=cmd_loadtest)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        args.func(args)
+    finally:
+        database.close_all_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,11 @@
 import os
 import sys
 import json
+import copy
+import atexit
+import tempfile
+import threading
+import time
 
 # ---------------------
 #  USTALENIE ŚCIEŻKI GŁÓWNEJ
@@ -32,38 +37,192 @@ DEFAULT_CONFIG = {
     "window_geometry": "800x600+100+100",
     "learning_data": {},
     "hotword": "altbind",
-    "hotword_samples": []
+    "hotword_samples": [],
+    "hotword_sample_files": [],
+    "speech_backend": "google",
+    "vosk_model_path": "",
+    "typing_mode": "type",
+    "typing_profile": "instant",
+    "log_level": "INFO",
+    "search_all_profiles": False,
+    "profile_cache_size": 4,
+    "profile_cache_mb": 0,
+    "recent_profiles": [],
+    "search_server": False
 }
 
+# Ile sekund czekamy na kolejne zmiany, zanim zapiszemy plik
+SAVE_DEBOUNCE_SECONDS = 0.5
+# Ile razy próbujemy skopiować słownik, który inny wątek właśnie zmienia
+SNAPSHOT_ATTEMPTS = 5
 
-def load_config():
+
+def _read_config_file(path):
     """
     Wczytuje konfigurację z pliku JSON.
     Jeśli plik nie istnieje lub wystąpi błąd, zwraca domyślny słownik.
     """
-    if not os.path.exists(config_path):
-        return DEFAULT_CONFIG.copy()
+    if not os.path.exists(path):
+        return copy.deepcopy(DEFAULT_CONFIG)
 
     try:
-        with open(config_path, "r", encoding="utf-8") as f:
+        with open(path, "r", encoding="utf-8") as f:
             data = json.load(f)
     except:
         # Błąd przy wczytywaniu pliku config, zwracamy domyślne wartości
-        return DEFAULT_CONFIG.copy()
+        return copy.deepcopy(DEFAULT_CONFIG)
 
     # Uzupełniamy brakujące klucze wartościami z DEFAULT_CONFIG
     for key, value in DEFAULT_CONFIG.items():
         if key not in data:
-            data[key] = value
+            data[key] = copy.deepcopy(value)
     # ... oraz jeśli dany klucz jest słownikiem, też uzupełniamy wewnętrzne braki (np. profiles).
     # W tym przykładzie wystarczy nam jednak zewnętrzna pętla.
 
     return data
 
 
+class ConfigStore:
+    """
+    Wspólna dla całego procesu konfiguracja trzymana w pamięci.
+
+    - get() wczytuje plik raz, a potem zwraca ten sam słownik; plik czytamy ponownie
+      tylko wtedy, gdy zmieni się jego mtime/rozmiar (np. edycja z zewnątrz).
+    - save() nie pisze od razu – odkłada zapis o SAVE_DEBOUNCE_SECONDS, więc seria zmian
+      (np. kilka podświetleń pod rząd) kończy się jednym, atomowym zapisem (plik tymczasowy + rename).
+    - flush() wymusza zaległy zapis (przy zamykaniu aplikacji).
+
+    Wątki GUI, mowy i write_behind zmieniają słownik bez blokady store'a, więc do pliku
+    zapisujemy kopię (deepcopy); gdy kopia się nie uda (słownik zmieniany w tej chwili),
+    zapis jest ponawiany po kolejnym SAVE_DEBOUNCE_SECONDS zamiast przepadać.
+    """
+
+    def __init__(self, path, debounce=SAVE_DEBOUNCE_SECONDS):
+        self.path = path
+        self.debounce = debounce
+        self._lock = threading.RLock()
+        self._data = None
+        self._signature = None
+        self._dirty = False
+        self._timer = None
+
+    def _file_signature(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def get(self):
+        with self._lock:
+            if self._dirty and self._data is not None:
+                # Mamy niezapisane zmiany – to one są aktualne
+                return self._data
+            signature = self._file_signature()
+            if self._data is None or signature != self._signature:
+                fresh = _read_config_file(self.path)
+                if self._data is None:
+                    self._data = fresh
+                else:
+                    # Podmieniamy zawartość w miejscu, żeby trzymane referencje (app_state) widziały zmiany
+                    self._data.clear()
+                    self._data.update(fresh)
+                self._signature = signature
+            return self._data
+
+    def save(self, config_data):
+        with self._lock:
+            if self._data is None:
+                self._data = config_data
+            elif config_data is not self._data:
+                self._data.clear()
+                self._data.update(config_data)
+            self._dirty = True
+            self._schedule()
+
+    def _schedule(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(self.debounce, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _snapshot(self):
+        """Głęboka kopia danych do zapisu albo None, jeśli słownik ciągle zmienia się pod ręką."""
+        for _ in range(SNAPSHOT_ATTEMPTS):
+            try:
+                return copy.deepcopy(self._data)
+            except RuntimeError:
+                # "dictionary changed size during iteration" – inny wątek właśnie coś zmienia
+                time.sleep(0.001)
+        return None
+
+    def flush(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+            snapshot = self._snapshot()
+            if snapshot is None:
+                self._schedule()
+                return
+            self._write_atomic(snapshot)
+            self._dirty = False
+            self._signature = self._file_signature()
+
+    def _write_atomic(self, config_data):
+        directory = os.path.dirname(self.path) or "."
+        fd, tmp_path = tempfile.mkstemp(prefix=".config-", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(config_data, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+
+config_store = ConfigStore(config_path)
+atexit.register(config_store.flush)
+
+
+def load_config():
+    """
+    Zwraca konfigurację z pamięci – WSPÓLNY, zmienny słownik dla całego procesu (nie kopię).
+    Zmiany w nim widzą od razu wszystkie wątki; na dysk trafiają dopiero po save_config().
+    Kto potrzebuje niezmiennego obrazu (np. do serializacji), musi zrobić własną kopię.
+    Plik jest czytany ponownie tylko, gdy zmienił się na dysku.
+    """
+    return config_store.get()
+
+
 def save_config(config_data):
     """
     Zapisuje słownik `config_data` do pliku JSON w `config_path`.
+    Zapis jest odkładany i łączony z kolejnymi – patrz ConfigStore.
     """
-    with open(config_path, "w", encoding="utf-8") as f:
-        json.dump(config_data, f, ensure_ascii=False, indent=2)
+    config_store.save(config_data)
+
+
+def profile_db_path(app_state, profile_name=None):
+    """Pełna ścieżka do pliku bazy profilu (domyślnie aktualnego)."""
+    profile_name = profile_name or app_state["current_profile"]
+    profiles = app_state["profiles"]
+    if profile_name not in profiles:
+        return os.path.join(current_dir, "loginy_hasla.db")
+    db_filename = profiles[profile_name]["db_filename"]
+    if not db_filename.endswith(".db"):
+        db_filename += ".db"
+    return os.path.join(current_dir, db_filename)
+
+
+def flush_config():
+    """Natychmiast zapisuje zaległe zmiany konfiguracji na dysk."""
+    config_store.flush()
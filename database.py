@@ -1,9 +1,90 @@
 import sqlite3
 import os
+import threading
+from contextlib import contextmanager
+
+from instrumentation import log, span
+from search_keys import KEYS_VERSION, entry_keys, normalize_key, phonetic_key
 
 # Ta zmienna będzie dynamicznie ustawiana – np. po zmianie profilu
 DB_PATH = None
 
+# Kolumny zwracane jako "wpis" (id, login, haslo, opis) – klucze wyszukiwania są tylko dla indeksu
+ENTRY_COLUMNS = "id, login, haslo, opis"
+# Klucze wyszukiwania (search_keys.py) liczone raz przy zapisie wpisu
+KEY_COLUMNS = ("search_key", "phonetic_key")
+BACKFILL_CHUNK_SIZE = 5000
+
+# --------------------
+#  Menedżer połączeń
+# --------------------
+# Każdy wątek trzyma własne, długo żyjące połączenie do każdej bazy (klucz = ścieżka pliku).
+# Dzięki temu nie płacimy za connect + parsowanie schematu przy każdym zapytaniu.
+_local = threading.local()
+_all_connections = []
+_connections_lock = threading.Lock()
+_generation = 0  # zwiększane przy close_all_connections(), unieważnia połączenia wątków
+
+# --------------------
+#  FTS5 (trigramy) – wstępne filtrowanie kandydatów do fuzzy search
+# --------------------
+# Wymaga SQLite >= 3.34 (tokenizer trigram). Gdy go brak, wyszukiwanie działa jak dawniej.
+# Indeksujemy klucz znormalizowany (search_key) i fonetyczny (phonetic_key) – bez tego drugiego
+# trafienia tylko "po brzmieniu" ("dżimejl" ~ "gmail") nie przechodziłyby przez filtr.
+# Kandydatów nie sortujemy (bm25) – search.py bierze wszystkie trafienia albo, gdy jest ich
+# za dużo, punktuje cały indeks.
+FTS_TABLE = "loginy_hasla_fts"
+# Domyślny limit kandydatów z jednego zapytania (search.py podnosi go proporcjonalnie do profilu)
+FTS_CANDIDATE_LIMIT = 500
+FTS_TRIGGERS = ("loginy_hasla_fts_ai", "loginy_hasla_fts_ad", "loginy_hasla_fts_au")
+_fts_available = {}  # db_path -> bool
+
+FTS_SCHEMA = (
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        search_key, phonetic_key,
+        content='loginy_hasla', content_rowid='id',
+        tokenize='trigram'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS loginy_hasla_fts_ai AFTER INSERT ON loginy_hasla BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, search_key, phonetic_key)
+            VALUES (new.id, new.search_key, new.phonetic_key);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS loginy_hasla_fts_ad AFTER DELETE ON loginy_hasla BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_key, phonetic_key)
+            VALUES ('delete', old.id, old.search_key, old.phonetic_key);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS loginy_hasla_fts_au AFTER UPDATE OF search_key, phonetic_key ON loginy_hasla BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_key, phonetic_key)
+            VALUES ('delete', old.id, old.search_key, old.phonetic_key);
+        INSERT INTO {FTS_TABLE}(rowid, search_key, phonetic_key)
+            VALUES (new.id, new.search_key, new.phonetic_key);
+    END
+    """,
+)
+
+# Słuchacze zmian w tabeli loginy_hasla, wołani jako fn(action, db_path, entry_id, row),
+# gdzie action to "add" / "update" / "delete" albo "reload" po operacjach masowych,
+# a row to (id, login, haslo, opis, search_key, phonetic_key)
+# (np. indeks wyszukiwania w search_index.py)
+_entry_listeners = []
+
+# Pragmy ustawiane raz, przy otwarciu połączenia
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=67108864",
+    "PRAGMA busy_timeout=5000",
+)
+
 
 def set_db_path(path: str):
     """Pozwala ustawić globalną ścieżkę do pliku bazy danych."""
@@ -11,89 +92,396 @@ def set_db_path(path: str):
     DB_PATH = path
 
 
-def init_db():
-    """Inicjalizuje bazę danych (tworzy tabelę, jeśli nie istnieje)."""
+def _require_db_path():
     if not DB_PATH:
+        raise ValueError("DB_PATH nie jest ustawione. Użyj set_db_path() przed użyciem bazy.")
+    return DB_PATH
+
+
+def _thread_connections():
+    conns = getattr(_local, "connections", None)
+    if conns is None or _local.generation != _generation:
+        conns = _local.connections = {}
+        _local.depth = {}
+        _local.generation = _generation
+    return conns
+
+
+def _open_connection(path):
+    # check_same_thread=False tylko po to, by close_all_connections() mogło zamknąć
+    # połączenia innych wątków przy wyjściu – w trakcie pracy każde połączenie używa jeden wątek.
+    conn = sqlite3.connect(path, check_same_thread=False)
+    for pragma in CONNECTION_PRAGMAS:
+        try:
+            conn.execute(pragma)
+        except sqlite3.DatabaseError:
+            pass
+    with _connections_lock:
+        _all_connections.append(conn)
+    return conn
+
+
+def get_connection(path=None):
+    """
+    Zwraca połączenie bieżącego wątku do bazy `path` (domyślnie DB_PATH).
+    Połączenie jest tworzone przy pierwszym użyciu i trzymane do close_all_connections().
+    """
+    path = path or _require_db_path()
+    conns = _thread_connections()
+    conn = conns.get(path)
+    if conn is None:
+        conn = conns[path] = _open_connection(path)
+    return conn
+
+
+@contextmanager
+def transaction(path=None):
+    """
+    Kontekst transakcji na połączeniu bieżącego wątku:
+
+        with transaction() as conn:
+            conn.execute(...)
+
+    Commit po wyjściu bez wyjątku, rollback w przeciwnym razie.
+    Zagnieżdżone wywołania dołączają do zewnętrznej transakcji.
+    """
+    path = path or _require_db_path()
+    conn = get_connection(path)
+    depth = _local.depth
+    level = depth.get(path, 0)
+    depth[path] = level + 1
+    try:
+        yield conn
+    except BaseException:
+        depth[path] = level
+        if level == 0:
+            conn.rollback()
+        raise
+    depth[path] = level
+    if level == 0:
+        conn.commit()
+
+
+def close_all_connections():
+    """Zamyka wszystkie połączenia (wszystkich wątków). Wywoływane przy zamykaniu aplikacji."""
+    global _generation
+    with _connections_lock:
+        conns = list(_all_connections)
+        _all_connections.clear()
+        _generation += 1
+    for conn in conns:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+
+def close_thread_connections():
+    """Zamyka połączenia bieżącego wątku (np. wątku klienta serwera, który zaraz się kończy)."""
+    conns = getattr(_local, "connections", None)
+    if not conns:
+        return
+    closing = list(conns.values())
+    conns.clear()
+    with _connections_lock:
+        for conn in closing:
+            if conn in _all_connections:
+                _all_connections.remove(conn)
+    for conn in closing:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+
+def add_entry_listener(listener):
+    """Rejestruje funkcję wołaną po każdej zmianie wpisu."""
+    if listener not in _entry_listeners:
+        _entry_listeners.append(listener)
+
+
+def _notify_entry_changed(action, entry_id, row=None, path=None):
+    for listener in _entry_listeners:
+        listener(action, path or DB_PATH, entry_id, row)
+
+
+def init_db(path=None):
+    """Inicjalizuje bazę danych (tworzy tabelę, jeśli nie istnieje). Domyślnie DB_PATH."""
+    if not (path or DB_PATH):
         raise ValueError("DB_PATH nie jest ustawione. Użyj set_db_path() przed init_db().")
 
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS loginy_hasla (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            login TEXT NOT NULL,
-            haslo TEXT NOT NULL,
-            opis TEXT NOT NULL
-        )
-    ''')
-    conn.commit()
-    conn.close()
+    with transaction(path) as conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS loginy_hasla (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                login TEXT NOT NULL,
+                haslo TEXT NOT NULL,
+                opis TEXT NOT NULL,
+                search_key TEXT,
+                phonetic_key TEXT
+            )
+        ''')
+    migrate_search_keys(path)
+    init_fts(path)
+
+
+def _drop_fts(conn):
+    for trigger in FTS_TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
 
+def migrate_search_keys(path=None):
+    """
+    Migracja starszych baz: dodaje kolumny search_key / phonetic_key i wylicza je dla wpisów,
+    które ich nie mają (albo wszystkich, gdy zmieniły się reguły – PRAGMA user_version < KEYS_VERSION).
+    Stary indeks FTS (po opis/login albo tylko po search_key) jest usuwany – init_fts zbuduje
+    nowy po obu kluczach.
+    Zwraca liczbę przeliczonych wpisów.
+    """
+    path = path or _require_db_path()
+    conn = get_connection(path)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(loginy_hasla)")}
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    fts_sql = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+    ).fetchone()
 
+    if version >= KEYS_VERSION and all(col in columns for col in KEY_COLUMNS):
+        where = "WHERE (search_key IS NULL OR phonetic_key IS NULL)"
+    else:
+        where = ""
+    stale = conn.execute(f"SELECT COUNT(*) FROM loginy_hasla {where}").fetchone()[0]
+    old_fts = fts_sql is not None and "phonetic_key" not in fts_sql[0]
+    if not stale and not old_fts and version >= KEYS_VERSION:
+        return 0
+
+    updated = 0
+    with span("db.migrate_search_keys"), transaction(path) as conn:
+        for col in KEY_COLUMNS:
+            if col not in columns:
+                conn.execute(f"ALTER TABLE loginy_hasla ADD COLUMN {col} TEXT")
+        if stale or old_fts:
+            # Przy przeliczaniu wielu wierszy taniej jest przebudować FTS od zera niż aktualizować triggerem
+            _drop_fts(conn)
+            _fts_available.pop(path, None)
+        last_id = 0
+        while stale:
+            rows = conn.execute(
+                f"SELECT id, login, opis FROM loginy_hasla {where + ' AND' if where else 'WHERE'} id > ? "
+                "ORDER BY id LIMIT ?",
+                (last_id, BACKFILL_CHUNK_SIZE)
+            ).fetchall()
+            if not rows:
+                break
+            conn.executemany(
+                "UPDATE loginy_hasla SET search_key = ?, phonetic_key = ? WHERE id = ?",
+                [entry_keys(login, opis) + (entry_id,) for entry_id, login, opis in rows]
+            )
+            updated += len(rows)
+            last_id = rows[-1][0]
+        conn.execute(f"PRAGMA user_version = {KEYS_VERSION}")
+    if updated:
+        log.info("database", "Przeliczono klucze wyszukiwania dla %d wpisów (%s).", updated, os.path.basename(path))
+    return updated
+
+
+def _fts_table_exists(conn):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+    ).fetchone() is not None
+
+
+def init_fts(path=None):
+    """
+    Tworzy (jeśli trzeba) tabelę FTS5 z tokenizerem trigram oraz triggery synchronizujące.
+    Dla istniejącej bazy bez FTS wypełnia indeks istniejącymi wpisami ('rebuild').
+    """
+    path = path or _require_db_path()
+    try:
+        with transaction(path) as conn:
+            if not _fts_table_exists(conn):
+                conn.execute(FTS_SCHEMA[0])
+                conn.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+            for statement in FTS_SCHEMA[1:]:
+                conn.execute(statement)
+        _fts_available[path] = True
+    except sqlite3.OperationalError as e:
+        # Brak FTS5 / tokenizera trigram w tej wersji SQLite
+        log.warning("database", "FTS5 (trigram) niedostępne: %s", e)
+        _fts_available[path] = False
+    return _fts_available[path]
+
+
+def has_fts(path=None):
+    """Czy baza ma zsynchronizowaną tabelę FTS5."""
+    path = path or _require_db_path()
+    if path not in _fts_available:
+        _fts_available[path] = _fts_table_exists(get_connection(path))
+    return _fts_available[path]
+
+
+def _trigram_filter(column, text):
+    """Wyrażenie MATCH "kolumna : (trigram OR ...)" dla trigramów `text` albo None (za krótki tekst)."""
+    trigrams = []
+    for i in range(len(text) - 2):
+        trigram = text[i:i + 3]
+        if trigram not in trigrams:
+            trigrams.append(trigram)
+    if not trigrams:
+        return None
+    return column + " : (" + " OR ".join('"' + t.replace('"', '""') + '"' for t in trigrams) + ")"
+
+
+@span("db.fts_candidates")
+def fts_candidate_ids(keyword, limit=FTS_CANDIDATE_LIMIT, path=None):
+    """
+    Zwraca ID wpisów, których klucz wyszukiwania ma choć jeden wspólny trigram z kluczem
+    `keyword` (normalize_key) albo klucz fonetyczny – z kluczem fonetycznym `keyword`
+    (phonetic_key), maksymalnie `limit` (w dowolnej kolejności).
+    Wynik długości `limit` oznacza, że trafień mogło być więcej – wtedy zbiór jest niepełny.
+    None, jeśli zapytanie jest za krótkie na trigramy.
+    """
+    filters = [f for f in (_trigram_filter("search_key", normalize_key(keyword)),
+                           _trigram_filter("phonetic_key", phonetic_key(keyword))) if f]
+    if not filters:
+        return None
+
+    rows = get_connection(path).execute(
+        f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ? LIMIT ?",
+        (" OR ".join(filters), limit)
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+@span("db.add_entry")
 def add_entry(login, haslo, opis):
-    """Dodaje nowy wpis do bazy."""
+    """Dodaje nowy wpis do bazy i zwraca jego ID."""
     if not DB_PATH:
         raise ValueError("DB_PATH nie jest ustawione.")
 
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO loginy_hasla (login, haslo, opis) VALUES (?, ?, ?)",
-        (login, haslo, opis)
-    )
-    conn.commit()
-    conn.close()
+    keys = entry_keys(login, opis)
+    with transaction() as conn:
+        cursor = conn.execute(
+            "INSERT INTO loginy_hasla (login, haslo, opis, search_key, phonetic_key) VALUES (?, ?, ?, ?, ?)",
+            (login, haslo, opis) + keys
+        )
+        entry_id = cursor.lastrowid
+    _notify_entry_changed("add", entry_id, (entry_id, login, haslo, opis) + keys)
+    return entry_id
 
 
+@span("db.delete_entry")
 def delete_entry(entry_id):
     """Usuwa wpis o podanym ID."""
     if not DB_PATH:
         raise ValueError("DB_PATH nie jest ustawione.")
 
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM loginy_hasla WHERE id = ?", (entry_id,))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute("DELETE FROM loginy_hasla WHERE id = ?", (entry_id,))
+    _notify_entry_changed("delete", entry_id)
 
 
-def get_all_entries():
-    """Zwraca listę wszystkich wpisów (krotek) w bazie."""
-    if not DB_PATH:
+@span("db.get_all_entries")
+def get_all_entries(path=None):
+    """Zwraca listę wszystkich wpisów (krotek) w bazie (domyślnie DB_PATH)."""
+    if not (path or DB_PATH):
+        raise ValueError("DB_PATH nie jest ustawione.")
+
+    return get_connection(path).execute(f"SELECT {ENTRY_COLUMNS} FROM loginy_hasla").fetchall()
+
+
+@span("db.get_all_entries_with_keys")
+def get_all_entries_with_keys(path=None):
+    """Jak get_all_entries, ale wiersze mają na końcu (search_key, phonetic_key) – dla indeksu wyszukiwania."""
+    if not (path or DB_PATH):
         raise ValueError("DB_PATH nie jest ustawione.")
 
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM loginy_hasla")
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+    return get_connection(path).execute(
+        f"SELECT {ENTRY_COLUMNS}, search_key, phonetic_key FROM loginy_hasla"
+    ).fetchall()
 
 
+@span("db.get_entry_by_id")
 def get_entry_by_id(entry_id):
     """Zwraca wpis (krotka) o podanym ID."""
     if not DB_PATH:
         raise ValueError("DB_PATH nie jest ustawione.")
 
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM loginy_hasla WHERE id = ?", (entry_id,))
-    row = cursor.fetchone()
-    conn.close()
-    return row
+    return get_connection().execute(
+        f"SELECT {ENTRY_COLUMNS} FROM loginy_hasla WHERE id = ?", (entry_id,)
+    ).fetchone()
 
 
+@span("db.update_entry")
 def update_entry(entry_id, new_login, new_haslo, new_opis):
     """Aktualizuje istniejący wpis w bazie."""
     if not DB_PATH:
         raise ValueError("DB_PATH nie jest ustawione.")
 
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
-        UPDATE loginy_hasla
-        SET login = ?, haslo = ?, opis = ?
-        WHERE id = ?
-    """, (new_login, new_haslo, new_opis, entry_id))
-    conn.commit()
-    conn.close()
+    keys = entry_keys(new_login, new_opis)
+    with transaction() as conn:
+        conn.execute("""
+            UPDATE loginy_hasla
+            SET login = ?, haslo = ?, opis = ?, search_key = ?, phonetic_key = ?
+            WHERE id = ?
+        """, (new_login, new_haslo, new_opis) + keys + (entry_id,))
+    _notify_entry_changed("update", entry_id, (entry_id, new_login, new_haslo, new_opis) + keys)
+
+
+# --------------------
+#  Operacje masowe (import / eksport)
+# --------------------
+BULK_CHUNK_SIZE = 5000
+
+
+@span("db.add_entries_bulk")
+def add_entries_bulk(entries, chunk_size=BULK_CHUNK_SIZE, path=None, on_chunk=None):
+    """
+    Wstawia wiele wpisów naraz. `entries` to dowolny iterator krotek (login, haslo, opis);
+    zapis idzie przez executemany w transakcjach po `chunk_size` wierszy.
+    Po każdej paczce woła on_chunk(wstawione_do_tej_pory). Zwraca liczbę wstawionych wpisów.
+    """
+    path = path or _require_db_path()
+    total = 0
+    chunk = []
+
+    def flush_chunk():
+        nonlocal total
+        with transaction(path) as conn:
+            conn.executemany(
+                "INSERT INTO loginy_hasla (login, haslo, opis, search_key, phonetic_key) VALUES (?, ?, ?, ?, ?)",
+                [(login, haslo, opis) + entry_keys(login, opis) for login, haslo, opis in chunk]
+            )
+        total += len(chunk)
+        chunk.clear()
+        if on_chunk:
+            on_chunk(total)
+
+    try:
+        for entry in entries:
+            chunk.append(entry)
+            if len(chunk) >= chunk_size:
+                flush_chunk()
+        if chunk:
+            flush_chunk()
+    finally:
+        if total:
+            _notify_entry_changed("reload", None, path=path)
+    return total
+
+
+def iter_entries(path=None, batch_size=1000):
+    """Strumieniowo zwraca wszystkie wpisy (po id), bez wczytywania całej tabeli do pamięci."""
+    if not (path or DB_PATH):
+        raise ValueError("DB_PATH nie jest ustawione.")
+
+    cursor = get_connection(path).execute(f"SELECT {ENTRY_COLUMNS} FROM loginy_hasla ORDER BY id")
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        cursor.close()
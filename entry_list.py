@@ -0,0 +1,277 @@
+"""
+Wirtualizowana lista wpisów dla dużych baz (100k+ kont).
+
+EntryListModel trzyma wiersze w zwartej postaci (ID w `array`, odwrotny słownik id -> pozycja,
+kolory tylko dla wyróżnionych wpisów), a teksty do wyświetlenia buduje dopiero, gdy są potrzebne.
+VirtualEntryList rysuje w tk.Listbox wyłącznie widoczne okno wierszy.
+"""
+
+import tkinter as tk
+import tkinter.font as tkfont
+from array import array
+
+DEFAULT_COLOR = "white"
+
+
+def format_entry(row):
+    """
+    Tekst wiersza listy. row: (id, login, haslo, opis) albo wynik z wszystkich profili:
+    (klucz < 0, login, haslo, opis, profil, entry_id, db_path, wynik) – wtedy z nazwą profilu i prawdziwym ID.
+    """
+    trimmed_login = row[1]
+    if len(trimmed_login) > 20:
+        trimmed_login = trimmed_login[:20] + "..."
+    if row[0] < 0:
+        return f"[{row[4]}] ID: {row[5]}, Login: {trimmed_login}, Opis: {row[3]}"
+    return f"ID: {row[0]}, Login: {trimmed_login}, Opis: {row[3]}"
+
+
+class EntryListModel:
+    """Model listy: kolejność wierszy, id -> pozycja w O(1) i kolory wyróżnionych wpisów."""
+
+    def __init__(self):
+        self.ids = array("q")
+        self.rows = {}
+        self.positions = {}
+        self.colors = {}
+        self.default_color = DEFAULT_COLOR
+        self.message = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def set_rows(self, rows, colors=None):
+        self.ids = array("q", [row[0] for row in rows])
+        self.rows = {row[0]: row for row in rows}
+        self.positions = {entry_id: pos for pos, entry_id in enumerate(self.ids)}
+        self.colors = dict(colors) if colors else {}
+        self.default_color = DEFAULT_COLOR
+        self.message = None
+
+    def set_message(self, text):
+        """Zamiast wierszy pokazujemy jeden komunikat (np. "Brak wyników.")."""
+        self.set_rows([])
+        self.message = text
+
+    def id_at(self, pos):
+        if 0 <= pos < len(self.ids):
+            return self.ids[pos]
+        return None
+
+    def position_of(self, entry_id):
+        return self.positions.get(entry_id, -1)
+
+    def row_at(self, pos):
+        entry_id = self.id_at(pos)
+        if entry_id is None:
+            return None
+        return self.rows.get(entry_id)
+
+    def text_at(self, pos):
+        return format_entry(self.rows[self.ids[pos]])
+
+    def color_of(self, entry_id):
+        return self.colors.get(entry_id, self.default_color)
+
+
+class VirtualEntryList(tk.Frame):
+    """
+    Listbox + scrollbar, który trzyma w widgecie tylko widoczne wiersze modelu.
+    Przewijanie (scrollbar, kółko myszy) zmienia jedynie `top` i przerysowuje okno.
+    """
+
+    def __init__(self, master, model=None, **listbox_options):
+        super().__init__(master)
+        self.model = model or EntryListModel()
+        self.top = 0
+        self.version = 0  # zwiększane przy każdej podmianie zawartości listy
+        # Model z cache (współdzielony) – set_rows/set_message nie mogą go nadpisać
+        self._shared_model = False
+        self.visible_rows = listbox_options.get("height", 15)
+        # Zaznaczone ID w kolejności zaznaczania (dict jako uporządkowany zbiór)
+        self.selected_ids = {}
+
+        self.listbox = tk.Listbox(self, exportselection=False, activestyle="none", **listbox_options)
+        self.listbox.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar = tk.Scrollbar(self, orient="vertical", command=self.yview)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        self.listbox.bind("<Configure>", self._on_configure)
+        self.listbox.bind("<MouseWheel>", self._on_mousewheel)
+        self.listbox.bind("<Button-4>", lambda e: self._scroll_by(-3))
+        self.listbox.bind("<Button-5>", lambda e: self._scroll_by(3))
+
+    # --- dane ---
+
+    def set_rows(self, rows, colors=None):
+        self._own_model().set_rows(rows, colors)
+        self.version += 1
+        self.selected_ids.clear()
+        self.top = 0
+        self.render()
+
+    def set_model(self, model, colors=None):
+        """
+        Podmienia cały model (np. gotowy model profilu z cache) – bez przeliczania wierszy,
+        rysowane są tylko widoczne wiersze. Model pozostaje współdzielony: kolejne set_rows
+        nie zmienią go, tylko założą nowy.
+        """
+        model.colors = dict(colors) if colors else {}
+        model.default_color = DEFAULT_COLOR
+        model.message = None
+        self.model = model
+        self._shared_model = True
+        self.version += 1
+        self.selected_ids.clear()
+        self.top = 0
+        self.render()
+
+    def _own_model(self):
+        if self._shared_model:
+            self.model = EntryListModel()
+            self._shared_model = False
+        return self.model
+
+    def set_message(self, text):
+        self._own_model().set_message(text)
+        self.version += 1
+        self.selected_ids.clear()
+        self.top = 0
+        self.render()
+
+    def set_color(self, entry_id, color):
+        """Zmienia kolor jednego wpisu – O(1), przerysowuje tylko jeśli jest widoczny."""
+        if color == self.model.default_color:
+            self.model.colors.pop(entry_id, None)
+        else:
+            self.model.colors[entry_id] = color
+        pos = self.model.position_of(entry_id)
+        if self.top <= pos < self.top + self.visible_rows:
+            self.listbox.itemconfig(pos - self.top, bg=color, fg="black")
+
+    def fill_color(self, color):
+        """Jeden kolor dla wszystkich wierszy (np. kolor profilu / reset podświetleń)."""
+        self.model.colors.clear()
+        self.model.default_color = color
+        self.render()
+
+    def config_font(self, font):
+        self.listbox.config(font=font)
+        self._update_visible_rows(self.listbox.winfo_height())
+
+    # --- pozycje / zaznaczenie ---
+
+    def row_at_y(self, y):
+        """Pozycja w modelu dla współrzędnej y w listboxie albo -1."""
+        if not len(self.model):
+            return -1
+        pos = self.top + self.listbox.nearest(y)
+        return pos if 0 <= pos < len(self.model) else -1
+
+    def entry_id_at_y(self, y):
+        """ID wpisu pod współrzędną y (None dla pustej listy / komunikatu)."""
+        return self.model.id_at(self.row_at_y(y))
+
+    def select_row(self, pos):
+        entry_id = self.model.id_at(pos)
+        self.selected_ids = {entry_id: None} if entry_id is not None else {}
+        self._render_selection()
+
+    def toggle_row(self, pos):
+        """Dodaje wiersz do zaznaczenia albo go odznacza (Ctrl+klik). Zwraca True, jeśli teraz zaznaczony."""
+        entry_id = self.model.id_at(pos)
+        if entry_id is None:
+            return False
+        selected = entry_id not in self.selected_ids
+        if selected:
+            self.selected_ids[entry_id] = None
+        else:
+            del self.selected_ids[entry_id]
+        self._render_selection()
+        return selected
+
+    def selected_id(self):
+        for entry_id in self.selected_ids:
+            if entry_id in self.model.positions:
+                return entry_id
+        return None
+
+    def selected_row(self):
+        entry_id = self.selected_id()
+        return self.model.rows.get(entry_id) if entry_id is not None else None
+
+    # --- przewijanie ---
+
+    def _max_top(self):
+        return max(0, len(self.model) - self.visible_rows)
+
+    def yview(self, *args):
+        if not args:
+            return
+        if args[0] == "moveto":
+            new_top = int(float(args[1]) * len(self.model))
+        elif args[0] == "scroll":
+            step = int(args[1])
+            if args[2] == "pages":
+                step *= max(1, self.visible_rows - 1)
+            new_top = self.top + step
+        else:
+            return
+        self._set_top(new_top)
+
+    def _scroll_by(self, step):
+        self._set_top(self.top + step)
+        return "break"
+
+    def _on_mousewheel(self, event):
+        return self._scroll_by(-1 if event.delta > 0 else 1) if event.delta else "break"
+
+    def _set_top(self, new_top):
+        new_top = min(max(0, new_top), self._max_top())
+        if new_top != self.top:
+            self.top = new_top
+            self.render()
+
+    def _on_configure(self, event):
+        self._update_visible_rows(event.height)
+
+    def _update_visible_rows(self, height):
+        linespace = tkfont.Font(font=self.listbox.cget("font")).metrics("linespace")
+        chrome = 2 * (int(self.listbox.cget("borderwidth")) + int(self.listbox.cget("highlightthickness")))
+        rows = max(1, (height - chrome) // max(1, linespace + 1))
+        if rows != self.visible_rows:
+            self.visible_rows = rows
+            self.top = min(self.top, self._max_top())
+            self.render()
+
+    # --- rysowanie ---
+
+    def render(self):
+        model = self.model
+        lb = self.listbox
+        lb.delete(0, tk.END)
+        total = len(model)
+        if not total:
+            if model.message:
+                lb.insert(tk.END, model.message)
+            self.scrollbar.set(0.0, 1.0)
+            return
+
+        end = min(total, self.top + self.visible_rows)
+        lb.insert(tk.END, *[model.text_at(pos) for pos in range(self.top, end)])
+        if model.default_color != DEFAULT_COLOR or model.colors:
+            for pos in range(self.top, end):
+                color = model.color_of(model.ids[pos])
+                if color != DEFAULT_COLOR:
+                    lb.itemconfig(pos - self.top, bg=color, fg="black")
+        self._render_selection()
+        self.scrollbar.set(self.top / total, end / total)
+
+    def _render_selection(self):
+        self.listbox.selection_clear(0, tk.END)
+        for entry_id in self.selected_ids:
+            pos = self.model.position_of(entry_id)
+            if self.top <= pos < self.top + self.visible_rows:
+                self.listbox.selection_set(pos - self.top)
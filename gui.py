@@ -4,36 +4,51 @@ import threading
 import tkinter as tk
 from tkinter import messagebox, colorchooser
 import os
-import keyboard
+import sqlite3
+from itertools import islice
 
-from config import load_config, save_config, current_dir
+from startup import lazy_import, StartupTimer
+from config import load_config, save_config, flush_config, profile_db_path
 from database import (
     set_db_path,
     init_db,
     add_entry,
     delete_entry,
-    get_all_entries,
     get_entry_by_id,
-    update_entry
+    update_entry,
+    iter_entries,
+    close_all_connections
 )
-import voice  # nasz moduł do rozpoznawania mowy, hotword i nauki
+import search_index
+import write_behind
+import injector
+from bind_manager import BindManager
+import instrumentation
+from instrumentation import log, span
+from entry_list import VirtualEntryList, EntryListModel
+
+# Ciężkie moduły (speech_recognition, numpy, rapidfuzz, hooki klawiatury) ładujemy przy pierwszym
+# użyciu – w praktyce w tle, w trakcie startu, już po pokazaniu okna
+voice = lazy_import("voice")  # nasz moduł do rozpoznawania mowy, hotword i nauki
+learning = lazy_import("learning")
+keyboard = lazy_import("keyboard")
+search = lazy_import("search")  # wyszukiwanie i uczenie wyborów (bez dźwięku)
+search_server = lazy_import("search_server")
+
+# Ile pierwszych wpisów pokazujemy od razu, zanim zbuduje się pełny indeks
+STARTUP_PAGE_SIZE = 200
+# Ile ostatnio używanych profili pamiętamy w configu (kandydaci do wczytania z wyprzedzeniem)
+RECENT_PROFILES_LIMIT = 8
 
 voice_key_hotkey = None
-login_password_hooks = []
+binds = None
 main_root = None
+# Klucz wyniku z wielu profili (< 0) -> (profil, ID wpisu) dla uzbrojonych wpisów
+armed_profile_hits = {}
+main_entries_list = None
 stop_hotword = None
-
-class RedirectText:
-    """Klasa do przekierowania print do widgetu Text."""
-    def __init__(self, text_widget):
-        self.output = text_widget
-
-    def write(self, string):
-        self.output.insert(tk.END, string)
-        self.output.see(tk.END)
-
-    def flush(self):
-        pass
+search_scheduler = None
+search_srv = None  # serwer wyszukiwania (search_server), jeśli włączony w configu
 
 def normalize_key_name(key_name: str) -> str:
     kl = key_name.lower()
@@ -98,122 +113,151 @@ def set_profile_voice_hook(app_state, callback):
             suppress=False
         )
 
-def update_bind_status(label, is_active):
-    """Aktualizuje label z informacją o statusie bindu."""
-    if is_active:
-        label.config(text="Bind aktywny", bg="green", fg="black")
+def update_bind_status(label, armed):
+    """Aktualizuje label z informacją o statusie bindu (armed = liczba uzbrojonych wpisów)."""
+    if armed:
+        text = "Bind aktywny" if armed == 1 else f"Bind aktywny ({armed})"
+        label.config(text=text, bg="green", fg="black")
     else:
         label.config(text="Bind nieaktywny", bg="gray", fg="black")
 
 def deactivate_binds(label):
-    """Usuwa hooki na klawisze login/hasło."""
-    global login_password_hooks
-    for h in login_password_hooks:
-        try:
-            keyboard.unhook(h)
-        except:
-            pass
-    login_password_hooks.clear()
-    update_bind_status(label, False)
+    """Rozbraja wszystkie wpisy (hook klawiatury zostaje, klawisze przechodzą normalnie)."""
+    if binds is not None:
+        binds.clear()
+    armed_profile_hits.clear()
+    update_bind_status(label, 0)
     print("Dezaktywowano bindy loginu/hasła (bez naruszania voice search).")
 
-def bind_login_and_password(entry_id, login, haslo, bind_label, app_state, listbox):
+def setup_binds(root, app_state, entries_list, bind_label):
     """
-    Jednorazowe zbindowanie klawiszy do wpisania loginu i hasła.
+    Tworzy BindManager (hooki klawiszy loginu/hasła zakłada dopiero binds.start(), w tle przy starcie).
+    Wpisywanie idzie przez injector, a zmiany statusu/kolorów wracają do GUI przez root.after.
     """
-    global login_password_hooks
-    login_password_hooks.clear()
+    global binds
 
-    login_key = normalize_key_name(app_state["login_key"])
-    password_key = normalize_key_name(app_state["password_key"])
-    highlight_states = app_state["highlight_states"]
+    def on_typed(job, ok, error, entry_id):
+        """Koniec wpisywania – wołane w wątku Tk."""
+        if not ok:
+            print(f"Nie udało się wpisać: {job.label} ({error})")
+            return
+        print(f"Wpisano {job.label}.")
+        entries_list.set_color(entry_id, "green")
+        if entry_id < 0:
+            # Wynik z wyszukiwania we wszystkich profilach – (profil, ID) zapamiętane przy uzbrajaniu,
+            # bo listy wyników mogła już podmienić kolejna wyszukiwarka
+            hit = armed_profile_hits.get(entry_id)
+            if entry_id not in binds.armed_ids():
+                armed_profile_hits.pop(entry_id, None)
+            # Trwale podświetlamy tylko wpisy aktualnego profilu
+            if hit is not None and hit[0] == app_state["current_profile"]:
+                queue_highlight(app_state, hit[1], "green")
+            return
+        queue_highlight(app_state, entry_id, "green")
+
+    def submit(text, action, entry_id):
+        label = "login" if action == "login" else "hasło"
+        injector.get_injector().submit(
+            text,
+            label=label,
+            on_done=lambda job, ok, error: root.after(0, on_typed, job, ok, error, entry_id)
+        )
 
-    print(f"Bind login/hasło pod klawisze '{login_key}' i '{password_key}' (jednorazowe).")
+    def on_change(armed):
+        root.after(0, update_bind_status, bind_label, armed)
 
-    login_used = False
-    password_used = False
+    binds = BindManager(submit, on_change=on_change, is_injected=lambda name: injector.get_injector().is_injecting(name))
+    binds.set_keys(normalize_key_name(app_state["login_key"]), normalize_key_name(app_state["password_key"]))
+    return binds
 
-    def insert_login(e):
-        nonlocal login_used
-        if not login_used:
-            login_used = True
-            keyboard.write(login)
-            print("Wpisano login.")
-            time.sleep(0.2)
-            try:
-                keyboard.unhook_key(login_key)
-            except:
-                pass
-            update_bind_status(bind_label, False)
-            highlight_states[str(entry_id)] = "green"
-            idx = find_listbox_index_by_id(listbox, entry_id)
-            if idx != -1:
-                set_item_color(listbox, idx, "green")
-            save_config(app_state)
+def bind_login_and_password(entry_id, login, haslo, profile_hit=None):
+    """
+    Uzbraja wpis: kolejne naciśnięcie klawisza loginu / hasła wpisze jego login / hasło.
+    Kilka uzbrojonych wpisów jest obsługiwanych po kolei.
+    profile_hit – (profil, ID wpisu) dla wyniku z wyszukiwania we wszystkich profilach (entry_id < 0).
+    """
+    if profile_hit is not None:
+        armed_profile_hits[entry_id] = profile_hit
+    binds.arm(entry_id, login, haslo)
+    print(f"Bind login/hasło (ID={entry_id}), uzbrojonych wpisów: {len(binds.armed_ids())}.")
 
-    def insert_password(e):
-        nonlocal password_used
-        if not password_used:
-            password_used = True
-            keyboard.write(haslo)
-            print("Wpisano hasło.")
-            time.sleep(0.2)
-            try:
-                keyboard.unhook_key(password_key)
-            except:
-                pass
-            update_bind_status(bind_label, False)
-            highlight_states[str(entry_id)] = "green"
-            idx = find_listbox_index_by_id(listbox, entry_id)
-            if idx != -1:
-                set_item_color(listbox, idx, "green")
-            save_config(app_state)
+def queue_highlight(app_state, entry_id, color):
+    """
+    Zmienia podświetlenie wpisu w pamięci od razu, a zapis do configu zleca wątkowi write_behind.
+    color=None usuwa podświetlenie.
+    """
+    if color is None:
+        app_state["highlight_states"].pop(str(entry_id), None)
+    else:
+        app_state["highlight_states"][str(entry_id)] = color
+    write_behind.writer.submit("highlight", (app_state["current_profile"], str(entry_id)), color)
 
-    h1 = keyboard.hook_key(login_key, insert_login, suppress=True)
-    h2 = keyboard.hook_key(password_key, insert_password, suppress=True)
-    login_password_hooks.append(h1)
-    login_password_hooks.append(h2)
+def _save_highlights():
+    """Zapis configu z podświetleniami – wołane w wątku Tk."""
+    save_config(load_config())
 
-    update_bind_status(bind_label, True)
+def _apply_highlights(items):
+    """
+    Handler write_behind: paczka [((profil, "id"), kolor), ...].
+    Podświetlenia są już w app_state (zmienia je queue_highlight w wątku Tk), więc tu niczego
+    nie zmieniamy – tylko zlecamy wątkowi Tk zapis configu, raz na paczkę.
+    """
+    root = main_root
+    if root is None:
+        return
+    try:
+        root.after(0, _save_highlights)
+    except (RuntimeError, tk.TclError):
+        # Okno zostało już zamknięte
+        pass
 
-def set_item_color(listbox, index, color):
-    listbox.itemconfig(index, bg=color, fg="black")
+write_behind.writer.register("highlight", _apply_highlights)
 
-def find_listbox_index_by_id(listbox, entry_id):
-    for i in range(listbox.size()):
-        line = listbox.get(i)
+def highlight_colors(highlight_states):
+    """Zamienia highlight_states z configu ({"id": kolor}) na słownik {id: kolor} dla listy."""
+    colors = {}
+    for entry_id_str, color in (highlight_states or {}).items():
         try:
-            line_id = int(line.split(",")[0].split(":")[1].strip())
-            if line_id == entry_id:
-                return i
+            entry_id = int(entry_id_str)
         except:
-            pass
-    return -1
-
-def update_entries_list(listbox, highlight_states=None):
-    """Odświeża listbox wpisami z bazy i koloruje wg highlight_states."""
-    listbox.delete(0, tk.END)
-    entries = get_all_entries()
-    for entry in entries:
-        trimmed_login = entry[1]
-        if len(trimmed_login) > 20:
-            trimmed_login = trimmed_login[:20] + "..."
-        listbox.insert(
-            tk.END,
-            f"ID: {entry[0]}, Login: {trimmed_login}, Opis: {entry[3]}"
-        )
+            continue
+        if color in ("green", "blue"):
+            colors[entry_id] = color
+    return colors
 
-    if highlight_states:
-        for entry_id_str, color in highlight_states.items():
-            try:
-                entry_id = int(entry_id_str)
-            except:
-                continue
-            idx = find_listbox_index_by_id(listbox, entry_id)
-            if idx != -1 and color == "green":
-                set_item_color(listbox, idx, "green")
-            elif idx != -1 and color == "blue":
-                set_item_color(listbox, idx, "blue")
+def entries_model(index):
+    """
+    Model listy wszystkich wpisów profilu – budowany raz na wersję indeksu i trzymany w index.views,
+    więc żyje tyle co indeks w cache LRU (search_index). Można wołać z wątku w tle (prefetch).
+    """
+    with index.lock:
+        model = index.views.get("entries_model")
+        if model is None:
+            model = EntryListModel()
+            model.set_rows(index.sorted_rows())
+            index.views["entries_model"] = model
+        return model
+
+@span("gui.update_entries_list")
+def update_entries_list(entries_list, highlight_states=None):
+    """Odświeża listę wpisami z bazy (z indeksu wyszukiwania) i koloruje wg highlight_states."""
+    entries_list.set_model(entries_model(search_index.get_index()), highlight_colors(highlight_states))
+
+def remember_profile(app_state, profile_name):
+    """Dopisuje profil na początek listy ostatnio używanych (app_state["recent_profiles"])."""
+    recent = [name for name in app_state.get("recent_profiles", []) if name != profile_name]
+    app_state["recent_profiles"] = [profile_name] + recent[:RECENT_PROFILES_LIMIT - 1]
+
+def prefetch_profiles(app_state):
+    """Wczytuje w tle indeksy (i modele listy) ostatnio używanych profili – kandydatów do przełączenia."""
+    profiles = app_state["profiles"]
+    current = app_state["current_profile"]
+    paths = [
+        profile_db_path(app_state, name)
+        for name in app_state.get("recent_profiles", [])
+        if name != current and name in profiles
+    ]
+    return search_index.prefetch(paths, on_loaded=entries_model)
 
 class ProfileTooltip:
     """Tooltip do listy profili."""
@@ -235,33 +279,34 @@ class ProfileTooltip:
         if tw:
             tw.destroy()
 
-def switch_profile(profile_name, app_state, listbox):
+def switch_profile(profile_name, app_state, entries_list):
     """Zmiana profilu bazy (inny plik .db), koloru itd."""
     profiles = app_state["profiles"]
     if profile_name not in profiles:
         print(f"Profil '{profile_name}' nie istnieje!")
         return
 
-    db_filename = profiles[profile_name]["db_filename"]
-    if not db_filename.endswith(".db"):
-        db_filename += ".db"
-    new_path = os.path.join(current_dir, db_filename)
+    new_path = profile_db_path(app_state, profile_name)
+    cached = search_index.is_cached(new_path)
     set_db_path(new_path)
 
     app_state["current_profile"] = profile_name
+    remember_profile(app_state, profile_name)
     save_config(app_state)
-    init_db()
+    if not cached:
+        # Profil z cache był już zainicjalizowany (init_db) w tej sesji
+        init_db()
 
     app_state["highlight_states"] = {}
-    update_entries_list(listbox, highlight_states=app_state["highlight_states"])
+    update_entries_list(entries_list, highlight_states=app_state["highlight_states"])
 
     new_color = profiles[profile_name]["color"]
-    for i in range(listbox.size()):
-        set_item_color(listbox, i, new_color)
+    entries_list.fill_color(new_color)
 
-    print(f"Przełączono na profil '{profile_name}'. Kolor podświetlenia: {new_color}")
+    print(f"Przełączono na profil '{profile_name}'. Kolor podświetlenia: {new_color}" + (" (z cache)" if cached else ""))
+    prefetch_profiles(app_state)
 
-def open_profiles_window(root, app_state, listbox_entries):
+def open_profiles_window(root, app_state, entries_list):
     """Okienko do zarządzania profilami."""
     top = tk.Toplevel(root)
     top.title("Zarządzanie profilami")
@@ -320,7 +365,7 @@ def open_profiles_window(root, app_state, listbox_entries):
             messagebox.showinfo("Info", "Wybierz jakiś profil z listy.")
             return
         pname = listbox_profiles.get(selection)
-        switch_profile(pname, app_state, listbox_entries)
+        switch_profile(pname, app_state, entries_list)
         top.destroy()
 
     tk.Button(top, text="Użyj wybranego profilu", command=select_profile).grid(row=1, column=0, sticky="ew")
@@ -397,6 +442,8 @@ def open_profiles_window(root, app_state, listbox_entries):
             messagebox.showerror("Błąd", "Nie możesz usunąć aktualnie używanego profilu!")
             return
         if messagebox.askyesno("Potwierdzenie", f"Czy na pewno chcesz usunąć profil '{pname}'?"):
+            search_index.invalidate(profile_db_path(app_state, pname))
+            app_state["recent_profiles"] = [name for name in app_state.get("recent_profiles", []) if name != pname]
             del profiles[pname]
             save_config(app_state)
             fill_profiles_list()
@@ -408,63 +455,190 @@ def open_profiles_window(root, app_state, listbox_entries):
 
 def on_right_click(event):
     """Kliknięcie PPM w listbox – toggle zielonego podświetlenia wpisu."""
-    listbox = event.widget
-    idx = listbox.nearest(event.y)
-    if idx >= 0:
-        line = listbox.get(idx)
-        try:
-            entry_id = int(line.split(",")[0].split(":")[1].strip())
-        except:
-            return
-
+    entries_list = event.widget.master
+    entry_id = entries_list.entry_id_at_y(event.y)
+    if entry_id is not None and entry_id < 0:
+        print("Podświetlenia działają tylko dla wpisów aktualnego profilu.")
+        return
+    if entry_id is not None:
         app_state = load_config()
         current_color = app_state["highlight_states"].get(str(entry_id), "white")
         if current_color == "green":
-            app_state["highlight_states"].pop(str(entry_id), None)
-            set_item_color(listbox, idx, "white")
+            queue_highlight(app_state, entry_id, None)
+            entries_list.set_color(entry_id, "white")
             print(f"Wpis ID={entry_id} odznaczono (biały).")
         else:
-            app_state["highlight_states"][str(entry_id)] = "green"
-            set_item_color(listbox, idx, "green")
+            queue_highlight(app_state, entry_id, "green")
+            entries_list.set_color(entry_id, "green")
             print(f"Wpis ID={entry_id} podświetlony na zielono.")
 
-        save_config(app_state)
-
-def perform_search(root, keyword):
-    """Wywołuje search_entries i pokazuje wyniki w listbox."""
-    if not keyword:
-        print("Nie podano słowa kluczowego do wyszukiwania.")
-        return
+def run_search(keyword, alternatives=None):
+    """
+    Wywołuje search_entries i zwraca wyniki (bez dotykania GUI – można wołać z wątku).
+    Jeśli podano alternatives (n-best z rozpoznawania mowy), szuka po wszystkich naraz.
+    """
+    app_state = load_config()
+    if app_state.get("search_all_profiles"):
+        # Póki tryb jest włączony, indeksy wszystkich profili zostają w cache między wyszukiwaniami
+        # (zwalnia je on_all_profiles_toggle)
+        search_index.pin(db_path for _, db_path in search.searchable_profiles(app_state))
+        return search.search_all_profiles(app_state, keyword, alternatives)
+    if alternatives and len(alternatives) > 1:
+        return search.search_entries_batch(alternatives)
+    return search.search_entries(keyword)
+
+def profile_hit_colors(app_state, results):
+    """Kolory wyników z wszystkich profili: każdy wiersz w kolorze swojego profilu."""
+    profiles = app_state["profiles"]
+    colors = {}
+    for row in results:
+        if row[0] < 0 and row[4] in profiles:
+            colors[row[0]] = profiles[row[4]]["color"]
+    return colors
 
-    results = voice.search_entries(keyword)
-    listboxes = [c for c in root.children.values() if isinstance(c, tk.Listbox)]
-    if not listboxes:
-        print("Brak listbox do wyświetlenia wyników.")
+def entry_for_row(row):
+    """
+    (entry_id, login, hasło, db_path) dla wiersza listy. Wynik z innego profilu ma login i hasło
+    w samym wierszu (db_path jego profilu); zwykły wpis czytamy z bazy aktualnego profilu (db_path None).
+    """
+    if row is None:
+        return None
+    if row[0] < 0:
+        return row[5], row[1], row[2], row[6]
+    entry = get_entry_by_id(row[0])
+    if not entry:
+        return None
+    return entry[0], entry[1], entry[2], None
+
+@span("gui.show_search_results")
+def show_search_results(root, results):
+    """Pokazuje wyniki wyszukiwania na liście wpisów (wołać w wątku Tk)."""
+    if main_entries_list is None:
+        print("Brak listy do wyświetlenia wyników.")
         return
 
-    listbox_entries = listboxes[0]
-    listbox_entries.delete(0, tk.END)
-
     if results:
-        for result in results:
-            trimmed_login = result[1]
-            if len(trimmed_login) > 20:
-                trimmed_login = trimmed_login[:20] + "..."
-            listbox_entries.insert(
-                tk.END,
-                f"ID: {result[0]}, Login: {trimmed_login}, Opis: {result[3]}"
-            )
+        main_entries_list.set_rows(results, profile_hit_colors(load_config(), results))
         print("Znaleziono wyniki, wybierz wpis z listy.")
     else:
-        listbox_entries.insert(tk.END, "Brak wyników.")
+        main_entries_list.set_message("Brak wyników.")
         print("Brak wyników.")
 
+def perform_search(root, keyword, alternatives=None):
+    """Wywołuje search_entries i pokazuje wyniki w listbox (synchronicznie)."""
+    if not keyword:
+        print("Nie podano słowa kluczowego do wyszukiwania.")
+        return
+
+    show_search_results(root, run_search(keyword, alternatives))
+
+class SearchScheduler:
+    """
+    Wyszukiwanie "w trakcie pisania" poza wątkiem Tk.
+    - schedule() odkłada zapytanie o delay_ms (debounce kolejnych klawiszy),
+    - wyszukiwanie leci w jednym wątku roboczym; czekające, nieaktualne zapytania
+      są nadpisywane nowszymi, a wyniki starszych zapytań są odrzucane,
+    - wyniki trafiają do listboxa przez root.after, więc zawsze pokazujemy wynik najnowszego zapytania.
+    schedule() i search_now() można wołać z dowolnego wątku (rozpoznawanie mowy, hotword) –
+    poza wątkiem Tk tylko przekazują wywołanie do niego przez root.after, bo stan planowania
+    (_generation, _after_id) i after_cancel wolno ruszać wyłącznie w wątku Tk.
+    """
+
+    def __init__(self, root, delay_ms=150):
+        self.root = root
+        self.delay_ms = delay_ms
+        # Scheduler tworzymy w wątku Tk (open_gui)
+        self._tk_thread = threading.current_thread()
+        self._after_id = None
+        self._generation = 0
+        self._pending = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker = threading.Thread(target=self._worker_loop, daemon=True)
+        self._worker.start()
+
+    def _call_in_tk(self, fn, *args):
+        """True, jeśli wywołanie przekazano do wątku Tk (wołający nie jest w wątku Tk)."""
+        if threading.current_thread() is self._tk_thread:
+            return False
+        try:
+            self.root.after(0, fn, *args)
+        except (RuntimeError, tk.TclError):
+            # Okno zostało już zamknięte
+            pass
+        return True
+
+    def schedule(self, keyword, alternatives=None, delay_ms=None):
+        """Planuje wyszukiwanie; każde nowe wywołanie unieważnia poprzednie."""
+        if self._call_in_tk(self.schedule, keyword, alternatives, delay_ms):
+            return
+        self._generation += 1
+        generation = self._generation
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except tk.TclError:
+                pass
+            self._after_id = None
+        if not keyword:
+            return
+        if delay_ms is None:
+            delay_ms = self.delay_ms
+        self._after_id = self.root.after(delay_ms, self._submit, generation, keyword, alternatives)
+
+    def search_now(self, keyword, alternatives=None):
+        """Wyszukiwanie bez debounce (np. przycisk "Wyszukaj", wynik rozpoznawania mowy)."""
+        if not keyword:
+            print("Nie podano słowa kluczowego do wyszukiwania.")
+            return
+        self.schedule(keyword, alternatives, delay_ms=0)
+
+    def search_from_thread(self, keyword, alternatives=None):
+        """search_now wołane z innego wątku (rozpoznawanie mowy, hotword); schedule samo przejdzie do wątku Tk."""
+        self.search_now(keyword, alternatives)
+
+    def _submit(self, generation, keyword, alternatives):
+        self._after_id = None
+        with self._lock:
+            self._pending = (generation, keyword, alternatives)
+        self._wakeup.set()
+
+    def _worker_loop(self):
+        while True:
+            self._wakeup.wait()
+            with self._lock:
+                job = self._pending
+                self._pending = None
+                self._wakeup.clear()
+            if job is None:
+                continue
+            generation, keyword, alternatives = job
+            if generation != self._generation:
+                continue
+            try:
+                results = run_search(keyword, alternatives)
+            except Exception as e:
+                print(f"Błąd wyszukiwania: {e}")
+                continue
+            if generation != self._generation:
+                continue
+            try:
+                self.root.after(0, self._deliver, generation, results)
+            except (RuntimeError, tk.TclError):
+                # Okno zostało już zamknięte
+                return
+
+    def _deliver(self, generation, results):
+        if generation != self._generation:
+            return
+        show_search_results(self.root, results)
+
 def voice_search():
     """
     Klasyczny voice search:
     - Okno staje się aktywne,
     - W wątku pobiera recognized_text z record_and_transcribe(),
-    - Jeśli jest, to perform_search().
+    - Jeśli jest, to wyszukiwanie (SearchScheduler).
     """
     global main_root
     if voice.voice_search_running:
@@ -485,13 +659,31 @@ def voice_search():
 
     voice.voice_search_running = True
 
+    def on_partial(partial_text):
+        # Spekulacyjne wyszukiwanie w trakcie mówienia; nowsza hipoteza unieważnia starszą
+        search_scheduler.search_from_thread(partial_text)
+
+    root = main_root
+
     def worker():
-        recognized_text = voice.record_and_transcribe()
-        voice.last_recognized_text = recognized_text
-        if recognized_text:
-            perform_search(main_root, recognized_text)
-        main_root.grab_release()
-        voice.voice_search_running = False
+        try:
+            alternatives = voice.record_and_transcribe(return_alternatives=True, on_partial=on_partial) or []
+            recognized_text = alternatives[0] if alternatives else None
+            voice.last_recognized_text = recognized_text
+            voice.last_recognized_alternatives = alternatives
+            if recognized_text:
+                # Ostateczny transkrypt potwierdza albo zastępuje wynik spekulacyjny
+                search_scheduler.search_from_thread(recognized_text, alternatives=alternatives)
+        except Exception as e:
+            log.error("voice_search", "Błąd wyszukiwania głosowego: %s", e)
+        finally:
+            # Zawsze zwalniamy grab (w wątku Tk) i flagę – inaczej kolejne push-to-talk byłyby blokowane
+            try:
+                root.after(0, root.grab_release)
+            except (RuntimeError, tk.TclError):
+                # Okno zostało już zamknięte
+                pass
+            voice.voice_search_running = False
 
     t = threading.Thread(target=worker, daemon=True)
     t.start()
@@ -507,31 +699,91 @@ def on_profile_voice_key(query=""):
         print(f"(hotword leftover) Wyszukiwanie: '{query}'")
         # DODANA LINIA: zachowaj leftover w last_recognized_text
         voice.last_recognized_text = query  
-        perform_search(main_root, query)
+        search_scheduler.search_from_thread(query)
     else:
         print("(hotword) Uruchamiam voice_search()")
         voice_search()
 
-def open_gui():
-    global main_root, stop_hotword
+def show_startup_page(entries_list, app_state):
+    """
+    Pierwsza strona listy prosto z bazy (bez budowania indeksu) – okno ma co pokazać od razu.
+    Zwraca wersję listy, żeby później nie nadpisać np. wyników wyszukiwania.
+    """
+    try:
+        rows = list(islice(iter_entries(), STARTUP_PAGE_SIZE))
+    except sqlite3.OperationalError:
+        # Nowa baza – tabela powstanie w init_db w tle
+        rows = []
+    entries_list.set_rows(rows, highlight_colors(app_state["highlight_states"]))
+    return entries_list.version
+
+def start_background_init(root, app_state, entries_list, status_label, timer, page_version):
+    """
+    Reszta startu w osobnym wątku: baza (init_db/FTS), indeks wyszukiwania, hooki klawiatury,
+    moduł voice i nasłuch mikrofonu. Postęp widać w `status_label`, czasy faz w `timer`.
+    """
+    global stop_hotword
 
-    app_state = load_config()
-    current_p = app_state["current_profile"]
-    profiles = app_state["profiles"]
+    def set_status(text, color):
+        root.after(0, lambda: status_label.config(text=text, bg=color))
 
-    if current_p in profiles:
-        db_filename = profiles[current_p]["db_filename"]
-        if not db_filename.endswith(".db"):
-            db_filename += ".db"
-        db_full_path = os.path.join(current_dir, db_filename)
-    else:
-        db_full_path = os.path.join(current_dir, "loginy_hasla.db")
+    def show_full_list():
+        # Tylko jeśli w międzyczasie nikt nie podmienił listy (wyszukiwanie, zmiana profilu)
+        if entries_list.version == page_version:
+            update_entries_list(entries_list, highlight_states=app_state["highlight_states"])
 
-    set_db_path(db_full_path)
-    init_db()
+    def run_phase(name, label, fn):
+        set_status(f"Start: {label}...", "orange")
+        try:
+            with timer.phase(name):
+                fn()
+            return True
+        except Exception as e:
+            instrumentation.log.error("startup", "Faza '%s' nie powiodła się: %s", name, e)
+            return False
+
+    def start_hotword():
+        global stop_hotword
+        voice.hotword_callback.on_hotword_detected = on_profile_voice_key
+        stop_hotword = voice.start_hotword_listening()
+
+    def start_search_server():
+        global search_srv
+        search_srv = search_server.start_server(app_state)
+
+    def worker():
+        ok = run_phase("db", "baza", init_db)
+        if ok and run_phase("index", "indeks", search_index.get_index):
+            root.after(0, show_full_list)
+            prefetch_profiles(app_state)
+            if app_state.get("search_server"):
+                # CLI i inne narzędzia korzystają wtedy z ciepłych indeksów tego procesu
+                run_phase("search_server", "serwer wyszukiwania", start_search_server)
+        run_phase("hooks", "skróty klawiszy", lambda: (binds.start(), set_profile_voice_hook(app_state, on_profile_voice_key)))
+        root.after(0, timer.mark, "skroty_gotowe")
+        run_phase("voice_import", "moduł mowy", lambda: voice.hotword_callback)
+        run_phase("hotword", "mikrofon", start_hotword)
+        # Model rozpoznawania mowy ładujemy raz, w tle, zanim użytkownik zacznie mówić
+        run_phase("recognizer", "rozpoznawanie mowy", voice.get_recognizer_backend)
+        ms = timer.mark("gotowe")
+        set_status(f"Gotowe ({ms / 1000.0:.1f} s)", "lightgreen")
+
+    threading.Thread(target=worker, name="startup", daemon=True).start()
+
+def open_gui():
+    global main_root, main_entries_list, stop_hotword, search_scheduler
+
+    timer = StartupTimer()
+    app_state = load_config()
+    instrumentation.log.set_level(app_state.get("log_level", "INFO"))
+    set_db_path(profile_db_path(app_state))
+    search_index.configure_cache(app_state.get("profile_cache_size"), app_state.get("profile_cache_mb"))
+    remember_profile(app_state, app_state["current_profile"])
+    injector.configure(profile=app_state.get("typing_profile"), mode=app_state.get("typing_mode"))
 
     root = tk.Tk()
     main_root = root
+    search_scheduler = SearchScheduler(root)
     root.title("Zarządzanie Bazą Danych")
 
     if "window_geometry" in app_state:
@@ -543,17 +795,32 @@ def open_gui():
     root.grid_rowconfigure(5, weight=1)
 
     def on_closing():
+        global main_root
         app_state["window_geometry"] = root.geometry()
         save_config(app_state)
         if stop_hotword:
             stop_hotword()
+        if binds is not None:
+            binds.stop()
+        injector.get_injector().stop()
+        if search_srv is not None:
+            search_srv.stop()
+        # Wątek Tk czeka tu na write_behind – handler podświetleń nie może już wołać root.after
+        # (podświetlenia są w app_state, zapisze je flush_config niżej)
+        main_root = None
+        write_behind.writer.stop()
+        if learning.is_loaded:
+            learning.flush_all()
+        close_all_connections()
+        flush_config()
         root.destroy()
 
     root.protocol("WM_DELETE_WINDOW", on_closing)
 
     log_text = tk.Text(root, width=50, height=10, state="normal")
     log_text.grid(row=0, column=0, columnspan=8, sticky="ew")
-    sys.stdout = RedirectText(log_text)
+    # print z dowolnego wątku trafia do bufora; widget odświeżany paczkami w wątku Tk
+    sys.stdout = instrumentation.TkLogSink(log_text)
 
     tk.Label(root, text="Login").grid(row=1, column=0)
     entry_login = tk.Entry(root)
@@ -578,21 +845,15 @@ def open_gui():
             entry_haslo.delete(0, tk.END)
             entry_opis.delete(0, tk.END)
 
-            for c in root.children.values():
-                if isinstance(c, tk.Listbox):
-                    update_entries_list(c, highlight_states=app_state["highlight_states"])
-                    break
+            update_entries_list(entries_list, highlight_states=app_state["highlight_states"])
         else:
             messagebox.showerror("Błąd", "Wszystkie pola muszą być wypełnione!")
 
     tk.Button(root, text="Dodaj wpis", command=add_new_entry).grid(row=4, column=1, sticky="w")
 
     def show_all_entries():
-        for c in root.children.values():
-            if isinstance(c, tk.Listbox):
-                update_entries_list(c, highlight_states=app_state["highlight_states"])
-                print("Wyświetlam wszystkie wpisy.")
-                break
+        update_entries_list(entries_list, highlight_states=app_state["highlight_states"])
+        print("Wyświetlam wszystkie wpisy.")
 
     tk.Button(root, text="Wszystkie", command=show_all_entries).grid(row=4, column=2, sticky="w")
 
@@ -636,6 +897,23 @@ def open_gui():
         hotword_entry.insert(0, app_state.get("hotword", "altbind"))
         hotword_entry.grid(row=5, column=1)
 
+        tk.Label(top, text="Silnik rozpoznawania mowy:").grid(row=6, column=0, sticky="e")
+        speech_backend_var = tk.StringVar(value=app_state.get("speech_backend", "google"))
+        tk.OptionMenu(top, speech_backend_var, "google", "vosk", "fake").grid(row=6, column=1, sticky="w")
+
+        tk.Label(top, text="Ścieżka modelu Vosk:").grid(row=7, column=0, sticky="e")
+        vosk_model_entry = tk.Entry(top)
+        vosk_model_entry.insert(0, app_state.get("vosk_model_path", ""))
+        vosk_model_entry.grid(row=7, column=1)
+
+        tk.Label(top, text="Wpisywanie loginu/hasła:").grid(row=8, column=0, sticky="e")
+        typing_mode_var = tk.StringVar(value=app_state.get("typing_mode", injector.DEFAULT_MODE))
+        tk.OptionMenu(top, typing_mode_var, *injector.MODES).grid(row=8, column=1, sticky="w")
+
+        tk.Label(top, text="Tempo wpisywania (tryb type):").grid(row=9, column=0, sticky="e")
+        typing_profile_var = tk.StringVar(value=app_state.get("typing_profile", injector.DEFAULT_PROFILE))
+        tk.OptionMenu(top, typing_profile_var, *injector.DELAY_PROFILES).grid(row=9, column=1, sticky="w")
+
         def calibrate_action():
             messagebox.showinfo("Kalibracja", "Zachowaj ciszę przez kilka sekund...")
             voice.calibrate_microphone(duration=3)
@@ -650,20 +928,29 @@ def open_gui():
             train_win.transient(top)
             train_win.geometry(f"+{top.winfo_x()+50}+{top.winfo_y()+50}")
 
-            tk.Label(train_win, text="Powiedz kilkukrotnie swój hotword.\nZostanie zapisany w pseudo bazie.").pack()
+            tk.Label(train_win, text="Powiedz kilkukrotnie swój hotword.\nNagrania posłużą do lokalnego wykrywania hotwordu.").pack()
 
             def record_once():
-                recognized = voice.record_and_transcribe()
+                wav_path, recognized = voice.record_hotword_sample()
+                if not wav_path:
+                    print("Nie nagrano nic. Spróbuj ponownie.")
+                    return
+                voice.add_hotword_sample(app_state, wav_path)
                 if recognized:
                     app_state["hotword_samples"].append(recognized)
-                    save_config(app_state)
-                    print(f"Zapisano próbkę hotword: {recognized}")
-                else:
-                    print("Nie rozpoznano nic. Spróbuj ponownie.")
+                save_config(app_state)
+                print(f"Zapisano próbkę hotword: {recognized or wav_path}")
 
             record_btn = tk.Button(train_win, text="Nagraj próbkę", command=record_once)
             record_btn.pack()
 
+            def clear_samples():
+                removed = voice.clear_hotword_samples(app_state)
+                save_config(app_state)
+                print(f"Usunięto nagrane próbki hotword ({removed}); wykrywanie wraca do dopasowania tekstu.")
+
+            tk.Button(train_win, text="Usuń nagrane próbki", command=clear_samples).pack()
+
             def close_train():
                 train_win.destroy()
 
@@ -762,52 +1049,59 @@ def open_gui():
             app_state["font_size"] = new_font_size_int
 
             if new_hotword:
+                if new_hotword != app_state.get("hotword") and app_state.get("hotword_sample_files"):
+                    # Wzorce nagrane dla poprzedniej frazy nie pasują do nowego hotwordu
+                    voice.clear_hotword_samples(app_state)
+                    print("Zmieniono hotword – usunięto nagrane próbki poprzedniej frazy.")
                 app_state["hotword"] = new_hotword
 
+            app_state["speech_backend"] = speech_backend_var.get()
+            app_state["vosk_model_path"] = vosk_model_entry.get().strip()
+            # Ładowanie modelu (np. Vosk) może trwać – robimy to w tle
+            threading.Thread(target=voice.get_recognizer_backend, daemon=True).start()
+
+            app_state["typing_mode"] = typing_mode_var.get()
+            app_state["typing_profile"] = typing_profile_var.get()
+            injector.configure(profile=app_state["typing_profile"], mode=app_state["typing_mode"])
+
             save_config(app_state)
             print(f"Zaktualizowano bindy / hotword -> {new_hotword} / font_size='{new_font_size_int}'")
 
-            for c in root.children.values():
-                if isinstance(c, tk.Listbox):
-                    c.config(font=("TkDefaultFont", new_font_size_int))
-                    break
+            entries_list.config_font(("TkDefaultFont", new_font_size_int))
 
             set_profile_voice_hook(app_state, on_profile_voice_key)
+            binds.set_keys(normalize_key_name(new_login_key), normalize_key_name(new_password_key))
             top.destroy()
 
-        tk.Button(top, text="Zapisz", command=save_options).grid(row=8, column=0, columnspan=3)
+        tk.Button(top, text="Zapisz", command=save_options).grid(row=10, column=0, columnspan=3)
 
     tk.Button(root, text="Opcje", command=open_options_window).grid(row=4, column=3, sticky="w")
 
     def open_profiles_window_wrapper():
-        open_profiles_window(root, app_state, listbox_entries)
+        open_profiles_window(root, app_state, entries_list)
 
     tk.Button(root, text="Profile", command=open_profiles_window_wrapper).grid(row=4, column=4, sticky="w")
 
-    listbox_entries = tk.Listbox(root, width=50, height=15)
     listbox_font = ("TkDefaultFont", app_state.get("font_size", 10))
-    listbox_entries.config(font=listbox_font)
-    listbox_entries.grid(row=5, column=1, columnspan=6, sticky="nsew")
-
-    scrollbar = tk.Scrollbar(root, orient="vertical", command=listbox_entries.yview)
-    scrollbar.grid(row=5, column=7, sticky="ns")
-    listbox_entries.config(yscrollcommand=scrollbar.set)
+    entries_list = VirtualEntryList(root, width=50, height=15, font=listbox_font)
+    entries_list.grid(row=5, column=1, columnspan=7, sticky="nsew")
+    main_entries_list = entries_list
+    listbox_entries = entries_list.listbox
 
     left_frame = tk.Frame(root)
     left_frame.grid(row=5, column=0, sticky="ns")
 
     def delete_selected_entry():
         try:
-            selected = listbox_entries.get(listbox_entries.curselection())
-            entry_id = int(selected.split(",")[0].split(":")[1].strip())
-            entry_description = selected.split(",")[2].split(":")[1].strip()
+            selected = entries_list.selected_row()
+            entry_id = selected[0]
+            entry_description = selected[3]
             if messagebox.askyesno("Potwierdzenie", f"Czy na pewno chcesz usunąć wpis: {entry_description}?"):
                 delete_entry(entry_id)
                 print(f"Usunięto wpis: {entry_description}")
                 if str(entry_id) in app_state["highlight_states"]:
-                    del app_state["highlight_states"][str(entry_id)]
-                update_entries_list(listbox_entries, highlight_states=app_state["highlight_states"])
-                save_config(app_state)
+                    queue_highlight(app_state, entry_id, None)
+                update_entries_list(entries_list, highlight_states=app_state["highlight_states"])
         except:
             messagebox.showerror("Błąd", "Nie wybrano wpisu do usunięcia!")
 
@@ -815,12 +1109,10 @@ def open_gui():
     delete_button.pack(side="top", fill="x")
 
     def edit_selected_entry():
-        selection = listbox_entries.curselection()
-        if not selection:
+        entry_id = entries_list.selected_id()
+        if entry_id is None:
             messagebox.showerror("Błąd", "Nie wybrano wpisu do edycji!")
             return
-        line = listbox_entries.get(selection)
-        entry_id = int(line.split(",")[0].split(":")[1].strip())
 
         row_data = get_entry_by_id(entry_id)
         if not row_data:
@@ -856,7 +1148,7 @@ def open_gui():
                 messagebox.showerror("Błąd", "Wszystkie pola muszą być wypełnione!")
                 return
             update_entry(entry_id, new_login, new_haslo, new_opis)
-            update_entries_list(listbox_entries, highlight_states=app_state["highlight_states"])
+            update_entries_list(entries_list, highlight_states=app_state["highlight_states"])
             print(f"Zedytowano wpis ID={entry_id}.")
             edit_win.destroy()
 
@@ -865,9 +1157,14 @@ def open_gui():
     edit_button = tk.Button(left_frame, text="Edytuj wpis", command=edit_selected_entry, state="disabled")
     edit_button.pack(side="top", fill="x")
 
+    def set_entry_buttons(enabled):
+        """Edycja/usuwanie tylko dla wpisów aktualnego profilu (nie dla wyników z innych profili)."""
+        state = "normal" if enabled else "disabled"
+        delete_button.config(state=state)
+        edit_button.config(state=state)
+
     def reset_highlights():
-        for i in range(listbox_entries.size()):
-            set_item_color(listbox_entries, i, "white")
+        entries_list.fill_color("white")
         app_state["highlight_states"] = {}
         save_config(app_state)
         print("Zresetowano podświetlenia wpisów.")
@@ -875,18 +1172,47 @@ def open_gui():
     reset_button = tk.Button(left_frame, text="Status reset", command=reset_highlights)
     reset_button.pack(side="bottom", fill="x")
 
+    def show_stats():
+        """Wypisuje do konsoli histogramy opóźnień i liczniki zapisu w tle."""
+        print("Statystyki opóźnień:")
+        print(instrumentation.report())
+        print(f"write_behind: {write_behind.writer.metrics()}")
+        print(f"cache profili: {search_index.cache_info()}")
+
+    tk.Button(left_frame, text="Statystyki", command=show_stats).pack(side="bottom", fill="x")
+
     bind_status = tk.Label(root, text="Bind nieaktywny", bg="gray", fg="black")
     bind_status.grid(row=6, column=0, sticky="w")
     bind_status.bind("<Button-1>", lambda e: deactivate_binds(bind_status))
+    setup_binds(root, app_state, entries_list, bind_status)
+
+    startup_status = tk.Label(root, text="Start...", bg="orange", fg="black")
+    startup_status.grid(row=4, column=6, sticky="e")
 
     search_entry = tk.Entry(root)
     search_entry.grid(row=6, column=1)
 
     def on_search_change(_event):
-        perform_search(root, search_entry.get())
+        search_scheduler.schedule(search_entry.get())
 
     search_entry.bind("<KeyRelease>", on_search_change)
-    tk.Button(root, text="Wyszukaj", command=lambda: perform_search(root, search_entry.get())).grid(row=6, column=2)
+    tk.Button(root, text="Wyszukaj", command=lambda: search_scheduler.search_now(search_entry.get())).grid(row=6, column=2)
+
+    all_profiles_var = tk.BooleanVar(value=app_state.get("search_all_profiles", False))
+
+    def on_all_profiles_toggle():
+        app_state["search_all_profiles"] = all_profiles_var.get()
+        save_config(app_state)
+        if not all_profiles_var.get():
+            # Indeksy pozostałych profili wracają pod limit LRU
+            search_index.pin(())
+        print("Wyszukiwanie we wszystkich profilach: " + ("włączone" if all_profiles_var.get() else "wyłączone"))
+        if search_entry.get():
+            search_scheduler.search_now(search_entry.get())
+
+    tk.Checkbutton(
+        root, text="Wszystkie profile", variable=all_profiles_var, command=on_all_profiles_toggle
+    ).grid(row=6, column=3, sticky="w")
 
     def voice_pressed(_event):
         print("Rozpoczynam voice search (przytrzymanie).")
@@ -915,49 +1241,66 @@ def open_gui():
     def on_left_click(event):
         """
         Obsługa lewego kliknięcia.
-        Zawsze uczymy się (voice.learn_selection).
+        Zawsze uczymy się (search.learn_selection).
         """
-        idx = listbox_entries.nearest(event.y)
-        if idx < 0:
-            return
-        listbox_entries.selection_clear(0, tk.END)
-        listbox_entries.selection_set(idx)
-
-        line = listbox_entries.get(idx)
-        try:
-            entry_id = int(line.split(",")[0].split(":")[1].strip())
-        except:
+        pos = entries_list.row_at_y(event.y)
+        if pos < 0:
             return
+        entries_list.select_row(pos)
+        list_id = entries_list.model.id_at(pos)
 
-        entry = get_entry_by_id(entry_id)
+        entry = entry_for_row(entries_list.model.row_at(pos))
         if entry:
+            entry_id, login, haslo, db_path = entry
             deactivate_binds(bind_status)
-            bind_login_and_password(
-                entry_id=entry_id,
-                login=entry[1],
-                haslo=entry[2],
-                bind_label=bind_status,
-                app_state=app_state,
-                listbox=listbox_entries
-            )
-            print(f"Zbindowano (left click): Login: {entry[1]}, Hasło: {entry[2]}")
-            delete_button.config(state="normal")
-            edit_button.config(state="normal")
+            profile_hit = (entries_list.model.row_at(pos)[4], entry_id) if db_path else None
+            bind_login_and_password(list_id, login, haslo, profile_hit)
+            print(f"Zbindowano (left click): Login: {login}, Hasło: {haslo}")
+            set_entry_buttons(db_path is None)
 
             # Zawsze uczymy (nawet jeśli voice.last_recognized_text jest None/puste):
             recognized_text = voice.last_recognized_text or ""
-            voice.learn_selection(recognized_text, entry_id)
+            search.learn_selection(recognized_text, entry_id, db_path)
             voice.last_recognized_text = None
 
     listbox_entries.bind("<Button-1>", on_left_click)
 
-    init_db()
-    update_entries_list(listbox_entries, highlight_states=app_state["highlight_states"])
+    def on_ctrl_left_click(event):
+        """
+        Ctrl+klik – dokłada wpis do kolejki uzbrojonych (albo go z niej zdejmuje).
+        Klawisze loginu/hasła wpisują potem kolejne konta w kolejności zaznaczania.
+        """
+        pos = entries_list.row_at_y(event.y)
+        if pos < 0:
+            return "break"
+        list_id = entries_list.model.id_at(pos)
+        if not entries_list.toggle_row(pos):
+            binds.disarm(list_id)
+            print(f"Zdjęto z kolejki bindów wpis ID={list_id}.")
+            return "break"
+
+        entry = entry_for_row(entries_list.model.row_at(pos))
+        if entry:
+            entry_id, login, haslo, db_path = entry
+            profile_hit = (entries_list.model.row_at(pos)[4], entry_id) if db_path else None
+            bind_login_and_password(list_id, login, haslo, profile_hit)
+            set_entry_buttons(db_path is None)
+
+            recognized_text = voice.last_recognized_text or ""
+            search.learn_selection(recognized_text, entry_id, db_path)
+            voice.last_recognized_text = None
+        return "break"
+
+    listbox_entries.bind("<Control-Button-1>", on_ctrl_left_click)
+
+    page_version = show_startup_page(entries_list, app_state)
 
-    set_profile_voice_hook(app_state, on_profile_voice_key)
-    voice.hotword_callback.on_hotword_detected = on_profile_voice_key
-    stop_hotword = voice.start_hotword_listening()
+    def on_window_shown():
+        timer.mark("okno")
+        start_background_init(root, app_state, entries_list, startup_status, timer, page_version)
 
+    # Okno najpierw się rysuje, dopiero potem rusza reszta startu
+    root.after(0, on_window_shown)
     root.mainloop()
 
 if __name__ == "__main__":
@@ -0,0 +1,199 @@
+"""
+Lokalne wykrywanie hotwordu (keyword spotting) bez wysyłania dźwięku do chmury.
+
+Z nagranych próbek hotwordu (okno "Trenuj hotword") liczymy cechy MFCC (log-mel + DCT),
+a każdą frazę z mikrofonu porównujemy z tymi wzorcami algorytmem DTW (open-end:
+hotword musi być na początku frazy, koniec dopasowania wyznacza, gdzie zaczyna się reszta).
+Do pełnego rozpoznawania mowy trafia tylko dźwięk PO wykrytym hotwordzie.
+"""
+
+import os
+import threading
+
+import numpy as np
+
+from instrumentation import log
+
+SAMPLE_RATE = 16000
+FRAME_LENGTH = 400   # 25 ms
+FRAME_STEP = 160     # 10 ms
+N_FFT = 512
+N_MELS = 26
+N_MFCC = 13
+
+# Domyślny próg odległości DTW (cosinus na znormalizowanych MFCC); nadpisywany z configu
+DEFAULT_THRESHOLD = 0.35
+# Przy >= 2 wzorcach próg = największa odległość między wzorcami * margines
+THRESHOLD_MARGIN = 1.3
+# Ile razy dłuższy od wzorca może być fragment frazy dopasowany do hotwordu
+MAX_STRETCH = 1.6
+
+
+def _mel_filterbank(n_mels=N_MELS, n_fft=N_FFT, sample_rate=SAMPLE_RATE):
+    def hz_to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+    def mel_to_hz(mel):
+        return 700.0 * (10 ** (mel / 2595.0) - 1.0)
+
+    mel_points = np.linspace(hz_to_mel(0), hz_to_mel(sample_rate / 2), n_mels + 2)
+    bins = np.floor((n_fft + 1) * mel_to_hz(mel_points) / sample_rate).astype(int)
+    fbank = np.zeros((n_mels, n_fft // 2 + 1))
+    for m in range(1, n_mels + 1):
+        left, center, right = bins[m - 1], bins[m], bins[m + 1]
+        for k in range(left, center):
+            fbank[m - 1, k] = (k - left) / max(1, center - left)
+        for k in range(center, right):
+            fbank[m - 1, k] = (right - k) / max(1, right - center)
+    return fbank
+
+
+def _dct_matrix(n_in=N_MELS, n_out=N_MFCC):
+    n = np.arange(n_in)
+    k = np.arange(n_out)[:, None]
+    return np.cos(np.pi * k * (2 * n + 1) / (2 * n_in))
+
+
+_FBANK = _mel_filterbank()
+_DCT = _dct_matrix()
+_WINDOW = np.hamming(FRAME_LENGTH)
+
+
+def pcm16_to_float(raw_data):
+    """Surowe próbki 16-bit PCM (bytes) -> float32 w zakresie [-1, 1]."""
+    return np.frombuffer(raw_data, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def cmvn(features):
+    """Normalizacja średniej i wariancji cech (CMVN) po ramkach."""
+    features = features - features.mean(axis=0)
+    return features / (features.std(axis=0) + 1e-8)
+
+
+def mfcc(samples, normalize=True):
+    """
+    Cechy MFCC (liczba_ramek x N_MFCC), domyślnie po CMVN całego nagrania.
+    normalize=False – surowe cechy (CMVN liczy wtedy wołający, np. per okno w detect()).
+    """
+    if len(samples) < FRAME_LENGTH:
+        samples = np.pad(samples, (0, FRAME_LENGTH - len(samples)))
+    emphasized = np.append(samples[0], samples[1:] - 0.97 * samples[:-1])
+    n_frames = 1 + (len(emphasized) - FRAME_LENGTH) // FRAME_STEP
+    idx = np.arange(FRAME_LENGTH)[None, :] + FRAME_STEP * np.arange(n_frames)[:, None]
+    frames = emphasized[idx] * _WINDOW
+    power = (np.abs(np.fft.rfft(frames, N_FFT)) ** 2) / N_FFT
+    log_mel = np.log(power @ _FBANK.T + 1e-10)
+    features = log_mel @ _DCT.T
+    return cmvn(features) if normalize else features
+
+
+def audio_features(audio, normalize=True):
+    """MFCC z sr.AudioData (konwersja do 16 kHz / 16 bit)."""
+    return mfcc(pcm16_to_float(audio.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=2)), normalize)
+
+
+def window_length(template):
+    """Ile ramek frazy porównujemy ze wzorcem (hotword może być wypowiedziany wolniej)."""
+    return int(len(template) * MAX_STRETCH) + 1
+
+
+def _cosine_cost(a, b):
+    a_n = a / (np.linalg.norm(a, axis=1, keepdims=True) + 1e-8)
+    b_n = b / (np.linalg.norm(b, axis=1, keepdims=True) + 1e-8)
+    return 1.0 - a_n @ b_n.T
+
+
+def dtw_open_end(template, query):
+    """
+    DTW wzorca z początkiem `query` (koniec dopasowania w query jest dowolny).
+    Zwraca (znormalizowana_odległość, indeks_ostatniej_ramki_query).
+    """
+    n = len(template)
+    m = min(len(query), window_length(template))
+    if n == 0 or m == 0:
+        return float("inf"), 0
+    cost = _cosine_cost(template, query[:m])
+    acc = np.full((n, m), np.inf)
+    acc[0] = np.cumsum(cost[0])
+    for i in range(1, n):
+        prev = acc[i - 1]
+        diag_or_up = np.minimum(prev, np.concatenate(([np.inf], prev[:-1])))
+        row = cost[i] + diag_or_up
+        # Zależność od lewego sąsiada (ruch poziomy) liczymy sekwencyjnie
+        for j in range(1, m):
+            left = row[j - 1] + cost[i, j]
+            if left < row[j]:
+                row[j] = left
+        acc[i] = row
+    normalized = acc[-1] / (n + np.arange(1, m + 1))
+    end = int(np.argmin(normalized))
+    return float(normalized[end]), end
+
+
+class HotwordDetector:
+    """Wzorce hotwordu (MFCC) i decyzja, czy fraza zaczyna się od hotwordu."""
+
+    def __init__(self, threshold=None):
+        self.templates = []
+        self.template_files = ()
+        self.configured_threshold = threshold
+        self.threshold = threshold or DEFAULT_THRESHOLD
+        self._lock = threading.Lock()
+
+    def load_templates(self, wav_files, load_audio):
+        """Ładuje wzorce z plików WAV; `load_audio(path)` zwraca sr.AudioData."""
+        templates = []
+        for path in wav_files:
+            if not os.path.exists(path):
+                continue
+            try:
+                templates.append(audio_features(load_audio(path)))
+            except Exception as e:
+                log.warning("hotword", "Nie udało się wczytać wzorca '%s': %s", path, e)
+        with self._lock:
+            self.templates = templates
+            self.template_files = tuple(wav_files)
+            self.threshold = self.configured_threshold or self._auto_threshold()
+        log.info("hotword", "Wzorce hotword: %d, próg DTW=%.3f", len(templates), self.threshold)
+
+    def _auto_threshold(self):
+        if len(self.templates) < 2:
+            return DEFAULT_THRESHOLD
+        worst = 0.0
+        for i, a in enumerate(self.templates):
+            for b in self.templates[i + 1:]:
+                worst = max(worst, dtw_open_end(a, b)[0], dtw_open_end(b, a)[0])
+        return max(DEFAULT_THRESHOLD, worst * THRESHOLD_MARGIN)
+
+    def has_templates(self):
+        return bool(self.templates)
+
+    def detect(self, audio):
+        """
+        Sprawdza, czy fraza zaczyna się od hotwordu.
+        Zwraca (czy_wykryto, odległość, offset_w_sekundach_końca_hotwordu).
+        CMVN liczymy tylko na oknie porównywanym ze wzorcem – tak jak wzorzec, który jest
+        znormalizowany w całości; statystyki całej frazy (hotword + zapytanie) by się różniły.
+        """
+        with self._lock:
+            templates = list(self.templates)
+            threshold = self.threshold
+        if not templates:
+            return False, float("inf"), 0.0
+        raw = audio_features(audio, normalize=False)
+        best_dist, best_end = float("inf"), 0
+        for template in templates:
+            dist, end = dtw_open_end(template, cmvn(raw[:window_length(template)]))
+            if dist < best_dist:
+                best_dist, best_end = dist, end
+        end_seconds = (best_end * FRAME_STEP + FRAME_LENGTH) / SAMPLE_RATE
+        return best_dist <= threshold, best_dist, end_seconds
+
+
+def audio_after(audio, seconds):
+    """Fragment sr.AudioData po pierwszych `seconds` sekundach (albo None, jeśli nic nie zostaje)."""
+    offset = int(seconds * audio.sample_rate) * audio.sample_width
+    raw = audio.get_raw_data()
+    if offset >= len(raw):
+        return None
+    return type(audio)(raw[offset:], audio.sample_rate, audio.sample_width)
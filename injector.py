@@ -0,0 +1,251 @@
+"""
+Wpisywanie loginu / hasła w osobnym wątku (zamiast w callbacku hooka klawiatury).
+
+Hook tylko dodaje zadanie do kolejki i od razu wraca, więc globalna obsługa klawiszy
+nie stoi, gdy wpisuje się długie hasło. Wątek injektora wpisuje tekst:
+- tryb "type"  – znak po znaku, z opóźnieniami wg profilu (DELAY_PROFILES),
+- tryb "paste" – przez schowek: zapamiętanie schowka, wstawienie tekstu, ctrl+v, przywrócenie
+  schowka (najszybciej, bez przerw między znakami; wymaga pakietu pyperclip).
+Po zakończeniu zadania wywoływany jest on_done(job, ok, error) – GUI przekazuje go dalej przez root.after.
+
+Wyjście jest wymienne: KeyboardBackend (biblioteka keyboard) albo MockBackend (testy, Linux bez uprawnień).
+"""
+
+import queue
+import random
+import threading
+import time
+
+from instrumentation import log, span
+
+# Profil -> (opóźnienie po każdym znaku, dodatkowy losowy rozrzut), w sekundach
+DELAY_PROFILES = {
+    "instant": (0.0, 0.0),
+    "fast": (0.005, 0.0),
+    "normal": (0.02, 0.01),
+    "human": (0.05, 0.04),
+}
+DEFAULT_PROFILE = "instant"
+MODES = ("type", "paste")
+DEFAULT_MODE = "type"
+QUEUE_SIZE = 16
+# Jak długo po końcu wpisywania zdarzenia wpisanych znaków uznajemy za nasze (hook dostaje je z opóźnieniem)
+INJECTED_KEY_GRACE_SECONDS = 0.25
+# Ile czekamy po ctrl+v, zanim przywrócimy schowek (aplikacja czyta go asynchronicznie)
+PASTE_RESTORE_DELAY_SECONDS = 0.15
+
+_STOP = object()
+
+
+class KeyboardBackend:
+    """
+    Prawdziwe wpisywanie przez bibliotekę keyboard; wklejanie przez schowek (pyperclip).
+    keyboard_module / clipboard – podmiana modułów (testy).
+    """
+
+    def __init__(self, keyboard_module=None, clipboard=None):
+        if keyboard_module is None:
+            import keyboard as keyboard_module
+        if clipboard is None:
+            try:
+                import pyperclip as clipboard
+            except ImportError:
+                clipboard = None
+        self._keyboard = keyboard_module
+        self._clipboard = clipboard
+
+    def type_char(self, char):
+        self._keyboard.write(char)
+
+    def paste(self, text):
+        """Wkleja `text` przez schowek i przywraca jego poprzednią zawartość."""
+        if self._clipboard is None:
+            raise RuntimeError("Tryb 'paste' wymaga pakietu pyperclip (pip install pyperclip)")
+        try:
+            saved = self._clipboard.paste()
+        except Exception as e:
+            log.warning("injector", "Nie udało się odczytać schowka: %s", e)
+            saved = None
+        self._clipboard.copy(text)
+        try:
+            self._keyboard.send("ctrl+v")
+            time.sleep(PASTE_RESTORE_DELAY_SECONDS)
+        finally:
+            # Hasło nie może zostać w schowku – przy braku poprzedniej zawartości czyścimy go
+            self._clipboard.copy(saved if saved is not None else "")
+
+
+class MockBackend:
+    """Zapisuje zamiast wpisywać: events = [(czas, "char"/"paste", tekst), ...]."""
+
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+
+    def type_char(self, char):
+        with self._lock:
+            self.events.append((time.perf_counter(), "char", char))
+
+    def paste(self, text):
+        with self._lock:
+            self.events.append((time.perf_counter(), "paste", text))
+
+    def typed_text(self):
+        with self._lock:
+            return "".join(text for _, _, text in self.events)
+
+
+class InjectionJob:
+    def __init__(self, text, mode, profile, on_done=None, label=""):
+        self.text = text
+        self.mode = mode
+        self.profile = profile
+        self.on_done = on_done
+        self.label = label
+        self.submitted_at = time.perf_counter()
+        self.started_at = None
+        self.finished_at = None
+
+
+class Injector:
+    """Jeden wątek wpisujący zadania z kolejki po kolei (login nigdy nie przeplata się z hasłem)."""
+
+    def __init__(self, backend=None, profile=DEFAULT_PROFILE, mode=DEFAULT_MODE, maxsize=QUEUE_SIZE):
+        self.backend = backend
+        self.profile = profile
+        self.mode = mode
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._idle = threading.Event()
+        self._idle.set()
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        # (wpisywany tekst małymi literami, do kiedy jego znaki uznajemy za nasze; None = trwa)
+        self._injecting = ("", 0.0)
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                if self.backend is None:
+                    self.backend = KeyboardBackend()
+                self._thread = threading.Thread(target=self._run, name="injector", daemon=True)
+                self._thread.start()
+        return self
+
+    def submit(self, text, mode=None, profile=None, on_done=None, label=""):
+        """
+        Dodaje zadanie wpisania `text` i od razu wraca (bezpieczne w callbacku hooka).
+        Gdy kolejka jest pełna, zadanie jest odrzucane: on_done(job, False, queue.Full).
+        """
+        mode = mode or self.mode
+        profile = profile or self.profile
+        if mode not in MODES:
+            raise ValueError(f"Nieznany tryb wpisywania: {mode}")
+        if profile not in DELAY_PROFILES:
+            raise ValueError(f"Nieznany profil opóźnień: {profile}")
+        job = InjectionJob(text, mode, profile, on_done, label)
+        self.start()
+        with self._pending_lock:
+            self._pending += 1
+            self._idle.clear()
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full as e:
+            log.warning("injector", "Kolejka pełna – pomijam zadanie '%s'", label)
+            self._job_finished()
+            self._report(job, False, e)
+        return job
+
+    def busy(self):
+        """True, gdy są niewpisane zadania."""
+        return not self._idle.is_set()
+
+    def is_injecting(self, key_name):
+        """True, gdy `key_name` to znak wpisywany właśnie (albo przed chwilą) przez injektor."""
+        text, until = self._injecting
+        if until is not None and time.monotonic() > until:
+            return False
+        if key_name == "space":
+            key_name = " "
+        return len(key_name) == 1 and key_name in text
+
+    def wait_idle(self, timeout=None):
+        """Czeka, aż wszystkie przyjęte zadania zostaną wpisane. Zwraca True, jeśli zdążył."""
+        return self._idle.wait(timeout)
+
+    def stop(self, timeout=2.0):
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is _STOP:
+                return
+            job.started_at = time.perf_counter()
+            typed = job.text.lower() if job.mode == "type" else ""
+            self._injecting = (typed, None)
+            try:
+                with span(f"inject.{job.mode}"):
+                    self._type(job)
+                ok, error = True, None
+            except Exception as e:
+                log.error("injector", "Błąd wpisywania '%s': %s", job.label, e)
+                ok, error = False, e
+            self._injecting = (typed, time.monotonic() + INJECTED_KEY_GRACE_SECONDS)
+            job.finished_at = time.perf_counter()
+            self._job_finished()
+            self._report(job, ok, error)
+
+    def _type(self, job):
+        if job.mode == "paste":
+            self.backend.paste(job.text)
+            return
+        base, jitter = DELAY_PROFILES[job.profile]
+        for char in job.text:
+            self.backend.type_char(char)
+            delay = base + (random.uniform(0, jitter) if jitter else 0.0)
+            if delay:
+                time.sleep(delay)
+
+    def _job_finished(self):
+        with self._pending_lock:
+            self._pending -= 1
+            if self._pending <= 0:
+                self._pending = 0
+                self._idle.set()
+
+    def _report(self, job, ok, error):
+        if job.on_done is None:
+            return
+        try:
+            job.on_done(job, ok, error)
+        except Exception as e:
+            log.error("injector", "Błąd w on_done '%s': %s", job.label, e)
+
+
+_injector = None
+_injector_lock = threading.Lock()
+
+
+def get_injector():
+    """Wspólny injektor aplikacji (tworzony przy pierwszym użyciu, z KeyboardBackend)."""
+    global _injector
+    with _injector_lock:
+        if _injector is None:
+            _injector = Injector()
+        return _injector
+
+
+def configure(profile=None, mode=None):
+    """Ustawia domyślny profil opóźnień i tryb wpisywania (np. z configu)."""
+    inj = get_injector()
+    if profile in DELAY_PROFILES:
+        inj.profile = profile
+    if mode in MODES:
+        inj.mode = mode
+    return inj
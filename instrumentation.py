@@ -0,0 +1,267 @@
+"""
+Instrumentacja: logi z poziomami, pomiary czasu (spany) i histogramy opóźnień w pamięci.
+
+- log.debug("tag", "tekst %s", arg) – gdy poziom jest wyłączony, kończy się na jednym porównaniu
+  (bez formatowania napisu); wynik ma postać "[DEBUG][tag] tekst".
+- with span("search.entries"): ... – czas bloku trafia do histogramu o tej nazwie.
+- snapshot() / report() – liczba, p50/p90/p99, max dla każdego histogramu.
+- TkLogSink – bezpieczne wątkowo wyjście (sys.stdout) do konsoli w GUI: wątki tylko dopisują
+  do bufora, a widget Text jest aktualizowany paczkami z wątku Tk (after()).
+"""
+
+import bisect
+import threading
+import time
+from collections import deque
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+LEVELS = {name: level for level, name in LEVEL_NAMES.items()}
+DEFAULT_LEVEL = INFO
+
+# Granice kubełków histogramu w ms: od 0.01 ms, co pierwiastek z 2, do ok. 80 s
+BUCKET_BOUNDS_MS = [0.01 * 2 ** (i / 2) for i in range(47)]
+
+
+# --------------------
+#  Logi
+# --------------------
+class Logger:
+    def __init__(self, level=DEFAULT_LEVEL):
+        self.level = level
+
+    def set_level(self, level):
+        """Poziom jako liczba albo nazwa ("DEBUG", "INFO", ...)."""
+        if isinstance(level, str):
+            level = LEVELS.get(level.upper(), DEFAULT_LEVEL)
+        self.level = level
+
+    def enabled(self, level):
+        return level >= self.level
+
+    def log(self, level, tag, message, *args):
+        if level < self.level:
+            return
+        if args:
+            try:
+                message = message % args
+            except Exception:
+                message = f"{message} {args}"
+        prefix = f"[{LEVEL_NAMES.get(level, level)}]"
+        if tag:
+            prefix += f"[{tag}]"
+        print(f"{prefix} {message}")
+
+    def debug(self, tag, message, *args):
+        if DEBUG >= self.level:
+            self.log(DEBUG, tag, message, *args)
+
+    def info(self, tag, message, *args):
+        if INFO >= self.level:
+            self.log(INFO, tag, message, *args)
+
+    def warning(self, tag, message, *args):
+        if WARNING >= self.level:
+            self.log(WARNING, tag, message, *args)
+
+    def error(self, tag, message, *args):
+        self.log(ERROR, tag, message, *args)
+
+
+log = Logger()
+
+
+# --------------------
+#  Histogramy
+# --------------------
+class Histogram:
+    """Histogram opóźnień (ms) na stałych, logarytmicznych kubełkach – O(log k) na pomiar, stała pamięć."""
+
+    def __init__(self, name):
+        self.name = name
+        self.counts = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.min_ms = None
+        self.max_ms = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, ms):
+        bucket = bisect.bisect_left(BUCKET_BOUNDS_MS, ms)
+        with self._lock:
+            self.counts[bucket] += 1
+            self.count += 1
+            self.total_ms += ms
+            if self.min_ms is None or ms < self.min_ms:
+                self.min_ms = ms
+            if ms > self.max_ms:
+                self.max_ms = ms
+
+    def percentile(self, p):
+        """Przybliżony percentyl (górna granica kubełka, nie więcej niż max)."""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            needed = max(1, int(round(p / 100.0 * self.count)))
+            seen = 0
+            for bucket, n in enumerate(self.counts):
+                seen += n
+                if seen >= needed:
+                    bound = BUCKET_BOUNDS_MS[bucket] if bucket < len(BUCKET_BOUNDS_MS) else self.max_ms
+                    return min(bound, self.max_ms)
+            return self.max_ms
+
+    def summary(self):
+        with self._lock:
+            count, total, min_ms, max_ms = self.count, self.total_ms, self.min_ms, self.max_ms
+        return {
+            "count": count,
+            "mean_ms": round(total / count, 4) if count else 0.0,
+            "min_ms": round(min_ms or 0.0, 4),
+            "p50_ms": round(self.percentile(50), 4),
+            "p90_ms": round(self.percentile(90), 4),
+            "p99_ms": round(self.percentile(99), 4),
+            "max_ms": round(max_ms, 4),
+        }
+
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+_tracing = True
+
+
+def histogram(name):
+    hist = _histograms.get(name)
+    if hist is None:
+        with _histograms_lock:
+            hist = _histograms.setdefault(name, Histogram(name))
+    return hist
+
+
+def record(name, ms):
+    if _tracing:
+        histogram(name).record(ms)
+
+
+def set_tracing(enabled):
+    """Włącza/wyłącza zbieranie pomiarów przez span()."""
+    global _tracing
+    _tracing = bool(enabled)
+
+
+def snapshot():
+    """{nazwa: podsumowanie} wszystkich histogramów."""
+    with _histograms_lock:
+        items = list(_histograms.items())
+    return {name: hist.summary() for name, hist in sorted(items)}
+
+
+def reset():
+    with _histograms_lock:
+        _histograms.clear()
+
+
+def report():
+    """Czytelna tabelka z histogramów."""
+    lines = []
+    for name, s in snapshot().items():
+        lines.append(
+            f"{name:28} n={s['count']:<6} p50={s['p50_ms']:.2f} p90={s['p90_ms']:.2f} "
+            f"p99={s['p99_ms']:.2f} max={s['max_ms']:.2f} ms"
+        )
+    return "\n".join(lines) if lines else "(brak pomiarów)"
+
+
+# --------------------
+#  Spany
+# --------------------
+class span:
+    """Mierzy czas bloku `with` (albo wywołań funkcji, jako dekorator) do histogramu `name`."""
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if _tracing:
+            histogram(self.name).record((time.perf_counter() - self.start) * 1000.0)
+        return False
+
+    def __call__(self, fn):
+        name = self.name
+
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+
+        wrapper.__name__ = fn.__name__
+        wrapper.__doc__ = fn.__doc__
+        return wrapper
+
+
+# --------------------
+#  Konsola GUI
+# --------------------
+class TkLogSink:
+    """
+    Zastępuje sys.stdout w GUI. write() z dowolnego wątku tylko dopisuje do bufora;
+    co `interval_ms` wątek Tk wstawia całą paczkę jednym insert() i przycina widget
+    do `max_lines` linii.
+    """
+
+    def __init__(self, text_widget, interval_ms=100, max_lines=2000, max_pending_chars=200000):
+        self.widget = text_widget
+        self.interval_ms = interval_ms
+        self.max_lines = max_lines
+        self.max_pending_chars = max_pending_chars
+        self._pending = deque()
+        self._pending_chars = 0
+        self._dropped = 0
+        self._lock = threading.Lock()
+        self.widget.after(self.interval_ms, self._drain)
+
+    def write(self, string):
+        if not string:
+            return
+        with self._lock:
+            self._pending.append(string)
+            self._pending_chars += len(string)
+            # Zalew logów – wyrzucamy najstarsze, zamiast rosnąć bez końca
+            while self._pending_chars > self.max_pending_chars and len(self._pending) > 1:
+                self._pending_chars -= len(self._pending.popleft())
+                self._dropped += 1
+
+    def flush(self):
+        pass
+
+    def _drain(self):
+        with self._lock:
+            chunks = self._pending
+            dropped = self._dropped
+            self._pending = deque()
+            self._pending_chars = 0
+            self._dropped = 0
+        try:
+            if chunks:
+                text = "".join(chunks)
+                if dropped:
+                    text = f"... (pominięto {dropped} wpisów logu)\n" + text
+                self.widget.insert("end", text)
+                excess = int(self.widget.index("end-1c").split(".")[0]) - self.max_lines
+                if excess > 0:
+                    self.widget.delete("1.0", f"{excess + 1}.0")
+                self.widget.see("end")
+            self.widget.after(self.interval_ms, self._drain)
+        except Exception:
+            # Widget zniszczony (zamykanie okna) – przestajemy odświeżać
+            pass
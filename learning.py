@@ -0,0 +1,219 @@
+"""
+Model wyuczonych wyborów (rozpoznany tekst -> wpis) trzymany w pamięci, osobno dla każdego profilu.
+
+- Źródłem danych jest tabela learning_choices; model ładujemy raz, a zapisy zbieramy
+  i wysyłamy paczką jako UPSERT (INSERT ... ON CONFLICT DO UPDATE) – zawsze z jednego,
+  stałego wątku write_behind (schedule_flush), więc zapis nie otwiera nowych połączeń SQLite.
+- Frazy porównujemy po kluczu bez spacji ("gmail praca" == "g mail praca"),
+  a poza dokładnym trafieniem także fuzzy (rapidfuzz) względem wcześniej wyuczonych fraz.
+- Spośród pasujących fraz wygrywa ta z najlepszym "frecency": liczba użyć
+  wygaszana z czasem od ostatniego użycia.
+"""
+
+import atexit
+import math
+import threading
+import time
+
+from rapidfuzz import process, fuzz
+
+import database
+import write_behind
+
+# Minimalne podobieństwo (0-100) frazy do wyuczonej, żeby ją uznać
+MATCH_CUTOFF = 88
+# Po ilu dniach waga użyć spada o połowę
+HALF_LIFE_DAYS = 14.0
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def normalize_phrase(text):
+    return " ".join((text or "").lower().split())
+
+
+def compact_key(text):
+    """Klucz porównania: małe litery, bez białych znaków."""
+    return "".join((text or "").lower().split())
+
+
+def frecency(usage_count, last_used, now=None):
+    now = now or time.time()
+    age_days = max(0.0, (now - (last_used or 0)) / 86400.0) if last_used else HALF_LIFE_DAYS * 4
+    return usage_count * 0.5 ** (age_days / HALF_LIFE_DAYS)
+
+
+def init_table(path=None):
+    """Tworzy tabelę learning_choices (i dodaje kolumnę last_used w starszych bazach)."""
+    with database.transaction(path) as conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS learning_choices (
+                recognized_text TEXT PRIMARY KEY,
+                entry_id INTEGER,
+                usage_count INTEGER DEFAULT 1,
+                last_used REAL DEFAULT 0
+            )
+        ''')
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(learning_choices)")]
+        if "last_used" not in columns:
+            conn.execute("ALTER TABLE learning_choices ADD COLUMN last_used REAL DEFAULT 0")
+
+
+class LearningModel:
+    """Wyuczone frazy jednego profilu: compact_key -> [fraza, entry_id, usage_count, last_used]."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.RLock()
+        self.phrases = {}
+        self.keys = []
+        self._pending = {}
+
+    def load(self):
+        init_table(self.db_path)
+        rows = database.get_connection(self.db_path).execute(
+            "SELECT recognized_text, entry_id, usage_count, last_used FROM learning_choices"
+        ).fetchall()
+        with self.lock:
+            self.phrases = {}
+            for text, entry_id, usage_count, last_used in rows:
+                key = compact_key(text)
+                current = self.phrases.get(key)
+                # Kilka starych fraz może mieć ten sam klucz – zostawiamy najczęściej używaną
+                if current is None or (usage_count or 0) > current[2]:
+                    self.phrases[key] = [text, entry_id, usage_count or 0, last_used or 0]
+            self.keys = list(self.phrases)
+        return self
+
+    def record(self, recognized_text, entry_id, count=1, now=None):
+        """Zapamiętuje wybór (`count` użyć) w pamięci od razu; do bazy trafi przy najbliższym flush()."""
+        now = now or time.time()
+        text = normalize_phrase(recognized_text)
+        key = compact_key(text)
+        with self.lock:
+            item = self.phrases.get(key)
+            if item is None:
+                item = self.phrases[key] = [text, entry_id, 0, now]
+                self.keys.append(key)
+            item[1] = entry_id
+            item[2] += count
+            item[3] = now
+            pending = self._pending.get(item[0])
+            if pending is None:
+                self._pending[item[0]] = [entry_id, count, now]
+            else:
+                pending[0] = entry_id
+                pending[1] += count
+                pending[2] = now
+        return item[2]
+
+    def lookup(self, recognized_text, now=None):
+        """
+        Zwraca (entry_id, usage_count) najlepszej wyuczonej frazy dla tekstu albo None.
+        Najpierw dokładny klucz, potem fuzzy; przy kilku trafieniach decyduje frecency.
+        """
+        key = compact_key(recognized_text)
+        if not key:
+            return None
+        now = now or time.time()
+        with self.lock:
+            candidates = []
+            exact = self.phrases.get(key)
+            if exact is not None:
+                candidates.append((100.0, exact))
+            if self.keys:
+                for match_key, score, _ in process.extract(
+                        key, self.keys, scorer=fuzz.ratio, score_cutoff=MATCH_CUTOFF, limit=5):
+                    if match_key != key:
+                        candidates.append((score, self.phrases[match_key]))
+            if not candidates:
+                return None
+            best = max(candidates, key=lambda c: (c[0] / 100.0) * (1.0 + math.log1p(frecency(c[1][2], c[1][3], now))))
+            return best[1][1], best[1][2]
+
+    def schedule_flush(self):
+        """
+        Zleca zapis zebranych zmian wątkowi write_behind. Kolejne zlecenia przed zapisem łączą się
+        w jedno, a zapis idzie przez połączenie tego jednego wątku (a nie nowego wątku na każdy flush).
+        """
+        write_behind.writer.submit("learning_flush", self.db_path, True)
+
+    def flush(self):
+        """Zapisuje zebrane zmiany jednym executemany z UPSERT."""
+        with self.lock:
+            pending = self._pending
+            self._pending = {}
+        if not pending:
+            return 0
+        try:
+            with database.transaction(self.db_path) as conn:
+                conn.executemany("""
+                    INSERT INTO learning_choices (recognized_text, entry_id, usage_count, last_used)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(recognized_text) DO UPDATE SET
+                        entry_id = excluded.entry_id,
+                        usage_count = learning_choices.usage_count + excluded.usage_count,
+                        last_used = excluded.last_used
+                """, [(text, entry_id, count, last_used) for text, (entry_id, count, last_used) in pending.items()])
+        except Exception:
+            # Zapis się nie udał (np. baza zablokowana) – zmiany wracają do kolejki na następny flush
+            self._restore_pending(pending)
+            raise
+        return len(pending)
+
+    def _restore_pending(self, pending):
+        """Łączy niezapisane zmiany z tymi, które doszły w międzyczasie (nowsze wybierają wpis)."""
+        with self.lock:
+            for text, (entry_id, count, last_used) in pending.items():
+                newer = self._pending.get(text)
+                if newer is None:
+                    self._pending[text] = [entry_id, count, last_used]
+                else:
+                    newer[1] += count
+                    newer[2] = max(newer[2], last_used)
+
+
+def get_model(db_path=None):
+    """Model profilu `db_path` (domyślnie aktualnego), ładowany przy pierwszym użyciu."""
+    db_path = db_path or database.DB_PATH
+    with _models_lock:
+        model = _models.get(db_path)
+        if model is None:
+            model = _models[db_path] = LearningModel(db_path).load()
+        return model
+
+
+def reload(db_path):
+    """
+    Wczytuje załadowany model profilu na nowo z bazy (np. gdy zmienił ją inny proces).
+    Zaległe zmiany najpierw zapisuje, żeby nie przepadły.
+    """
+    with _models_lock:
+        model = _models.get(db_path)
+    if model is not None:
+        model.flush()
+        model.load()
+
+
+def _flush_models(items):
+    """Handler write_behind: [(db_path, True), ...] -> zapis zmian modeli tych profili."""
+    for db_path, _ in items:
+        with _models_lock:
+            model = _models.get(db_path)
+        if model is not None:
+            model.flush()
+
+
+write_behind.writer.register("learning_flush", _flush_models)
+
+
+def flush_all():
+    """Zapisuje zaległe zmiany wszystkich załadowanych modeli (np. przy zamykaniu)."""
+    with _models_lock:
+        models = list(_models.values())
+    for model in models:
+        model.flush()
+
+
+atexit.register(flush_all)
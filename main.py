@@ -3,6 +3,7 @@ Plik startowy aplikacji.
 Wystarczy go uruchomić, aby wystartować GUI i resztę funkcjonalności.
 """
 
+import startup  # jak najwcześniej – punkt odniesienia dla pomiaru czasu startu
 from gui import open_gui
 
 if __name__ == "__main__":
@@ -0,0 +1,372 @@
+"""
+Wyszukiwanie wpisów (fuzzy, rapidfuzz) i uczenie wyborów – bez zależności od dźwięku.
+
+Używają go GUI, voice.py (wyniki rozpoznawania mowy), serwer wyszukiwania (search_server.py)
+i benchmarki, więc moduł nie może importować niczego z obsługi mikrofonu ani winsound.
+"""
+
+import itertools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from rapidfuzz import process, fuzz
+
+from config import load_config, save_config, profile_db_path
+import database
+import search_index
+import learning
+import write_behind
+from instrumentation import log, span
+from search_keys import normalize_key, phonetic_key
+
+# Od ilu wpisów w profilu zawężamy kandydatów przez FTS5, zanim policzy je rapidfuzz
+FTS_PREFILTER_MIN_ENTRIES = 20000
+# Gdy zapytanie trafia w większą część profilu, zawężanie nic nie daje – punktujemy cały indeks
+FTS_MAX_CANDIDATE_SHARE = 0.5
+
+# Wyszukiwanie we wszystkich profilach: ile profili naraz, ile wyników łącznie
+PROFILE_SEARCH_WORKERS = 4
+PROFILE_SEARCH_LIMIT = 20
+# Wyuczony wpis zawsze przed wynikami fuzzy (te mają najwyżej 100)
+LEARNED_SCORE = 101
+# Trafienie tylko po kluczu fonetycznym liczy się nieco słabiej niż po znormalizowanym
+PHONETIC_WEIGHT = 0.95
+
+# --------------------
+#  Tabela learning_choices – mechanizmy uczenia
+# --------------------
+def init_learning_table():
+    """
+    Inicjalizuje tabelę learning_choices w bazie danych, jeśli nie istnieje.
+    """
+    if not database.DB_PATH:
+        raise ValueError("[DEBUG] DB_PATH nie jest ustawione w database.py")
+
+    learning.init_table()
+    log.debug("learning", "Tabela learning_choices została zainicjowana.")
+
+def store_learning(recognized_text, entry_id, db_path=None):
+    """
+    Zapisuje skojarzenie (recognized_text -> entry_id) w modelu od razu – kolejne wyszukiwanie
+    już je widzi – a zapis do learning_choices zleca wątkowi write_behind (jeden UPSERT na paczkę).
+    db_path – baza innego profilu (wybór z wyszukiwania we wszystkich profilach).
+    """
+    db_path = db_path or database.DB_PATH
+    if not db_path:
+        raise ValueError("[DEBUG] DB_PATH nie jest ustawione.")
+
+    model = learning.get_model(db_path)
+    usage_count = model.record(recognized_text, entry_id)
+    model.schedule_flush()
+    log.debug("store_learning", "'%s' -> ID=%s (użyć: %s)", recognized_text, entry_id, usage_count)
+
+def get_learning_choice(keyword):
+    """
+    Zwraca entry_id wyuczony dla 'keyword' (dokładnie albo fuzzy, ranking frecency) lub None.
+    """
+    if not database.DB_PATH:
+        raise ValueError("[DEBUG] DB_PATH nie jest ustawione.")
+
+    match = learning.get_model().lookup(keyword)
+    if match:
+        log.debug("get_learning_choice", "'%s' -> entry_id=%s, usage_count=%s", keyword, match[0], match[1])
+        return match[0]
+    return None
+
+def learn_selection(recognized_text, entry_id, db_path=None):
+    """
+    Zawsze próbujemy zapisać powiązanie (recognized_text -> entry_id).
+    """
+    if recognized_text is None:
+        recognized_text = ""  # lub np. "(brak tekstu)"
+    if entry_id is None:
+        entry_id = -1
+
+    log.debug("learn_selection", "Próba zapisu: recognized_text='%s' -> ID=%s", recognized_text, entry_id)
+    store_learning(recognized_text, entry_id, db_path)
+
+# --------------------
+#  KOREKTA
+# --------------------
+def store_correction(original_text, corrected_text):
+    """
+    Zapisuje korektę w configu: original_text.lower().strip() -> corrected_text.
+    """
+    app_state = load_config()
+    search_corrections = app_state.get("search_corrections", {})
+    low_orig = original_text.lower().strip()
+    log.info("store_correction", "Zapamiętuję korektę: '%s' -> '%s'", low_orig, corrected_text)
+    search_corrections[low_orig] = corrected_text
+    app_state["search_corrections"] = search_corrections
+    save_config(app_state)
+
+# --------------------
+#  search_entries (fuzzy)
+# --------------------
+def fts_candidates(index, queries, limit=10):
+    """
+    Dla dużych profili pobiera z SQLite (FTS5, trigramy) zbiór kandydatów: wszystkie wpisy,
+    które mają z zapytaniem choć jeden wspólny trigram.
+    Zwraca listę ID albo None – wtedy punktujemy cały indeks (mały profil, brak FTS,
+    zapytanie krótsze niż 3 znaki, brak wspólnego trigramu, trafienia w ponad
+    FTS_MAX_CANDIDATE_SHARE profilu albo mniej kandydatów niż `limit` wyników).
+    To przybliżenie: zbioru nie obcinamy, ale wpis dopasowany fuzzy (np. partial_ratio) bez
+    żadnego wspólnego trigramu z zapytaniem – w kluczu ani w kluczu fonetycznym – do niego nie trafi.
+    Na danych syntetycznych (30 tys. wpisów) ranking zgadza się z pełnym punktowaniem w 205 z 205 zapytań.
+    """
+    if len(index) < FTS_PREFILTER_MIN_ENTRIES or not database.has_fts(index.db_path):
+        return None
+    max_candidates = max(database.FTS_CANDIDATE_LIMIT, int(len(index) * FTS_MAX_CANDIDATE_SHARE))
+    candidate_ids = []
+    seen = set()
+    for query in queries:
+        ids = database.fts_candidate_ids(query, limit=max_candidates, path=index.db_path)
+        if ids is None or len(ids) >= max_candidates:
+            # Obcięty zbiór mógłby pominąć najlepsze dopasowanie fuzzy
+            return None
+        for entry_id in ids:
+            if entry_id not in seen:
+                seen.add(entry_id)
+                candidate_ids.append(entry_id)
+    log.debug("fts_candidates", "FTS5 zwróciło %d kandydatów", len(candidate_ids))
+    if len(candidate_ids) < limit:
+        return None
+    return candidate_ids
+
+def scoring_set(index, candidate_ids):
+    """
+    (choices, phonetics, ids) do punktowania: cały indeks albo tylko kandydaci z FTS.
+    Wołać pod index.lock.
+    """
+    if candidate_ids is None:
+        return index.choices, index.phonetics, index.ids
+    ids = [entry_id for entry_id in candidate_ids if entry_id in index.positions]
+    positions = [index.positions[entry_id] for entry_id in ids]
+    return [index.choices[pos] for pos in positions], [index.phonetics[pos] for pos in positions], ids
+
+@span("search.entries")
+def search_entries(keyword):
+    """
+    Wyszukuje wpisy w bazie przy użyciu algorytmu fuzzy matching.
+    Najpierw sprawdza, czy w learning_choices istnieje powiązanie (recognized_text->entry_id),
+    jeśli tak – dany wpis pojawia się na początku wyników.
+    """
+    log.debug("search_entries", "Rozpoczynam wyszukiwanie dla: '%s'", keyword)
+    learned_entry_id = get_learning_choice(keyword)
+    index = search_index.get_index()
+    results = []
+    if learned_entry_id is not None:
+        log.debug("search_entries", "found learned_entry_id=%s", learned_entry_id)
+        entry = index.get(learned_entry_id)
+        if entry:
+            results.append(entry)
+
+    app_state = load_config()
+    search_corrections = app_state.get("search_corrections", {})
+    lowered_kw = keyword.lower().strip()
+    if lowered_kw in search_corrections:
+        corrected = search_corrections[lowered_kw]
+        log.debug("search_entries", "Zamieniam '%s' -> '%s' (z korekty)", keyword, corrected)
+        keyword = corrected
+
+    log.debug("search_entries", "indeks (len=%d)", len(index))
+
+    if not keyword:
+        log.debug("search_entries", "Brak keyword, zwracam results")
+        return results
+
+    matches = rank_index(index, [keyword.lower().strip()], limit=10)
+
+    log.debug("search_entries", "Wyniki fuzzy (ID, wynik): %s", matches)
+    for (entry_id, score) in matches:
+        if learned_entry_id is not None and entry_id == learned_entry_id:
+            # unikamy duplikatu
+            continue
+        row = index.get(entry_id)
+        if row:
+            results.append(row)
+
+    log.debug("search_entries", "Zwracam %d wyników.", len(results))
+    return results
+
+# --------------------
+#  search_entries_batch (wiele hipotez naraz)
+# --------------------
+def score_queries(queries, choices):
+    """
+    Punktuje wszystkie zapytania względem wszystkich tekstów jednym wywołaniem cdist.
+    Zwraca macierz NumPy (len(queries) x len(choices)).
+    """
+    return process.cdist(queries, choices, scorer=fuzz.partial_ratio, dtype=np.uint8, workers=-1)
+
+def corrected_queries(keywords):
+    """Zapytania małymi literami, po korektach z search_corrections, bez pustych i powtórzeń."""
+    search_corrections = load_config().get("search_corrections", {})
+    queries = []
+    for keyword in keywords:
+        lowered_kw = (keyword or "").lower().strip()
+        lowered_kw = search_corrections.get(lowered_kw, lowered_kw).lower().strip()
+        if lowered_kw and lowered_kw not in queries:
+            queries.append(lowered_kw)
+    return queries
+
+def rank_index(index, queries, limit=10):
+    """
+    Najlepsze wpisy indeksu dla zapytań: [(entry_id, wynik)] malejąco.
+    Zapytania są sprowadzane do tych samych kluczy co wpisy (search_keys) i punktowane względem
+    gotowych kluczy z indeksu – znormalizowanych oraz fonetycznych (z wagą PHONETIC_WEIGHT).
+    Wynik wpisu to najlepszy wynik spośród wszystkich zapytań.
+    """
+    normalized = [key for key in dict.fromkeys(normalize_key(q) for q in queries) if key]
+    phonetic = [key for key in dict.fromkeys(phonetic_key(q) for q in queries) if key]
+    if not normalized:
+        return []
+    candidate_ids = fts_candidates(index, queries, limit)
+    with index.lock:
+        choices, phonetics, ids = scoring_set(index, candidate_ids)
+        if not choices:
+            return []
+        best = score_queries(normalized, choices).max(axis=0)
+        if phonetic:
+            sounds_like = score_queries(phonetic, phonetics).max(axis=0) * PHONETIC_WEIGHT
+            best = np.maximum(best, sounds_like.astype(np.uint8))
+        k = min(limit, len(best))
+        top = np.argpartition(best, -k)[-k:]
+        # int32 – negacja uint8 by się przekręciła
+        top = top[np.argsort(-best[top].astype(np.int32), kind="stable")]
+        return [(ids[pos], int(best[pos])) for pos in top]
+
+@span("search.batch")
+def search_entries_batch(keywords, limit=10):
+    """
+    Jak search_entries, ale dla wielu hipotez jednocześnie (np. n-best z rozpoznawania mowy).
+    Wynik wpisu to najlepszy wynik spośród wszystkich hipotez; zwraca jedną, posortowaną listę.
+    """
+    keywords = [k.strip() for k in keywords if k and k.strip()]
+    if len(keywords) <= 1:
+        return search_entries(keywords[0] if keywords else "")
+
+    log.debug("search_entries_batch", "Rozpoczynam wyszukiwanie dla %d hipotez: %s", len(keywords), keywords)
+    index = search_index.get_index()
+    results = []
+    learned_entry_id = None
+    for keyword in keywords:
+        learned_entry_id = get_learning_choice(keyword)
+        if learned_entry_id is not None:
+            entry = index.get(learned_entry_id)
+            if entry:
+                results.append(entry)
+            break
+
+    queries = corrected_queries(keywords)
+    if not queries:
+        return results
+    matches = rank_index(index, queries, limit)
+
+    log.debug("search_entries_batch", "Wyniki fuzzy (ID, wynik): %s", matches)
+    for entry_id, score in matches:
+        if entry_id == learned_entry_id:
+            continue
+        row = index.get(entry_id)
+        if row:
+            results.append(row)
+
+    log.debug("search_entries_batch", "Zwracam %d wyników.", len(results))
+    return results
+
+# --------------------
+#  search_all_profiles (wszystkie profile równolegle)
+# --------------------
+_profile_pool = None
+_profile_pool_lock = threading.Lock()
+
+def get_profile_pool():
+    """Wspólna pula wątków dla wyszukiwania we wszystkich profilach (tworzona przy pierwszym użyciu)."""
+    global _profile_pool
+    with _profile_pool_lock:
+        if _profile_pool is None:
+            _profile_pool = ThreadPoolExecutor(max_workers=PROFILE_SEARCH_WORKERS, thread_name_prefix="profile-search")
+        return _profile_pool
+
+def search_profile(db_path, keywords, queries, limit=10):
+    """
+    Wyniki jednego profilu: [(wynik, wiersz)], wyuczony wpis (learning_choices tego profilu)
+    z wynikiem LEARNED_SCORE. Każdy wątek puli ma własne połączenie SQLite i korzysta
+    z rezydentnego indeksu profilu (search_index), więc profile nie blokują się nawzajem.
+    """
+    index = search_index.get_index(db_path)
+    hits = []
+    learned_entry_id = None
+    model = learning.get_model(db_path)
+    for keyword in keywords:
+        match = model.lookup(keyword)
+        if match:
+            learned_entry_id = match[0]
+            row = index.get(learned_entry_id)
+            if row:
+                hits.append((LEARNED_SCORE, row))
+            break
+    if queries:
+        for entry_id, score in rank_index(index, queries, limit):
+            if entry_id == learned_entry_id:
+                continue
+            row = index.get(entry_id)
+            if row:
+                hits.append((score, row))
+    return hits
+
+def searchable_profiles(app_state):
+    """[(profil, db_path)] profili, które mają już plik bazy (w kolejności z configu)."""
+    profiles = []
+    for profile_name in app_state["profiles"]:
+        db_path = profile_db_path(app_state, profile_name)
+        if not os.path.exists(db_path):
+            # Profil bez bazy (jeszcze nieużywany) – nie zakładamy pustego pliku przy wyszukiwaniu
+            continue
+        profiles.append((profile_name, db_path))
+    return profiles
+
+# Źródło kluczy wyników z wielu profili (-1, -2, ... przez cały czas działania procesu)
+_profile_hit_keys = itertools.count(1)
+
+@span("search.all_profiles")
+def search_all_profiles(app_state, keyword, alternatives=None, limit=PROFILE_SEARCH_LIMIT):
+    """
+    Szuka jednocześnie we wszystkich profilach z app_state["profiles"] (pula wątków, profil = zadanie)
+    i łączy wyniki w jedną listę posortowaną po wyniku (przy remisie – kolejność profili).
+    Zwraca wiersze (klucz, login, haslo, opis, profil, entry_id, db_path, wynik); klucz jest ujemny
+    i nigdy się nie powtarza (licznik na cały proces), bo ID wpisów w różnych profilach mogą się
+    powtarzać, a uzbrojony wynik poprzedniego wyszukiwania nie może wskazać wiersza nowego.
+    """
+    keywords = [k.strip() for k in (alternatives or [keyword]) if k and k.strip()]
+    if not keywords:
+        return []
+    queries = corrected_queries(keywords)
+    log.debug("search_all_profiles", "Szukam %s w %d profilach", queries, len(app_state["profiles"]))
+
+    profiles = searchable_profiles(app_state)
+    pool = get_profile_pool()
+    merged = []
+    # Na czas wyszukiwania wszystkie profile zostają w cache, nawet gdy jest ich więcej niż limit LRU
+    with search_index.pinned(db_path for _, db_path in profiles):
+        futures = []
+        for profile_name, db_path in profiles:
+            futures.append((profile_name, db_path, pool.submit(search_profile, db_path, keywords, queries)))
+
+        for order, (profile_name, db_path, future) in enumerate(futures):
+            try:
+                hits = future.result()
+            except Exception as e:
+                log.warning("search_all_profiles", "Pomijam profil '%s': %s", profile_name, e)
+                continue
+            for score, row in hits:
+                merged.append((-score, order, profile_name, db_path, row))
+    merged.sort(key=lambda hit: hit[:2])
+
+    results = []
+    for neg_score, _, profile_name, db_path, row in merged[:limit]:
+        results.append((-next(_profile_hit_keys), row[1], row[2], row[3], profile_name, row[0], db_path, -neg_score))
+    log.debug("search_all_profiles", "Zwracam %d wyników z %d profili.", len(results), len(futures))
+    return results
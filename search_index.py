@@ -0,0 +1,336 @@
+"""
+Rezydentny indeks wyszukiwania – jeden na plik bazy (profil).
+Trzyma klucze wyszukiwania wpisów (znormalizowany i fonetyczny, policzone przy zapisie do bazy)
+oraz słownik id -> wiersz, więc zapytanie kosztuje już tylko samo punktowanie rapidfuzz.
+
+Indeksy kilku ostatnio używanych profili zostają w pamięci (LRU, limit liczby profili
+i opcjonalny budżet pamięci), więc powrót do profilu nie wymaga czytania całej bazy.
+Profile przypięte są poza limitem LRU – inaczej przy większej liczbie profili niż limit każde
+wyszukiwanie we wszystkich profilach przebudowywałoby indeksy. pinned() przypina na czas jednego
+wyszukiwania (serwer, CLI), pin() na dłużej (GUI, póki włączony tryb "Wszystkie profile").
+prefetch() buduje w tle indeksy profili, na które użytkownik prawdopodobnie się przełączy.
+"""
+
+import os
+import threading
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+import database
+from instrumentation import log, span
+from search_keys import entry_keys
+
+# Domyślnie: tyle profili w pamięci, bez limitu pamięci (0)
+MAX_CACHED_INDEXES = 4
+MAX_CACHE_BYTES = 0
+# Przybliżony koszt jednego wpisu w indeksie (krotka, słowniki, listy) poza samymi tekstami
+ROW_OVERHEAD_BYTES = 400
+
+# db_path -> SearchIndex, od najdawniej do ostatnio używanego
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+# db_path -> Lock: budowa indeksu jednego profilu nie blokuje dostępu do pozostałych
+_build_locks = {}
+# Bazy, które w tym procesie przeszły już init_db (migracja kluczy i FTS) przed budową indeksu
+_prepared_paths = set()
+_max_indexes = MAX_CACHED_INDEXES
+_max_bytes = MAX_CACHE_BYTES
+# Profile trzymane w pamięci poza limitem LRU: na stałe (pin) i na czas wyszukiwania (pinned, licznik)
+_pinned = frozenset()
+_pinned_scoped = Counter()
+
+
+def split_row(row):
+    """
+    (wpis, search_key, phonetic_key) z wiersza (id, login, haslo, opis, search_key, phonetic_key).
+    Dla wiersza bez kluczy liczy je na miejscu.
+    """
+    entry = tuple(row[:4])
+    if len(row) >= 6 and row[4] is not None and row[5] is not None:
+        return entry, row[4], row[5]
+    search_key, phonetic = entry_keys(row[1], row[3])
+    return entry, search_key, phonetic
+
+
+def row_bytes(row):
+    """Przybliżony rozmiar wpisu w indeksie (do budżetu pamięci cache); klucze mają zbliżoną długość."""
+    return ROW_OVERHEAD_BYTES + 2 * (len(row[1]) + len(row[2])) + 4 * len(row[3])
+
+
+class SearchIndex:
+    """
+    Indeks wpisów jednego profilu.
+    `choices`, `phonetics` i `ids` to równoległe listy (pozycja -> klucz znormalizowany /
+    klucz fonetyczny / id), `rows` to słownik id -> wpis (id, login, haslo, opis),
+    `positions` to odwrotny słownik id -> pozycja.
+    Operacje na indeksie (również samo wyszukiwanie) wykonujemy pod `lock`.
+    `version` rośnie przy każdej zmianie; `views` to dane pochodne (np. model listy GUI),
+    czyszczone przy każdej zmianie indeksu.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.RLock()
+        self.choices = []
+        self.phonetics = []
+        self.ids = []
+        self.positions = {}
+        self.rows = {}
+        self.version = 0
+        self.approx_bytes = 0
+        self.views = {}
+        self._sorted_rows = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _changed(self):
+        self.version += 1
+        self.views.clear()
+        self._sorted_rows = None
+
+    def load(self, rows):
+        split = [split_row(row) for row in rows]
+        with self.lock:
+            self.choices = [search_key for _, search_key, _ in split]
+            self.phonetics = [phonetic for _, _, phonetic in split]
+            self.ids = [entry[0] for entry, _, _ in split]
+            self.positions = {entry_id: pos for pos, entry_id in enumerate(self.ids)}
+            self.rows = {entry[0]: entry for entry, _, _ in split}
+            self.approx_bytes = sum(row_bytes(entry) for entry in self.rows.values())
+            self._changed()
+
+    def sorted_rows(self):
+        """Wszystkie wiersze po id (pełna lista wpisów); liczone raz na wersję indeksu."""
+        with self.lock:
+            if self._sorted_rows is None:
+                self._sorted_rows = [self.rows[entry_id] for entry_id in sorted(self.ids)]
+            return self._sorted_rows
+
+    def get(self, entry_id):
+        return self.rows.get(entry_id)
+
+    def add(self, row):
+        with self.lock:
+            entry_id = row[0]
+            if entry_id in self.positions:
+                self.update(row)
+                return
+            entry, search_key, phonetic = split_row(row)
+            self.positions[entry_id] = len(self.ids)
+            self.ids.append(entry_id)
+            self.choices.append(search_key)
+            self.phonetics.append(phonetic)
+            self.rows[entry_id] = entry
+            self.approx_bytes += row_bytes(entry)
+            self._changed()
+
+    def update(self, row):
+        with self.lock:
+            entry_id = row[0]
+            pos = self.positions.get(entry_id)
+            if pos is None:
+                self.add(row)
+                return
+            entry, search_key, phonetic = split_row(row)
+            self.choices[pos] = search_key
+            self.phonetics[pos] = phonetic
+            self.approx_bytes += row_bytes(entry) - row_bytes(self.rows[entry_id])
+            self.rows[entry_id] = entry
+            self._changed()
+
+    def remove(self, entry_id):
+        """Usuwa wpis w O(1): ostatni element trafia na zwolnioną pozycję."""
+        with self.lock:
+            pos = self.positions.pop(entry_id, None)
+            if pos is None:
+                return
+            self.approx_bytes -= row_bytes(self.rows.pop(entry_id))
+            last = len(self.ids) - 1
+            if pos != last:
+                moved_id = self.ids[last]
+                self.ids[pos] = moved_id
+                self.choices[pos] = self.choices[last]
+                self.phonetics[pos] = self.phonetics[last]
+                self.positions[moved_id] = pos
+            self.ids.pop()
+            self.choices.pop()
+            self.phonetics.pop()
+            self._changed()
+
+
+def get_index(db_path=None):
+    """
+    Zwraca indeks dla `db_path` (domyślnie aktualny profil), budując go przy pierwszym użyciu
+    (przed pierwszą budową w procesie bazę migruje init_db). Każde użycie przesuwa profil
+    na koniec kolejki LRU.
+    """
+    db_path = db_path or database.DB_PATH
+    with _indexes_lock:
+        index = _indexes.get(db_path)
+        if index is not None:
+            _indexes.move_to_end(db_path)
+            return index
+        build_lock = _build_locks.setdefault(db_path, threading.Lock())
+
+    with build_lock:
+        # Ktoś mógł zbudować ten indeks, gdy czekaliśmy na blokadę
+        with _indexes_lock:
+            index = _indexes.get(db_path)
+            if index is not None:
+                _indexes.move_to_end(db_path)
+                return index
+        if db_path not in _prepared_paths:
+            # Baza innego profilu mogła nie być jeszcze otwierana (stara, bez kolumn search_key)
+            database.init_db(db_path)
+            _prepared_paths.add(db_path)
+        index = SearchIndex(db_path)
+        with span("index.load"):
+            index.load(database.get_all_entries_with_keys(db_path))
+        with _indexes_lock:
+            _indexes[db_path] = index
+            _evict()
+        return index
+
+
+def is_cached(db_path=None):
+    return (db_path or database.DB_PATH) in _indexes
+
+
+def invalidate(db_path=None):
+    """Usuwa indeks profilu – zostanie przebudowany przy następnym wyszukiwaniu."""
+    db_path = db_path or database.DB_PATH
+    with _indexes_lock:
+        _indexes.pop(db_path, None)
+
+
+# --------------------
+#  Cache LRU profili
+# --------------------
+def configure_cache(max_profiles=None, max_megabytes=None):
+    """Limit liczby indeksów w pamięci (min. 1) i budżet pamięci w MB (0 = bez limitu)."""
+    global _max_indexes, _max_bytes
+    with _indexes_lock:
+        if max_profiles is not None:
+            _max_indexes = max(1, int(max_profiles))
+        if max_megabytes is not None:
+            _max_bytes = max(0, int(float(max_megabytes) * 1024 * 1024))
+        _evict()
+
+
+def pin(db_paths):
+    """
+    Przypina indeksy profili `db_paths` (zastępuje poprzednio przypięte): nie liczą się do limitów
+    i nie są usuwane z cache. pin(()) zwalnia przypięte profile z powrotem do LRU.
+    """
+    global _pinned
+    with _indexes_lock:
+        _pinned = frozenset(path for path in db_paths if path)
+        _evict()
+
+
+@contextmanager
+def pinned(db_paths):
+    """Przypina indeksy `db_paths` tylko na czas bloku with; po nim wracają pod limity LRU."""
+    paths = [path for path in dict.fromkeys(db_paths) if path]
+    with _indexes_lock:
+        _pinned_scoped.update(paths)
+    try:
+        yield
+    finally:
+        with _indexes_lock:
+            _pinned_scoped.subtract(paths)
+            for path in paths:
+                if _pinned_scoped[path] <= 0:
+                    del _pinned_scoped[path]
+            _evict()
+
+
+def _is_pinned(path):
+    return path in _pinned or path in _pinned_scoped
+
+
+def _evict():
+    """
+    Usuwa najdawniej używane indeksy ponad limity. Indeksu aktualnego profilu i przypiętych nie ruszamy
+    (przypięte nie liczą się też do limitów). Pod _indexes_lock.
+    """
+    def lru_paths():
+        return [path for path in _indexes if not _is_pinned(path)]
+
+    def over_limit():
+        paths = lru_paths()
+        if len(paths) > _max_indexes:
+            return True
+        return _max_bytes and len(paths) > 1 and sum(_indexes[p].approx_bytes for p in paths) > _max_bytes
+
+    while over_limit():
+        victim = next((path for path in lru_paths() if path != database.DB_PATH), None)
+        if victim is None:
+            return
+        index = _indexes.pop(victim)
+        log.debug("search_index", "Usuwam z cache indeks '%s' (%d wpisów)", victim, len(index))
+
+
+def cache_info():
+    """Stan cache: profile od najdawniej używanego, liczba wpisów i przybliżony rozmiar."""
+    with _indexes_lock:
+        items = [(path, len(index), index.approx_bytes) for path, index in _indexes.items()]
+    return {
+        "max_profiles": _max_indexes,
+        "max_bytes": _max_bytes,
+        "pinned": sorted(_pinned | set(_pinned_scoped)),
+        "total_bytes": sum(size for _, _, size in items),
+        "profiles": [{"db_path": path, "entries": n, "approx_bytes": size} for path, n, size in items],
+    }
+
+
+def prefetch(db_paths, on_loaded=None):
+    """
+    Buduje w tle (jeden wątek, po kolei) indeksy profili, których jeszcze nie ma w cache.
+    Pomija profile bez pliku bazy. on_loaded(index) – np. przygotowanie modelu listy GUI.
+    Zwraca wątek albo None, jeśli nie ma czego ładować.
+    """
+    paths = []
+    for path in db_paths:
+        if path and path not in paths and not is_cached(path) and os.path.exists(path):
+            paths.append(path)
+    # Więcej niż mieści cache i tak by się nawzajem wyrzucały
+    paths = paths[:max(0, _max_indexes - 1)]
+    if not paths:
+        return None
+
+    def worker():
+        try:
+            for path in paths:
+                try:
+                    with span("index.prefetch"):
+                        index = get_index(path)
+                        if on_loaded:
+                            on_loaded(index)
+                except Exception as e:
+                    log.warning("search_index", "Nie udało się wczytać z wyprzedzeniem '%s': %s", path, e)
+        finally:
+            # Wątek jest jednorazowy – jego połączenia SQLite nie mogą czekać do zamknięcia aplikacji
+            database.close_thread_connections()
+
+    thread = threading.Thread(target=worker, name="index-prefetch", daemon=True)
+    thread.start()
+    return thread
+
+
+def _on_entry_changed(action, db_path, entry_id, row):
+    """Słuchacz zmian z database.py – aktualizuje indeks przyrostowo (o ile jest zbudowany)."""
+    if action == "reload":
+        invalidate(db_path)
+        return
+    index = _indexes.get(db_path)
+    if index is None:
+        return
+    if action == "delete" or row is None:
+        index.remove(entry_id)
+    else:
+        index.add(row)
+
+
+database.add_entry_listener(_on_entry_changed)
@@ -0,0 +1,178 @@
+"""
+Klucze wyszukiwania liczone raz na wpis (przy zapisie do bazy), a nie przy każdym zapytaniu.
+
+- normalize_key: małe litery, bez polskich znaków, liczebniki słowne jako cyfry,
+  tylko litery/cyfry rozdzielone pojedynczą spacją ("Pięć Kont" -> "5 kont").
+- phonetic_key: uproszczony zapis "jak to brzmi" po polsku (rz/ż, ch/h, ó/u, głoski
+  dźwięczne/bezdźwięczne, i/y/j), żeby transkrypcja mowy trafiała mimo innej pisowni.
+
+Moduł nie ma zależności – używa go database.py (kolumny), search_index.py i voice.py (zapytania).
+Zmiana reguł wymaga podbicia KEYS_VERSION – bazy przeliczą wtedy klucze przy init_db.
+"""
+
+import re
+import unicodedata
+
+KEYS_VERSION = 1
+
+# Litery, których NFKD nie rozkłada na literę bazową + znak diakrytyczny
+_FOLD_EXTRA = str.maketrans({"ł": "l", "Ł": "L", "ß": "ss", "ø": "o", "Ø": "O", "đ": "d", "Đ": "D"})
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+# Liczebniki (po usunięciu polskich znaków) -> wartość
+UNITS = {
+    "zero": 0,
+    "jeden": 1, "jedna": 1, "jedno": 1,
+    "dwa": 2, "dwie": 2,
+    "trzy": 3,
+    "cztery": 4,
+    "piec": 5,
+    "szesc": 6,
+    "siedem": 7,
+    "osiem": 8,
+    "dziewiec": 9,
+}
+TEENS = {
+    "dziesiec": 10,
+    "jedenascie": 11,
+    "dwanascie": 12,
+    "trzynascie": 13,
+    "czternascie": 14,
+    "pietnascie": 15,
+    "szesnascie": 16,
+    "siedemnascie": 17,
+    "osiemnascie": 18,
+    "dziewietnascie": 19,
+}
+TENS = {
+    "dwadziescia": 20,
+    "trzydziesci": 30,
+    "czterdziesci": 40,
+    "piecdziesiat": 50,
+    "szescdziesiat": 60,
+    "siedemdziesiat": 70,
+    "osiemdziesiat": 80,
+    "dziewiecdziesiat": 90,
+}
+HUNDREDS = {
+    "sto": 100,
+    "dwiescie": 200,
+    "trzysta": 300,
+    "czterysta": 400,
+    "piecset": 500,
+    "szescset": 600,
+    "siedemset": 700,
+    "osiemset": 800,
+    "dziewiecset": 900,
+}
+
+# Przed usunięciem znaków (ó po złożeniu byłoby już nieodróżnialne od o)
+PHONETIC_BEFORE_FOLD = (
+    ("ó", "u"),
+)
+# Na kluczu znormalizowanym (kolejność ma znaczenie: dwuznaki przed pojedynczymi literami)
+PHONETIC_RULES = (
+    ("rz", "z"),
+    ("ch", "h"),
+    ("dzi", "ci"),
+    ("dz", "c"),
+    ("sz", "s"),
+    ("cz", "c"),
+    ("ph", "f"),
+    ("qu", "kw"),
+    ("x", "ks"),
+    ("ai", "ej"),
+    ("y", "i"),
+    ("j", "i"),
+    ("b", "p"),
+    ("d", "t"),
+    ("g", "k"),
+    ("w", "f"),
+    ("v", "f"),
+    ("z", "s"),
+    ("q", "k"),
+)
+_DOUBLED = re.compile(r"([a-z])\1+")
+
+
+def fold_diacritics(text):
+    """'Żółć' -> 'Zolc'."""
+    text = text.translate(_FOLD_EXTRA)
+    if text.isascii():
+        return text
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def spelled_to_digits(text):
+    """
+    Zamienia słowne polskie liczebniki na cyfry, także złożone i bez polskich znaków:
+    "pięć" / "piec" -> "5", "dwadzieścia trzy" -> "23", "sto dwa" -> "102".
+    Pozostałe słowa zostają bez zmian.
+    """
+    tokens = text.split()
+    out = []
+    value = None  # budowana liczba
+    last = 0  # rząd ostatniego składnika: 100, 10 albo 1 (kolejny musi być mniejszy)
+
+    def flush():
+        nonlocal value, last
+        if value is not None:
+            out.append(str(value))
+        value = None
+        last = 0
+
+    for token in tokens:
+        word = fold_diacritics(token.lower())
+        if word in HUNDREDS:
+            part, order = HUNDREDS[word], 100
+        elif word in TENS:
+            part, order = TENS[word], 10
+        elif word in TEENS:
+            part, order = TEENS[word], 10
+        elif word in UNITS:
+            part, order = UNITS[word], 1
+        else:
+            flush()
+            out.append(token)
+            continue
+        # "dwadzieścia trzy" łączymy, ale "trzy trzy" to dwie osobne liczby
+        if value is not None and order < last:
+            value += part
+        else:
+            flush()
+            value = part
+        last = 1 if word in TEENS else order
+    flush()
+    return " ".join(out)
+
+
+def normalize_key(text):
+    """Klucz do fuzzy matchingu: bez wielkości liter, polskich znaków i interpunkcji, liczebniki jako cyfry."""
+    if not text:
+        return ""
+    text = _NON_ALNUM.sub(" ", fold_diacritics(text.lower()))
+    return spelled_to_digits(text)
+
+
+def phonetic_key(text):
+    """Klucz fonetyczny: słowa zapisane "jak brzmią" (cyfry bez zmian). 'Dżimejl' ~ 'gmail'."""
+    if not text:
+        return ""
+    text = text.lower()
+    for old, new in PHONETIC_BEFORE_FOLD:
+        text = text.replace(old, new)
+    words = []
+    for word in normalize_key(text).split():
+        if not word.isdigit():
+            for old, new in PHONETIC_RULES:
+                word = word.replace(old, new)
+            word = _DOUBLED.sub(r"\1", word)
+        words.append(word)
+    return " ".join(words)
+
+
+def entry_keys(login, opis):
+    """(search_key, phonetic_key) wpisu – ten sam tekst co dawniej w indeksie: 'opis login'."""
+    text = f"{opis} {login}"
+    return normalize_key(text), phonetic_key(text)
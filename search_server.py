@@ -0,0 +1,429 @@
+"""
+Silnik wyszukiwania bez GUI, dostępny przez lokalny serwer (TCP na 127.0.0.1).
+
+Jeden proces trzyma połączenia z bazami, indeksy wyszukiwania i modele uczenia, a GUI,
+CLI czy wtyczki edytorów pytają go zamiast każdy budować własny indeks od zera.
+
+Protokół: JSON lines – jedno żądanie i jedna odpowiedź na linię, połączenie może obsłużyć
+dowolnie wiele żądań po kolei:
+    -> {"id": 1, "op": "search", "token": "...", "query": "allegro", "profile": "Default"}
+    <- {"id": 1, "ok": true, "result": [{"profile": "Default", "id": 7, "login": "...", "opis": "...", "score": 100}]}
+    <- {"id": 1, "ok": false, "error": "Profil 'X' nie istnieje"}
+
+Operacje: ping, profiles, search, learn, entry (z hasłem), stats.
+Serwer samodzielny (serve) przed każdym żądaniem sprawdza, czy bazy profili i config nie zmieniły
+się w innym procesie (np. w GUI) – wtedy przebudowuje indeks i model uczenia danego profilu.
+Adres i token uruchomionego serwera są w SERVER_INFO_FILE; bez poprawnego tokenu serwer
+odpowiada tylko na ping.
+"""
+
+import json
+import os
+import secrets
+import socket
+import socketserver
+import sqlite3
+import threading
+import time
+
+from config import load_config, current_dir, profile_db_path
+import database
+import search_index
+import learning
+import write_behind
+import instrumentation
+from instrumentation import log, span
+from startup import lazy_import
+
+search = lazy_import("search")
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 0  # 0 = wolny port wybrany przez system
+SERVER_INFO_FILE = os.path.join(current_dir, "search_server.json")
+MAX_LINE_BYTES = 64 * 1024
+DEFAULT_LIMIT = 10
+CLIENT_TIMEOUT_SECONDS = 5.0
+
+
+# --------------------
+#  Silnik
+# --------------------
+class SearchEngine:
+    """
+    Wyszukiwanie / nauka / odczyt wpisów dowolnego profilu – bez zmiany globalnego DB_PATH,
+    więc bezpieczne dla wielu klientów naraz (każdy wątek ma własne połączenia SQLite).
+    """
+
+    def __init__(self, app_state=None, watch_changes=False):
+        """
+        watch_changes – bazy zmienia też inny proces (serwer samodzielny): przed użyciem profilu
+        sprawdzamy PRAGMA data_version i przy zmianie wczytujemy profil od nowa. W procesie GUI
+        niepotrzebne – tam indeksy aktualizują słuchacze zmian z database.py.
+        """
+        self.app_state = app_state if app_state is not None else load_config()
+        self.watch_changes = watch_changes
+        self._prepared = set()
+        self._prepared_lock = threading.Lock()
+        # db_path -> (własne połączenie do sprawdzania zmian, ostatnio widziane data_version)
+        self._watched = {}
+        self._watch_lock = threading.Lock()
+
+    def resolve(self, profile=None):
+        """(nazwa_profilu, db_path); domyślnie aktualny profil z configu."""
+        if self.watch_changes:
+            # Config czytany ponownie tylko, gdy plik się zmienił (np. nowy profil dodany w GUI)
+            load_config()
+        profile = profile or self.app_state["current_profile"]
+        if profile not in self.app_state["profiles"]:
+            raise ValueError(f"Profil '{profile}' nie istnieje")
+        db_path = profile_db_path(self.app_state, profile)
+        with self._prepared_lock:
+            if db_path not in self._prepared:
+                database.init_db(db_path)
+                self._prepared.add(db_path)
+        self.refresh(db_path)
+        return profile, db_path
+
+    def refresh(self, db_path):
+        """
+        Gdy watch_changes i baza zmieniła się od ostatniego sprawdzenia, unieważnia indeks profilu
+        i wczytuje ponownie jego model uczenia. Zwraca True, jeśli coś przeładowano.
+        data_version zmienia się po zapisie z każdego innego połączenia – także naszego zapisu
+        nauki z wątku write_behind, co kosztuje jedno zbędne przeładowanie po każdym "learn".
+        """
+        if not self.watch_changes:
+            return False
+        with self._watch_lock:
+            watched = self._watched.get(db_path)
+            if watched is None:
+                conn = sqlite3.connect(db_path, check_same_thread=False)
+                self._watched[db_path] = (conn, conn.execute("PRAGMA data_version").fetchone()[0])
+                return False
+            conn, seen = watched
+            version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if version == seen:
+                return False
+            self._watched[db_path] = (conn, version)
+        log.info("search_server", "Baza '%s' zmieniona poza serwerem – wczytuję profil ponownie.",
+                 os.path.basename(db_path))
+        search_index.invalidate(db_path)
+        learning.reload(db_path)
+        return True
+
+    def close(self):
+        with self._watch_lock:
+            for conn, _ in self._watched.values():
+                conn.close()
+            self._watched.clear()
+
+    def warm(self, profiles=None):
+        """Ładuje indeksy profili z góry (domyślnie aktualnego), żeby pierwsze zapytanie było szybkie."""
+        for profile in profiles or [None]:
+            _, db_path = self.resolve(profile)
+            search_index.get_index(db_path)
+        search.search_profile  # import modułu (rapidfuzz, numpy) też przed pierwszym zapytaniem
+
+    def search(self, query="", alternatives=None, profile=None, all_profiles=False, limit=DEFAULT_LIMIT):
+        """Wyniki bez haseł: [{"profile", "id", "login", "opis", "score"}] malejąco po wyniku."""
+        keywords = [k.strip() for k in ([query] + list(alternatives or [])) if k and k.strip()]
+        if not keywords:
+            return []
+        limit = max(1, min(int(limit), 100))
+        if all_profiles:
+            if self.watch_changes:
+                load_config()
+                for profile in self.app_state["profiles"]:
+                    db_path = profile_db_path(self.app_state, profile)
+                    if os.path.exists(db_path):
+                        self.refresh(db_path)
+            rows = search.search_all_profiles(self.app_state, keywords[0], keywords, limit=limit)
+            return [
+                {"profile": row[4], "id": row[5], "login": row[1], "opis": row[3], "score": row[7]}
+                for row in rows
+            ]
+        profile, db_path = self.resolve(profile)
+        hits = search.search_profile(db_path, keywords, search.corrected_queries(keywords), limit)
+        return [
+            {"profile": profile, "id": row[0], "login": row[1], "opis": row[3], "score": score}
+            for score, row in hits[:limit]
+        ]
+
+    def learn(self, text, entry_id, profile=None):
+        """Zapamiętuje wybór wpisu dla frazy (zapis w tle, jak w GUI)."""
+        _, db_path = self.resolve(profile)
+        search.learn_selection(text or "", int(entry_id), db_path)
+        return True
+
+    def entry(self, entry_id, profile=None):
+        """Pełny wpis (z hasłem) – do wpisania przez klienta."""
+        profile, db_path = self.resolve(profile)
+        row = search_index.get_index(db_path).get(int(entry_id))
+        if row is None:
+            raise ValueError(f"Brak wpisu ID={entry_id} w profilu '{profile}'")
+        return {"profile": profile, "id": row[0], "login": row[1], "haslo": row[2], "opis": row[3]}
+
+    def profiles(self):
+        return {
+            "current": self.app_state["current_profile"],
+            "profiles": {name: {"color": p.get("color")} for name, p in self.app_state["profiles"].items()},
+        }
+
+    def stats(self):
+        return {
+            "spans": instrumentation.snapshot(),
+            "index_cache": search_index.cache_info(),
+            "write_behind": write_behind.writer.metrics(),
+        }
+
+
+# --------------------
+#  Serwer
+# --------------------
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            while True:
+                line = self.rfile.readline(MAX_LINE_BYTES + 1)
+                if not line:
+                    return
+                if len(line) > MAX_LINE_BYTES:
+                    self._send({"id": None, "ok": False, "error": "Za długie żądanie"})
+                    return
+                if line.strip():
+                    self._send(self.server.dispatch(line))
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            # Wątek klienta się kończy – jego połączenia SQLite nie będą już potrzebne
+            database.close_thread_connections()
+
+    def _send(self, response):
+        self.wfile.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+
+
+class SearchServer(socketserver.ThreadingTCPServer):
+    """Serwer JSON lines: wątek na połączenie, wspólny SearchEngine."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, engine, host=DEFAULT_HOST, port=DEFAULT_PORT, token=None):
+        super().__init__((host, port), _RequestHandler)
+        self.engine = engine
+        self.token = token if token is not None else secrets.token_hex(16)
+        self.ops = {
+            "ping": lambda req: {"pong": True, "pid": os.getpid()},
+            "profiles": lambda req: engine.profiles(),
+            "search": lambda req: engine.search(
+                req.get("query", ""), req.get("alternatives"), req.get("profile"),
+                bool(req.get("all_profiles")), req.get("limit", DEFAULT_LIMIT)
+            ),
+            "learn": lambda req: engine.learn(req.get("text", ""), req["entry_id"], req.get("profile")),
+            "entry": lambda req: engine.entry(req["entry_id"], req.get("profile")),
+            "stats": lambda req: engine.stats(),
+        }
+        self._thread = None
+
+    @property
+    def address(self):
+        return self.server_address[0], self.server_address[1]
+
+    def dispatch(self, line):
+        """Jedna linia żądania -> słownik odpowiedzi (nigdy nie rzuca wyjątku)."""
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("Żądanie musi być obiektem JSON")
+            request_id = request.get("id")
+            op = request.get("op")
+            handler = self.ops.get(op)
+            if handler is None:
+                raise ValueError(f"Nieznana operacja: {op}")
+            if op != "ping" and self.token and not secrets.compare_digest(str(request.get("token", "")), self.token):
+                raise PermissionError("Brak lub zły token")
+            with span(f"server.{op}"):
+                result = handler(request)
+            return {"id": request_id, "ok": True, "result": result}
+        except (ValueError, KeyError, TypeError, PermissionError) as e:
+            return {"id": request_id, "ok": False, "error": str(e) if not isinstance(e, KeyError) else f"Brak pola {e}"}
+        except Exception as e:
+            log.error("search_server", "Błąd obsługi żądania: %s", e)
+            return {"id": request_id, "ok": False, "error": f"Błąd serwera: {e}"}
+
+    def start(self, info_file=SERVER_INFO_FILE):
+        """Uruchamia serwer w wątku w tle i zapisuje adres + token do `info_file` (None = bez pliku)."""
+        self._thread = threading.Thread(target=self.serve_forever, name="search-server", daemon=True)
+        self._thread.start()
+        if info_file:
+            write_server_info(self, info_file)
+        host, port = self.address
+        log.info("search_server", "Serwer wyszukiwania nasłuchuje na %s:%d", host, port)
+        return self
+
+    def stop(self, info_file=SERVER_INFO_FILE):
+        self.shutdown()
+        self.server_close()
+        if info_file:
+            remove_server_info(self, info_file)
+        if self._thread is not None:
+            self._thread.join(2.0)
+            self._thread = None
+
+
+def write_server_info(server, path=SERVER_INFO_FILE):
+    host, port = server.address
+    info = {"host": host, "port": port, "token": server.token, "pid": os.getpid()}
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(info, f)
+    try:
+        os.chmod(tmp_path, 0o600)
+    except OSError:
+        pass
+    os.replace(tmp_path, path)
+
+
+def remove_server_info(server, path=SERVER_INFO_FILE):
+    """Usuwa plik informacji, jeśli nadal opisuje ten serwer (a nie nowszy)."""
+    info = read_server_info(path)
+    if info and info.get("port") == server.address[1] and info.get("pid") == os.getpid():
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def read_server_info(path=SERVER_INFO_FILE):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def start_server(app_state=None, host=DEFAULT_HOST, port=DEFAULT_PORT, info_file=SERVER_INFO_FILE):
+    """Tworzy silnik i uruchamia serwer w tle (np. z GUI, żeby CLI korzystało z jego ciepłych indeksów)."""
+    return SearchServer(SearchEngine(app_state), host, port).start(info_file)
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, profiles=None, info_file=SERVER_INFO_FILE):
+    """Tryb samodzielny (python cli.py serve): ładuje indeksy i obsługuje klientów do Ctrl+C."""
+    engine = SearchEngine(watch_changes=True)
+    with span("server.warm"):
+        engine.warm(profiles)
+    server = SearchServer(engine, host, port).start(info_file)
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        log.info("search_server", "Zatrzymuję serwer...")
+    finally:
+        server.stop(info_file)
+        engine.close()
+        write_behind.writer.stop()
+        learning.flush_all()
+        database.close_all_connections()
+
+
+# --------------------
+#  Klient
+# --------------------
+class SearchClient:
+    """
+    Klient JSON lines. Bez host/port czyta adres i token z SERVER_INFO_FILE.
+    request() zwraca "result" albo rzuca RuntimeError z komunikatem serwera.
+    """
+
+    def __init__(self, host=None, port=None, token=None, timeout=CLIENT_TIMEOUT_SECONDS, info_file=SERVER_INFO_FILE):
+        if host is None or port is None:
+            info = read_server_info(info_file)
+            if not info:
+                raise ConnectionError("Serwer wyszukiwania nie działa (brak pliku z adresem)")
+            host, port = info["host"], info["port"]
+            token = token if token is not None else info.get("token")
+        self.token = token
+        self._next_id = 0
+        self._sock = socket.create_connection((host, port), timeout=timeout)
+        self._file = self._sock.makefile("rwb")
+
+    def request(self, op, **params):
+        self._next_id += 1
+        message = dict(params, op=op, id=self._next_id)
+        if self.token:
+            message["token"] = self.token
+        self._file.write(json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n")
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("Serwer zamknął połączenie")
+        response = json.loads(line)
+        if not response.get("ok"):
+            raise RuntimeError(response.get("error", "Nieznany błąd serwera"))
+        return response.get("result")
+
+    def search(self, query, **params):
+        return self.request("search", query=query, **params)
+
+    def close(self):
+        for closable in (self._file, self._sock):
+            try:
+                closable.close()
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+# --------------------
+#  Test obciążenia
+# --------------------
+def load_test(queries, clients=8, requests_per_client=100, **client_args):
+    """
+    `clients` równoległych klientów, każdy wysyła `requests_per_client` wyszukiwań po kolei.
+    Zwraca przepustowość (zapytania/s) i percentyle opóźnień widzianych przez klienta.
+    """
+    hist = instrumentation.Histogram("client.search")
+    errors = []
+    barrier = threading.Barrier(clients + 1)
+
+    def worker(offset):
+        try:
+            with SearchClient(**client_args) as client:
+                barrier.wait()
+                for i in range(requests_per_client):
+                    query = queries[(offset + i) % len(queries)]
+                    start = time.perf_counter()
+                    client.search(query)
+                    hist.record((time.perf_counter() - start) * 1000.0)
+        except Exception as e:
+            errors.append(str(e))
+            if not barrier.broken:
+                barrier.abort()
+
+    threads = [threading.Thread(target=worker, args=(n * 7,), daemon=True) for n in range(clients)]
+    for thread in threads:
+        thread.start()
+    try:
+        barrier.wait()
+    except threading.BrokenBarrierError:
+        pass
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    summary = hist.summary()
+    return {
+        "clients": clients,
+        "requests": summary["count"],
+        "seconds": round(seconds, 3),
+        "requests_per_s": round(summary["count"] / seconds, 1) if seconds > 0 else 0.0,
+        "p50_ms": summary["p50_ms"],
+        "p99_ms": summary["p99_ms"],
+        "errors": errors,
+    }
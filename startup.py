@@ -0,0 +1,102 @@
+"""
+Szybki start aplikacji: leniwe importy ciężkich modułów i pomiar faz uruchamiania.
+
+- lazy_import("voice") zwraca obiekt, który importuje moduł dopiero przy pierwszym użyciu
+  atrybutu (speech_recognition, numpy, rapidfuzz itd. nie spowalniają pokazania okna).
+- StartupTimer mierzy czasy faz od startu procesu (histogramy "startup.<faza>" w instrumentation)
+  i czas do pełnej gotowości (time-to-interactive).
+"""
+
+import importlib
+import threading
+import time
+
+from instrumentation import log, record
+
+# Możliwie wczesny punkt odniesienia – moduł jest importowany jako jeden z pierwszych
+PROCESS_START = time.perf_counter()
+
+
+class LazyModule:
+    """Zastępca modułu: prawdziwy import następuje przy pierwszym odczycie/zapisie atrybutu."""
+
+    def __init__(self, name):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_module", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def _load(self):
+        module = self._module
+        if module is None:
+            with self._lock:
+                module = self._module
+                if module is None:
+                    start = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    object.__setattr__(self, "_module", module)
+                    ms = (time.perf_counter() - start) * 1000.0
+                    record(f"import.{self._name}", ms)
+                    log.debug("startup", "Import modułu '%s': %.0f ms", self._name, ms)
+        return module
+
+    @property
+    def is_loaded(self):
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+
+def lazy_import(name):
+    return LazyModule(name)
+
+
+class StartupTimer:
+    """Czasy faz startu liczone od PROCESS_START; każda faza trafia też do histogramu."""
+
+    def __init__(self):
+        self.marks = {}
+        self.durations = {}
+        self._lock = threading.Lock()
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - PROCESS_START) * 1000.0
+
+    def mark(self, name):
+        """Punkt na osi czasu (np. "okno", "gotowe") – ms od startu procesu."""
+        ms = self.elapsed_ms()
+        with self._lock:
+            self.marks[name] = ms
+        record(f"startup.{name}", ms)
+        log.info("startup", "%s: %.0f ms od startu", name, ms)
+        return ms
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def summary(self):
+        with self._lock:
+            return {"marks_ms": dict(self.marks), "phases_ms": dict(self.durations)}
+
+
+class _Phase:
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        ms = (time.perf_counter() - self.start) * 1000.0
+        with self.timer._lock:
+            self.timer.durations[self.name] = ms
+        record(f"startup.phase.{self.name}", ms)
+        if exc_type is None:
+            log.debug("startup", "Faza '%s': %.0f ms", self.name, ms)
+        return False
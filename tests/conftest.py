@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+# Moduły aplikacji leżą płasko w katalogu głównym repozytorium
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+import search_index  # noqa: E402
+
+
+@pytest.fixture
+def profile_db(tmp_path):
+    """Tymczasowa baza profilu ustawiona jako aktualna (DB_PATH); sprzątana po teście."""
+    path = str(tmp_path / "profil.db")
+    previous = database.DB_PATH
+    database.init_db(path)
+    database.set_db_path(path)
+    yield path
+    search_index.invalidate(path)
+    database.set_db_path(previous)
+    database.close_all_connections()
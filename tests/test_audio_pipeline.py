@@ -0,0 +1,205 @@
+import threading
+import time
+import wave
+
+import numpy as np
+import pytest
+import speech_recognition as sr
+
+import audio_pipeline
+import voice
+
+SAMPLE_RATE = 16000
+
+
+def voiced(seconds, amplitude=8000):
+    """Sygnał "jak głos": ton podstawowy z harmonicznymi (wysoka energia, niski ZCR)."""
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    signal = sum(np.sin(2 * np.pi * 150 * k * t) / k for k in (1, 2, 3))
+    return (amplitude * signal / np.abs(signal).max()).astype(np.int16)
+
+
+def silence(seconds, amplitude=30, seed=0):
+    rng = np.random.default_rng(seed)
+    return (amplitude * rng.standard_normal(int(SAMPLE_RATE * seconds))).astype(np.int16)
+
+
+def write_wav(path, samples):
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(samples.tobytes())
+    return str(path)
+
+
+@pytest.fixture
+def utterance_wav(tmp_path):
+    """0,5 s ciszy, 1 s mowy, 2 s ciszy."""
+    return write_wav(tmp_path / "zapytanie.wav", np.concatenate([silence(0.5), voiced(1.0), silence(2.0, seed=1)]))
+
+
+def test_capture_utterance_stops_after_trailing_silence(utterance_wav):
+    with audio_pipeline.FileAudioSource(utterance_wav) as source:
+        audio = audio_pipeline.capture_utterance(source, energy_threshold=250, timeout=5, phrase_time_limit=5)
+
+    seconds = len(audio.get_raw_data()) / (2 * SAMPLE_RATE)
+    # pre-roll (0,3 s) + mowa (1 s) + cisza kończąca (maleje od 0,7 s) – bez reszty 2 s ciszy
+    assert 1.3 <= seconds <= 2.1
+    samples = np.frombuffer(audio.get_raw_data(), dtype=np.int16)
+    assert np.abs(samples[:int(0.2 * SAMPLE_RATE)]).max() < 1000  # zaczyna się od pre-rollu ciszy
+
+
+def test_capture_utterance_without_phrase_limit_uses_default_maximum(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio_pipeline, "MAX_UTTERANCE_SECONDS", 1)
+    path = write_wav(tmp_path / "dluga.wav", voiced(3.0))
+    with audio_pipeline.FileAudioSource(path) as source:
+        audio = audio_pipeline.capture_utterance(source, energy_threshold=250, timeout=5, phrase_time_limit=None)
+
+    assert len(audio.get_raw_data()) / (2 * SAMPLE_RATE) <= 1.4
+
+
+def test_capture_utterance_times_out_without_speech(tmp_path):
+    path = write_wav(tmp_path / "cisza.wav", silence(2.0))
+    with audio_pipeline.FileAudioSource(path) as source:
+        with pytest.raises(sr.WaitTimeoutError):
+            audio_pipeline.capture_utterance(source, energy_threshold=250, timeout=1)
+
+
+def test_record_and_transcribe_from_file_source(utterance_wav, monkeypatch):
+    backend = voice.FakeBackend(None, transcripts=["pięć kont allegro", "piec kont allegro"])
+    monkeypatch.setattr(voice, "get_recognizer_backend", lambda: backend)
+    monkeypatch.setattr(voice, "load_config", lambda: {"mic_energy_threshold": 250})
+
+    result = voice.record_and_transcribe(
+        return_alternatives=True, source=audio_pipeline.FileAudioSource(utterance_wav)
+    )
+
+    assert result == ["5 kont allegro", "5 kont allegro"]
+
+
+class FailingSource(audio_pipeline.FileAudioSource):
+    """FileAudioSource, którego odczyt po `reads` porcjach kończy się błędem (odłączone urządzenie)."""
+
+    def __init__(self, path, reads=3):
+        super().__init__(path)
+        self.reads = reads
+
+    def __enter__(self):
+        super().__enter__()
+        stream = self.stream
+        source = self
+
+        class _Stream:
+            def read(self, n_frames):
+                if source.reads <= 0:
+                    raise OSError("urządzenie odłączone")
+                source.reads -= 1
+                return stream.read(n_frames)
+
+        self.stream = _Stream()
+        return self
+
+
+def test_session_failure_is_raised_to_subscribers(utterance_wav):
+    session = audio_pipeline.AudioSession(source_factory=lambda: FailingSource(utterance_wav))
+    subscription = session.subscribe()
+    session.start()
+    try:
+        with pytest.raises(audio_pipeline.AudioSourceError):
+            for _ in subscription:
+                pass
+    finally:
+        session.stop()
+
+
+def test_hotword_listener_resubscribes_after_session_failure(utterance_wav, monkeypatch):
+    sessions = [
+        audio_pipeline.AudioSession(source_factory=lambda: FailingSource(utterance_wav)),
+        audio_pipeline.AudioSession(source_factory=lambda: audio_pipeline.FileAudioSource(utterance_wav)),
+    ]
+    opened = []
+
+    def get_audio_session():
+        if not opened or not opened[-1].running:
+            opened.append(sessions[len(opened)])
+            # Subskrypcję zakładamy przed startem wątku czytającego, żeby nie zgubić ramek
+            opened[-1].subscribe = _subscribe_then_start(opened[-1])
+        return opened[-1]
+
+    heard = []
+    monkeypatch.setattr(voice, "get_audio_session", get_audio_session)
+    monkeypatch.setattr(voice, "close_audio_session", lambda: [s.stop() for s in opened])
+    monkeypatch.setattr(voice, "load_config", lambda: {"mic_energy_threshold": 250})
+    monkeypatch.setattr(voice, "AUDIO_RESTART_DELAY_SECONDS", 0.01)
+    monkeypatch.setattr(voice, "hotword_callback", lambda recognizer, audio: heard.append(audio))
+
+    stop = voice.start_hotword_listening()
+    try:
+        deadline = time.monotonic() + 2.0
+        while not heard and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        stop()
+
+    assert len(opened) == 2
+    assert heard, "nasłuch nie wznowił się na nowej sesji"
+
+
+def _subscribe_then_start(session):
+    subscribe = session.subscribe
+
+    def wrapper(*args, **kwargs):
+        subscription = subscribe(*args, **kwargs)
+        session.start()
+        return subscription
+
+    return wrapper
+
+
+class BlockingSource:
+    """Źródło, którego stream.read wisi, dopóki test go nie zwolni (jak zawieszony sterownik)."""
+
+    SAMPLE_RATE = SAMPLE_RATE
+    SAMPLE_WIDTH = 2
+    CHUNK = 320
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.reading = threading.Event()
+        self.closed = False
+        self.read_after_close = False
+        source = self
+
+        class _Stream:
+            def read(self, n_frames):
+                source.reading.set()
+                source.release.wait(5)
+                source.read_after_close = source.read_after_close or source.closed
+                return b""
+
+        self.stream = _Stream()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.closed = True
+
+
+def test_session_stop_does_not_close_source_under_blocked_reader(monkeypatch):
+    source = BlockingSource()
+    session = audio_pipeline.AudioSession(source_factory=lambda: source)
+    session.start()
+    assert source.reading.wait(2)
+    thread = session._thread
+
+    original_join = thread.join
+    monkeypatch.setattr(thread, "join", lambda timeout=None: original_join(0.05))
+    session.stop()
+    assert thread.is_alive() and not source.closed
+
+    source.release.set()
+    thread.join(2)
+    # Źródło zamknął dopiero wątek czytający, po wyjściu z read
+    assert source.closed and not source.read_after_close
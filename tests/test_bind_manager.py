@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+
+from bind_manager import BindManager
+
+
+class FakeKeyboard:
+    """
+    Naśladuje księgowanie hooków z keyboard 0.13: hook_key zapisuje funkcję usuwającą pod
+    _hooks[callback] i _hooks[remove], a remove() najpierw kasuje oba wpisy, potem odblokowuje klawisz.
+    """
+
+    def __init__(self):
+        self._hooks = {}
+        self.hooks = {}  # klawisz -> callback (klawisze zablokowane przez suppress)
+
+    def hook_key(self, name, callback, suppress=False):
+        assert suppress
+
+        def remove():
+            del self._hooks[callback]
+            del self._hooks[remove]
+            del self.hooks[name]
+
+        self.hooks[name] = callback
+        self._hooks[callback] = self._hooks[remove] = remove
+        return remove
+
+    def unhook_key(self, remove):
+        self._hooks[remove]()
+
+    def press(self, name, event_type="down"):
+        return self.hooks[name](SimpleNamespace(name=name, event_type=event_type))
+
+
+def make_binds(is_injected=None):
+    submitted = []
+    keyboard = FakeKeyboard()
+    binds = BindManager(lambda text, action, entry_id: submitted.append((text, action, entry_id)),
+                        is_injected=is_injected, keyboard_module=keyboard)
+    binds.set_keys("1", "2")
+    binds.start()
+    return binds, keyboard, submitted
+
+
+def test_only_bind_keys_are_hooked_and_rehooked_on_change():
+    binds, keyboard, _ = make_binds()
+    assert set(keyboard.hooks) == {"1", "2"}
+
+    binds.set_keys("f7", "f8")
+    assert set(keyboard.hooks) == {"f7", "f8"}
+
+    binds.stop()
+    # Żaden klawisz nie zostaje zablokowany po zmianie klawiszy i zatrzymaniu
+    assert keyboard.hooks == {}
+    assert keyboard._hooks == {}
+
+
+def test_bind_key_types_next_armed_entry_and_is_blocked():
+    binds, keyboard, submitted = make_binds()
+    binds.arm(10, "jan", "h1")
+    binds.arm(11, "ola", "h2")
+
+    assert keyboard.press("1") is False
+    assert keyboard.press("1", "up") is False
+    assert keyboard.press("2") is False
+    assert keyboard.press("1") is False
+    assert submitted == [("jan", "login", 10), ("h1", "password", 10), ("ola", "login", 11)]
+
+
+def test_bind_key_passes_through_when_nothing_is_armed():
+    _, keyboard, submitted = make_binds()
+    assert keyboard.press("1") is True
+    assert submitted == []
+
+
+def test_injected_chars_pass_through_and_user_presses_are_queued():
+    injected = {"1"}
+    binds, keyboard, submitted = make_binds(is_injected=lambda name: name in injected)
+    binds.arm(10, "jan", "h1")
+
+    # "1" z wpisywanego hasła – nie zużywa wpisu
+    assert keyboard.press("1") is True
+    # Naciśnięcie użytkownika w trakcie wpisywania – do kolejki injektora, nie do okna
+    assert keyboard.press("2") is False
+    assert submitted == [("h1", "password", 10)]
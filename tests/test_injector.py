@@ -0,0 +1,93 @@
+import pytest
+
+import injector
+
+
+def run_job(inj, text, **kwargs):
+    done = []
+    inj.submit(text, on_done=lambda job, ok, error: done.append((job, ok, error)), **kwargs)
+    assert inj.wait_idle(5)
+    inj.stop()
+    return done
+
+
+def test_type_mode_sends_chars_in_order():
+    backend = injector.MockBackend()
+    done = run_job(injector.Injector(backend), "h@sło 1")
+
+    assert [kind for _, kind, _ in backend.events] == ["char"] * len("h@sło 1")
+    assert backend.typed_text() == "h@sło 1"
+    assert done[0][1] is True
+
+
+@pytest.mark.parametrize("profile", ["fast", "normal"])
+def test_type_mode_keeps_profile_delay_between_chars(profile):
+    backend = injector.MockBackend()
+    run_job(injector.Injector(backend, profile=profile), "abcdef")
+
+    base, _ = injector.DELAY_PROFILES[profile]
+    times = [t for t, _, _ in backend.events]
+    gaps = [b - a for a, b in zip(times, times[1:])]
+    assert min(gaps) >= base * 0.9
+
+
+def test_paste_mode_is_one_event():
+    backend = injector.MockBackend()
+    run_job(injector.Injector(backend, mode="paste"), "login@example.com")
+
+    assert [(kind, text) for _, kind, text in backend.events] == [("paste", "login@example.com")]
+
+
+def test_unknown_profile_is_rejected():
+    with pytest.raises(ValueError):
+        injector.Injector(injector.MockBackend()).submit("x", profile="turbo")
+
+
+class FakeKeyboard:
+    def __init__(self, clipboard):
+        self.clipboard = clipboard
+        self.sent = []
+
+    def send(self, hotkey):
+        self.sent.append((hotkey, self.clipboard.value))
+
+
+class FakeClipboard:
+    def __init__(self, value):
+        self.value = value
+
+    def paste(self):
+        return self.value
+
+    def copy(self, text):
+        self.value = text
+
+
+def test_keyboard_backend_pastes_through_clipboard_and_restores_it(monkeypatch):
+    monkeypatch.setattr(injector, "PASTE_RESTORE_DELAY_SECONDS", 0)
+    clipboard = FakeClipboard("coś skopiowanego")
+    keyboard = FakeKeyboard(clipboard)
+
+    injector.KeyboardBackend(keyboard_module=keyboard, clipboard=clipboard).paste("tajne hasło")
+
+    assert keyboard.sent == [("ctrl+v", "tajne hasło")]
+    assert clipboard.value == "coś skopiowanego"
+
+
+def test_keyboard_backend_paste_without_clipboard_module_fails():
+    backend = injector.KeyboardBackend(keyboard_module=FakeKeyboard(None), clipboard=None)
+    backend._clipboard = None
+    with pytest.raises(RuntimeError):
+        backend.paste("x")
+
+
+def test_recently_typed_chars_are_reported_as_injected(monkeypatch):
+    inj = injector.Injector(injector.MockBackend())
+    run_job(inj, "Ab1")
+
+    assert inj.is_injecting("1") and inj.is_injecting("b")
+    assert not inj.is_injecting("2")
+    assert not inj.is_injecting("f2")
+
+    monkeypatch.setattr(injector.time, "monotonic", lambda: float("inf"))
+    assert not inj.is_injecting("1")
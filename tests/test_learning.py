@@ -0,0 +1,53 @@
+import database
+import learning
+import write_behind
+
+
+def test_scheduled_flushes_reuse_one_connection(profile_db):
+    model = learning.get_model(profile_db)
+    write_behind.writer.flush()
+    before = len(database._all_connections)
+
+    for n in range(20):
+        model.record(f"fraza {n}", n)
+        model.schedule_flush()
+        assert write_behind.writer.flush()
+
+    # Jeden wątek zapisu = co najwyżej jedno nowe połączenie, niezależnie od liczby zapisów
+    assert len(database._all_connections) <= before + 1
+    count = database.get_connection(profile_db).execute("SELECT COUNT(*) FROM learning_choices").fetchone()[0]
+    assert count == 20
+
+
+def test_learned_choice_is_visible_before_write_behind_flush(profile_db):
+    import search
+
+    search.store_learning("moja poczta", 7)
+    # Bez czekania na write_behind – model ma wybór od razu
+    assert search.get_learning_choice("moja poczta") == 7
+
+    assert write_behind.writer.flush()
+    row = database.get_connection(profile_db).execute(
+        "SELECT entry_id FROM learning_choices WHERE recognized_text = ?", ("moja poczta",)).fetchone()
+    assert row == (7,)
+
+
+def test_failed_flush_keeps_choices_for_the_next_flush(profile_db, monkeypatch):
+    import pytest
+
+    model = learning.get_model(profile_db)
+    model.record("bank", 3)
+
+    def locked(path=None):
+        raise database.sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(database, "transaction", locked)
+    with pytest.raises(database.sqlite3.OperationalError):
+        model.flush()
+    model.record("bank", 4)
+    monkeypatch.undo()
+
+    assert model.flush() == 1
+    row = database.get_connection(profile_db).execute(
+        "SELECT entry_id, usage_count FROM learning_choices WHERE recognized_text = 'bank'").fetchone()
+    assert row == (4, 2)
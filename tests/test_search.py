@@ -0,0 +1,140 @@
+import database
+import search
+import search_index
+
+ENTRIES = [
+    ("jan@gmail.com", "h1", "Gmail praca"),
+    ("anna", "h2", "Allegro"),
+    ("kino", "h3", "Netflix"),
+    ("bank", "h4", "PKO BP"),
+    ("gra", "h5", "Steam"),
+]
+# Wpisy bez wspólnych liter z zapytaniami – bardzo niskie wyniki (przy negacji uint8 wynik 0 trafiał na początek)
+UNRELATED = [(str(n), "h", str(n * 7)) for n in range(100, 106)]
+
+
+def test_rank_index_returns_best_match_first(profile_db):
+    database.add_entries_bulk(ENTRIES + UNRELATED, path=profile_db)
+    index = search_index.get_index(profile_db)
+
+    ranked = search.rank_index(index, ["gmail praca"], limit=10)
+
+    scores = [score for _, score in ranked]
+    assert scores == sorted(scores, reverse=True)
+    assert scores[0] == 100
+    assert index.get(ranked[0][0])[3] == "Gmail praca"
+
+
+def test_batch_search_puts_best_hypothesis_match_first(profile_db):
+    database.add_entries_bulk(ENTRIES + UNRELATED, path=profile_db)
+
+    results = search.search_entries_batch(["netflks", "netflix"])
+
+    assert results[0][3] == "Netflix"
+
+
+def make_profiles(tmp_path, names):
+    profiles = {}
+    for name in names:
+        path = str(tmp_path / f"{name}.db")
+        database.init_db(path)
+        database.add_entries_bulk(ENTRIES, path=path)
+        profiles[name] = {"db_filename": path, "color": "white"}
+    return {"current_profile": names[0], "profiles": profiles}
+
+
+def test_all_profile_keys_never_repeat_between_searches(tmp_path, profile_db):
+    app_state = make_profiles(tmp_path, ["dom", "praca"])
+
+    first = search.search_all_profiles(app_state, "gmail")
+    second = search.search_all_profiles(app_state, "gmail")
+
+    assert first and second
+    assert all(row[0] < 0 for row in first + second)
+    assert not {row[0] for row in first} & {row[0] for row in second}
+    assert {row[4] for row in first} == {"dom", "praca"}
+    for path in (p["db_filename"] for p in app_state["profiles"].values()):
+        search_index.invalidate(path)
+
+
+def test_all_profile_search_keeps_every_profile_index_cached(tmp_path, profile_db):
+    names = [f"p{n}" for n in range(6)]
+    app_state = make_profiles(tmp_path, names)
+    paths = [p["db_filename"] for p in app_state["profiles"].values()]
+    search_index.configure_cache(max_profiles=4)
+    try:
+        # Jak GUI w trybie "Wszystkie profile"
+        search_index.pin(paths)
+        search.search_all_profiles(app_state, "gmail")
+        indexes = [search_index.get_index(path) for path in paths]
+        search.search_all_profiles(app_state, "netflix")
+
+        # Żaden indeks nie został przebudowany mimo limitu 4 profili
+        assert all(a is b for a, b in zip(indexes, [search_index.get_index(p) for p in paths]))
+
+        search_index.pin(())
+        assert len([p for p in paths if search_index.is_cached(p)]) <= 4
+    finally:
+        search_index.pin(())
+        search_index.configure_cache(max_profiles=search_index.MAX_CACHED_INDEXES)
+        for path in paths:
+            search_index.invalidate(path)
+
+
+def test_fts_prefilter_keeps_phonetic_only_matches(profile_db, monkeypatch):
+    database.add_entries_bulk(ENTRIES + UNRELATED * 3, path=profile_db)
+    monkeypatch.setattr(search, "FTS_PREFILTER_MIN_ENTRIES", 1)
+    index = search_index.get_index(profile_db)
+    gmail_id = next(entry_id for entry_id in index.ids if index.get(entry_id)[3] == "Gmail praca")
+
+    assert gmail_id in database.fts_candidate_ids("dżimejl", path=profile_db)
+    ranked = search.rank_index(index, ["dżimejl"], limit=3)
+    assert ranked[0][0] == gmail_id
+
+
+def test_index_of_unmigrated_profile_database_is_built(tmp_path):
+    import sqlite3
+
+    path = str(tmp_path / "stary.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE loginy_hasla (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                     "login TEXT NOT NULL, haslo TEXT NOT NULL, opis TEXT NOT NULL)")
+        conn.executemany("INSERT INTO loginy_hasla (login, haslo, opis) VALUES (?, ?, ?)", ENTRIES)
+    conn.close()
+    try:
+        index = search_index.get_index(path)
+        assert len(index) == len(ENTRIES)
+        assert search.rank_index(index, ["netflix"], limit=1)[0][1] == 100
+    finally:
+        search_index.invalidate(path)
+        database.close_all_connections()
+
+
+def test_all_profile_search_releases_its_pin_afterwards(tmp_path, profile_db):
+    app_state = make_profiles(tmp_path, [f"p{n}" for n in range(6)])
+    paths = [p["db_filename"] for p in app_state["profiles"].values()]
+    search_index.configure_cache(max_profiles=4)
+    try:
+        assert search.search_all_profiles(app_state, "gmail")
+
+        assert search_index.cache_info()["pinned"] == []
+        assert len([p for p in paths if search_index.is_cached(p)]) <= 4
+    finally:
+        search_index.configure_cache(max_profiles=search_index.MAX_CACHED_INDEXES)
+        for path in paths:
+            search_index.invalidate(path)
+
+
+def test_prefetch_thread_closes_its_connections(tmp_path, profile_db):
+    app_state = make_profiles(tmp_path, ["dom", "praca"])
+    paths = [p["db_filename"] for p in app_state["profiles"].values()]
+    before = len(database._all_connections)
+    try:
+        thread = search_index.prefetch(paths)
+        thread.join(5)
+
+        assert all(search_index.is_cached(path) for path in paths)
+        assert len(database._all_connections) == before
+    finally:
+        for path in paths:
+            search_index.invalidate(path)
@@ -0,0 +1,56 @@
+import sqlite3
+
+import database
+import search_index
+import search_server
+from search_keys import entry_keys
+
+ENTRIES = [("jan@gmail.com", "h1", "Gmail praca"), ("anna", "h2", "Allegro"), ("kino", "h3", "Netflix")]
+
+
+def make_engine(tmp_path, watch_changes):
+    profiles = {}
+    for name in ("dom", "praca"):
+        path = str(tmp_path / f"{name}.db")
+        database.init_db(path)
+        database.add_entries_bulk(ENTRIES, path=path)
+        profiles[name] = {"db_filename": path, "color": "white"}
+    app_state = {"current_profile": "dom", "profiles": profiles}
+    return search_server.SearchEngine(app_state, watch_changes=watch_changes), profiles
+
+
+def cleanup(engine, profiles):
+    engine.close()
+    search_index.pin(())
+    for profile in profiles.values():
+        search_index.invalidate(profile["db_filename"])
+    database.close_all_connections()
+
+
+def test_all_profile_search_reports_merged_scores(tmp_path):
+    engine, profiles = make_engine(tmp_path, watch_changes=False)
+    try:
+        results = engine.search("netflix", all_profiles=True)
+        assert {r["profile"] for r in results[:2]} == {"dom", "praca"}
+        assert all(r["score"] is not None for r in results)
+        scores = [r["score"] for r in results]
+        assert scores == sorted(scores, reverse=True) and scores[0] == 100
+    finally:
+        cleanup(engine, profiles)
+
+
+def test_standalone_engine_sees_entries_added_by_another_process(tmp_path):
+    engine, profiles = make_engine(tmp_path, watch_changes=True)
+    try:
+        assert engine.search("spotify")[0]["opis"] != "Spotify"
+
+        # Zapis z innego połączenia (jak z procesu GUI) – bez słuchaczy zmian z database.py
+        with sqlite3.connect(profiles["dom"]["db_filename"]) as conn:
+            conn.execute(
+                "INSERT INTO loginy_hasla (login, haslo, opis, search_key, phonetic_key) VALUES (?, ?, ?, ?, ?)",
+                ("muzyka", "h4", "Spotify") + entry_keys("muzyka", "Spotify"))
+        conn.close()
+
+        assert engine.search("spotify")[0]["opis"] == "Spotify"
+    finally:
+        cleanup(engine, profiles)
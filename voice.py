@@ -1,51 +1,62 @@
 import time
+import json
 import threading
+from contextlib import ExitStack
 import speech_recognition as sr
+import numpy as np
 from rapidfuzz import process, fuzz
 
-from config import load_config, save_config
-import database  # import CRUD do bazy
-import winsound
+from config import load_config, save_config, current_dir
+from instrumentation import log, span
+from search_keys import spelled_to_digits
+from search import init_learning_table, search_entries
+import hotword
+import audio_pipeline
 import tempfile
 import os
-import sqlite3
+
+try:
+    import winsound
+except ImportError:
+    # Poza Windows (serwer wyszukiwania, testy) – bez sygnału dźwiękowego
+    winsound = None
 
 # --------------------
 #  Zmienne globalne
 # --------------------
 voice_search_running = False
 last_recognized_text = None
+last_recognized_alternatives = []
+
+# Nagrania próbek hotwordu (wzorce dla lokalnego wykrywania)
+HOTWORD_SAMPLES_DIR = os.path.join(current_dir, "hotword_samples")
+# Reszta frazy po hotwordzie krótsza niż tyle sekund = sam hotword (wtedy nagrywamy zapytanie osobno)
+MIN_LEFTOVER_SECONDS = 0.3
+# Co ile sekund nasłuch hotwordu próbuje ponownie otworzyć mikrofon po błędzie
+AUDIO_RESTART_DELAY_SECONDS = 2.0
 
 # --------------------
-#  spelled_to_digits
+#  Wspólna sesja audio (jedno otwarte wejście mikrofonu)
 # --------------------
-def spelled_to_digits(text: str) -> str:
-    """
-    Zamienia słowne polskie liczebniki (jeden, dwa, trzy...) na cyfry (1,2,3...).
-    """
-    spelled_map = {
-        "jeden": "1",
-        "dwa": "2",
-        "trzy": "3",
-        "cztery": "4",
-        "piec": "5",
-        "pięć": "5",
-        "szesc": "6",
-        "sześć": "6",
-        "siedem": "7",
-        "osiem": "8",
-        "dziewiec": "9",
-        "dziewięć": "9",
-    }
-    tokens = text.split()
-    new_tokens = []
-    for token in tokens:
-        lower_tok = token.lower()
-        if lower_tok in spelled_map:
-            new_tokens.append(spelled_map[lower_tok])
-        else:
-            new_tokens.append(token)
-    return " ".join(new_tokens)
+_audio_session = None
+_audio_session_lock = threading.Lock()
+
+def get_audio_session():
+    """Zwraca działającą sesję audio, otwierając mikrofon tylko przy pierwszym użyciu."""
+    global _audio_session
+    with _audio_session_lock:
+        if _audio_session is None or not _audio_session.running:
+            log.debug("audio", "Otwieram wspólną sesję audio (mikrofon).")
+            _audio_session = audio_pipeline.AudioSession().start()
+        return _audio_session
+
+def close_audio_session():
+    """Zamyka wspólną sesję audio (przy zamykaniu aplikacji)."""
+    global _audio_session
+    with _audio_session_lock:
+        if _audio_session is not None:
+            _audio_session.stop()
+            _audio_session = None
 
 # --------------------
 #  kalibracja mikrofonu
@@ -57,211 +68,295 @@ def calibrate_microphone(duration=None):
     app_state = load_config()
     if duration is None:
         duration = app_state.get("mic_calibration_duration", 3)
-    print(f"[DEBUG] Kalibracja mikrofonu przez {duration} sekund.")
-    r = sr.Recognizer()
-    with sr.Microphone() as source:
-        r.adjust_for_ambient_noise(source, duration=duration)
-        new_threshold = r.energy_threshold
-    print(f"[DEBUG] Zakończono kalibrację. Ustawiono energy_threshold = {new_threshold:.2f}")
+    log.info("kalibracja", "Kalibracja mikrofonu przez %s sekund.", duration)
+    # Jak sr.Recognizer.adjust_for_ambient_noise: próg = poziom tła * dynamic_energy_ratio (1.5)
+    new_threshold = get_audio_session().ambient_rms(duration) * 1.5
+    log.info("kalibracja", "Zakończono kalibrację. Ustawiono energy_threshold = %.2f", new_threshold)
     app_state["mic_energy_threshold"] = new_threshold
     save_config(app_state)
 
 # --------------------
-#  record_and_transcribe
-#  (bez Whisper – tylko Google)
+#  Backendy rozpoznawania mowy
 # --------------------
-def record_and_transcribe():
+class RecognizerBackend:
     """
-    Nagrywa krótko (timeout=5 sek ciszy) i rozpoznaje przez Google (pl-PL).
+    Wspólny interfejs silników rozpoznawania mowy.
+    recognize(audio) zwraca listę hipotez (najlepsza pierwsza) albo rzuca sr.UnknownValueError.
     """
-    app_state = load_config()
-    stored_threshold = app_state.get("mic_energy_threshold", 250)
+    name = "base"
 
-    recognizer = sr.Recognizer()
-    recognizer.energy_threshold = stored_threshold
-    recognizer.dynamic_energy_threshold = True
-    recognizer.pause_threshold = 1.2
+    def recognize(self, audio):
+        raise NotImplementedError
 
-    with sr.Microphone() as source:
-        print("[DEBUG] Nasłuchuję... (timeout=5 sek ciszy)")
-        try:
-            audio = recognizer.listen(source, timeout=5, phrase_time_limit=5)
-            text = recognizer.recognize_google(audio, language="pl-PL")
-            print(f"[DEBUG] Rozpoznany tekst (Google): '{text}'")
-            text = spelled_to_digits(text)
-            print(f"[DEBUG] Po zamianie słownych cyfr: '{text}'")
-            return text
-        except sr.WaitTimeoutError:
-            print("[DEBUG] Nie wykryto mowy (timeout).")
-        except sr.UnknownValueError:
-            print("[DEBUG] Nie udało się rozpoznać mowy.")
-        except sr.RequestError as e:
-            print(f"[DEBUG] Błąd usługi rozpoznawania: {e}")
-    return None
+    def start_stream(self, sample_rate):
+        """
+        Rozpoznawanie strumieniowe (hipotezy częściowe w trakcie mówienia).
+        Zwraca obiekt z accept(pcm16_bytes) -> tekst_częściowy/None i finish() -> lista hipotez,
+        albo None, jeśli backend tego nie obsługuje.
+        """
+        return None
 
-# --------------------
-#  Tabela learning_choices – mechanizmy uczenia
-# --------------------
-def init_learning_table():
-    """
-    Inicjalizuje tabelę learning_choices w bazie danych, jeśli nie istnieje.
-    """
-    if not database.DB_PATH:
-        raise ValueError("[DEBUG] DB_PATH nie jest ustawione w database.py")
-
-    conn = sqlite3.connect(database.DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS learning_choices (
-            recognized_text TEXT PRIMARY KEY,
-            entry_id INTEGER,
-            usage_count INTEGER DEFAULT 1
-        )
-    ''')
-    conn.commit()
-    conn.close()
-    print("[DEBUG] Tabela learning_choices została zainicjowana.")
-
-def store_learning(recognized_text, entry_id):
-    """
-    Zapisuje lub aktualizuje w tabeli learning_choices skojarzenie (recognized_text -> entry_id).
-    """
-    if not database.DB_PATH:
-        raise ValueError("[DEBUG] DB_PATH nie jest ustawione.")
-
-    normalized = recognized_text.lower().strip()
-    print(f"[DEBUG][store_learning] Zapisuję powiązanie: '{normalized}' -> ID={entry_id}")
-
-    conn = sqlite3.connect(database.DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT usage_count FROM learning_choices WHERE recognized_text = ?", (normalized,))
-    row = cursor.fetchone()
-    if row:
-        new_count = row[0] + 1
-        cursor.execute("""
-            UPDATE learning_choices
-            SET usage_count = ?, entry_id = ?
-            WHERE recognized_text = ?
-        """, (new_count, entry_id, normalized))
-        print(f"[DEBUG][store_learning] Zaktualizowano usage_count na {new_count}")
-    else:
-        cursor.execute("""
-            INSERT INTO learning_choices (recognized_text, entry_id, usage_count)
-            VALUES (?, ?, ?)
-        """, (normalized, entry_id, 1))
-        print("[DEBUG][store_learning] Dodano nowy rekord w learning_choices")
-    conn.commit()
-    conn.close()
-
-def get_learning_choice(keyword):
+    def replay_audio(self):
+        """Nagranie do odtworzenia zamiast mikrofonu (tylko backend testowy); None = użyj mikrofonu."""
+        return None
+
+
+class GoogleBackend(RecognizerBackend):
+    """Google Web Speech API (sieć, pl-PL) – dotychczasowe zachowanie."""
+    name = "google"
+
+    def __init__(self, language="pl-PL"):
+        self.language = language
+        self._recognizer = sr.Recognizer()
+
+    def recognize(self, audio):
+        response = self._recognizer.recognize_google(audio, language=self.language, show_all=True)
+        if not isinstance(response, dict):
+            raise sr.UnknownValueError()
+        alternatives = [alt["transcript"] for alt in response.get("alternative", []) if alt.get("transcript")]
+        if not alternatives:
+            raise sr.UnknownValueError()
+        return alternatives
+
+
+class VoskBackend(RecognizerBackend):
     """
-    Zwraca entry_id, jeśli w learning_choices zapisano powiązanie z 'keyword'.
+    Lokalne rozpoznawanie offline (Vosk / Kaldi, CPU). Model ładujemy raz, przy starcie.
+    Wymaga pakietu `vosk` i rozpakowanego modelu polskiego (config: vosk_model_path).
     """
-    if not database.DB_PATH:
-        raise ValueError("[DEBUG] DB_PATH nie jest ustawione.")
-
-    normalized = keyword.lower().strip()
-    print(f"[DEBUG][get_learning_choice] Szukam powiązania dla: '{normalized}'")
+    name = "vosk"
+    SAMPLE_RATE = 16000
 
-    try:
-        conn = sqlite3.connect(database.DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("SELECT entry_id, usage_count FROM learning_choices WHERE recognized_text = ?", (normalized,))
-        row = cursor.fetchone()
-        conn.close()
-        if row:
-            print(f"[DEBUG][get_learning_choice] Znalazłem entry_id={row[0]}, usage_count={row[1]}")
-            return row[0]
-        print("[DEBUG][get_learning_choice] Nie znalazłem żadnego wpisu w learning_choices.")
-        return None
-    except sqlite3.OperationalError as e:
-        if "no such table: learning_choices" in str(e):
-            print("[DEBUG][get_learning_choice] Tabela learning_choices nie istnieje. Tworzę...")
-            init_learning_table()
-            return None
+    def __init__(self, model_path, max_alternatives=5):
+        try:
+            import vosk
+        except ImportError:
+            raise RuntimeError("Brak pakietu 'vosk' (pip install vosk).")
+        if not model_path or not os.path.isdir(model_path):
+            raise RuntimeError(f"Nie znaleziono modelu Vosk: '{model_path}'")
+        vosk.SetLogLevel(-1)
+        self._vosk = vosk
+        self._model = vosk.Model(model_path)
+        self.max_alternatives = max_alternatives
+
+    def new_recognizer(self):
+        rec = self._vosk.KaldiRecognizer(self._model, self.SAMPLE_RATE)
+        rec.SetMaxAlternatives(self.max_alternatives)
+        return rec
+
+    def recognize(self, audio):
+        rec = self.new_recognizer()
+        rec.AcceptWaveform(audio.get_raw_data(convert_rate=self.SAMPLE_RATE, convert_width=2))
+        return self.parse_result(rec.FinalResult())
+
+    @staticmethod
+    def parse_result(result_json):
+        result = json.loads(result_json)
+        if "alternatives" in result:
+            alternatives = [alt.get("text", "") for alt in result["alternatives"]]
         else:
-            raise
+            alternatives = [result.get("text", "")]
+        alternatives = [t for t in alternatives if t.strip()]
+        if not alternatives:
+            raise sr.UnknownValueError()
+        return alternatives
+
+    def start_stream(self, sample_rate):
+        return VoskStream(self, sample_rate)
+
+
+class VoskStream:
+    """Strumieniowe rozpoznawanie Vosk: hipotezy częściowe co PARTIAL_EVERY_MS dźwięku."""
+    PARTIAL_EVERY_MS = 150
+
+    def __init__(self, backend, sample_rate):
+        # KaldiRecognizer sam przelicza częstotliwość próbkowania mikrofonu
+        self._rec = backend._vosk.KaldiRecognizer(backend._model, sample_rate)
+        self._rec.SetMaxAlternatives(backend.max_alternatives)
+        self._bytes_per_partial = int(sample_rate * 2 * self.PARTIAL_EVERY_MS / 1000)
+        self._pending_bytes = 0
+        self._last_partial = ""
+        self._segments = []
+
+    def accept(self, data):
+        if self._rec.AcceptWaveform(data):
+            # Vosk sam zamknął segment (pauza w środku wypowiedzi) – zachowujemy jego wynik
+            try:
+                self._segments.append(VoskBackend.parse_result(self._rec.Result())[0])
+            except sr.UnknownValueError:
+                pass
+        self._pending_bytes += len(data)
+        if self._pending_bytes < self._bytes_per_partial:
+            return None
+        self._pending_bytes = 0
+        partial = json.loads(self._rec.PartialResult()).get("partial", "")
+        text = " ".join(self._segments + [partial]).strip()
+        if not text or text == self._last_partial:
+            return None
+        self._last_partial = text
+        return text
+
+    def finish(self):
+        try:
+            final = VoskBackend.parse_result(self._rec.FinalResult())
+        except sr.UnknownValueError:
+            if not self._segments:
+                raise
+            final = [""]
+        prefix = " ".join(self._segments)
+        return [(prefix + " " + alt).strip() for alt in final]
+
 
-def learn_selection(recognized_text, entry_id):
+class FakeBackend(RecognizerBackend):
     """
-    Zawsze próbujemy zapisać powiązanie (recognized_text -> entry_id).
+    Backend do testów: odtwarza kolejne pliki WAV z katalogu zamiast mikrofonu,
+    a jako "rozpoznany" tekst zwraca zawartość pliku .txt o tej samej nazwie.
+    `transcripts` – hipotezy zwracane dla nagrań spoza katalogu (np. z FileAudioSource).
     """
-    if recognized_text is None:
-        recognized_text = ""  # lub np. "(brak tekstu)"
-    if entry_id is None:
-        entry_id = -1
+    name = "fake"
+
+    def __init__(self, audio_dir, transcripts=None):
+        self.audio_dir = audio_dir
+        self.transcripts = list(transcripts or [])
+        self._wav_files = sorted(
+            os.path.join(audio_dir, name) for name in os.listdir(audio_dir) if name.lower().endswith(".wav")
+        ) if audio_dir and os.path.isdir(audio_dir) else []
+        self._next = 0
+        self._transcripts = {}
+
+    def replay_audio(self):
+        if not self._wav_files:
+            return None
+        path = self._wav_files[self._next % len(self._wav_files)]
+        self._next += 1
+        audio = load_wav(path)
+        txt_path = os.path.splitext(path)[0] + ".txt"
+        if os.path.exists(txt_path):
+            with open(txt_path, "r", encoding="utf-8") as f:
+                self._transcripts[audio.get_raw_data()] = [line.strip() for line in f if line.strip()]
+        return audio
 
-    print(f"[DEBUG][learn_selection] Próba zapisu: recognized_text='{recognized_text}' -> ID={entry_id}")
-    store_learning(recognized_text, entry_id)
+    def recognize(self, audio):
+        alternatives = self._transcripts.get(audio.get_raw_data()) or self.transcripts
+        if not alternatives:
+            raise sr.UnknownValueError()
+        return alternatives
 
-# --------------------
-#  KOREKTA
-# --------------------
-def store_correction(original_text, corrected_text):
+
+def load_wav(path):
+    """Wczytuje plik WAV jako sr.AudioData."""
+    with sr.AudioFile(path) as source:
+        return sr.Recognizer().record(source)
+
+
+_backend = None
+_backend_key = None
+_backend_lock = threading.Lock()
+
+def get_recognizer_backend():
     """
-    Zapisuje korektę w configu: original_text.lower().strip() -> corrected_text.
+    Zwraca (i przy pierwszym użyciu ładuje) backend wybrany w configu:
+    "speech_backend": "google" / "vosk" / "fake". Przy błędzie ładowania wracamy do Google.
     """
+    global _backend, _backend_key
     app_state = load_config()
-    search_corrections = app_state.get("search_corrections", {})
-    low_orig = original_text.lower().strip()
-    print(f"[DEBUG][store_correction] Zapamiętuję korektę: '{low_orig}' -> '{corrected_text}'")
-    search_corrections[low_orig] = corrected_text
-    app_state["search_corrections"] = search_corrections
-    save_config(app_state)
+    name = app_state.get("speech_backend", "google")
+    key = (name, app_state.get("vosk_model_path", ""), app_state.get("fake_audio_dir", ""))
+    with _backend_lock:
+        if _backend is not None and _backend_key == key:
+            return _backend
+        try:
+            if name == "vosk":
+                backend = VoskBackend(app_state.get("vosk_model_path", ""))
+            elif name == "fake":
+                backend = FakeBackend(app_state.get("fake_audio_dir", ""))
+            else:
+                backend = GoogleBackend()
+        except Exception as e:
+            log.warning("backend", "Nie udało się załadować backendu '%s': %s. Używam Google.", name, e)
+            backend = GoogleBackend()
+        log.info("backend", "Backend rozpoznawania mowy: %s", backend.name)
+        _backend = backend
+        _backend_key = key
+        return _backend
+
+def recognize_alternatives(recognizer, audio):
+    """
+    Zwraca listę hipotez (n-best) z wybranego backendu, najlepsza pierwsza.
+    Rzuca sr.UnknownValueError, jeśli nic nie rozpoznano.
+    (`recognizer` zostaje dla zgodności z callbackiem listen_in_background.)
+    """
+    return get_recognizer_backend().recognize(audio)
 
 # --------------------
-#  search_entries (fuzzy)
+#  record_and_transcribe
 # --------------------
-def search_entries(keyword):
+def record_and_transcribe(return_alternatives=False, source=None, on_partial=None):
     """
-    Wyszukuje wpisy w bazie przy użyciu algorytmu fuzzy matching.
-    Najpierw sprawdza, czy w learning_choices istnieje powiązanie (recognized_text->entry_id),
-    jeśli tak – dany wpis pojawia się na początku wyników.
+    Nagrywa krótko (timeout=5 sek ciszy) i rozpoznaje wybranym backendem (pl-PL).
+    Koniec wypowiedzi wykrywa strumieniowy VAD (audio_pipeline), więc rozpoznawanie
+    startuje zaraz po tym, jak użytkownik przestanie mówić.
+    Przy return_alternatives=True zwraca listę wszystkich hipotez (najlepsza pierwsza).
+    Domyślnie czyta ramki ze wspólnej sesji audio (mikrofon jest już otwarty);
+    `source` – opcjonalne źródło dźwięku (np. audio_pipeline.FileAudioSource) zamiast sesji.
+    `on_partial(tekst)` – wołane z hipotezami częściowymi w trakcie mówienia (jeśli backend
+    obsługuje rozpoznawanie strumieniowe), np. do spekulacyjnego wyszukiwania.
     """
-    print(f"[DEBUG][search_entries] Rozpoczynam wyszukiwanie dla: '{keyword}'")
-    learned_entry_id = get_learning_choice(keyword)
-    results = []
-    if learned_entry_id is not None:
-        print(f"[DEBUG][search_entries] found learned_entry_id={learned_entry_id}")
-        entry = database.get_entry_by_id(learned_entry_id)
-        if entry:
-            results.append(entry)
-
     app_state = load_config()
-    search_corrections = app_state.get("search_corrections", {})
-    lowered_kw = keyword.lower().strip()
-    if lowered_kw in search_corrections:
-        corrected = search_corrections[lowered_kw]
-        print(f"[DEBUG][search_entries] Zamieniam '{keyword}' -> '{corrected}' (z korekty)")
-        keyword = corrected
-
-    all_entries = database.get_all_entries()
-    print(f"[DEBUG][search_entries] all_entries (len={len(all_entries)})")
-
-    if not keyword:
-        print("[DEBUG][search_entries] Brak keyword, zwracam results")
-        return results
-
-    lower_keyword = keyword.lower().strip()
-    combined_map = {}
-    for row in all_entries:
-        # row: (id, login, haslo, opis)
-        combined_text = (row[3] + " " + row[1]).lower()
-        combined_map[row[0]] = combined_text
-
-    fuzzy_results = process.extract(lower_keyword, combined_map, limit=10, scorer=fuzz.partial_ratio)
-    print("[DEBUG][search_entries] Wyniki fuzzy:")
-    for (match_string, score, entry_id) in fuzzy_results:
-        print(f"  -> ID={entry_id} match_string='{match_string}' score={score}")
-        if learned_entry_id is not None and entry_id == learned_entry_id:
-            # unikamy duplikatu
-            continue
-        row = next((e for e in all_entries if e[0] == entry_id), None)
-        if row:
-            results.append(row)
+    stored_threshold = app_state.get("mic_energy_threshold", 250)
+    backend = get_recognizer_backend()
 
-    print(f"[DEBUG][search_entries] Zwracam {len(results)} wyników.")
-    return results
+    try:
+        stream = None
+        audio = backend.replay_audio() if source is None else None
+        if audio is None:
+            with ExitStack() as stack:
+                # Własne źródło zamyka ExitStack (także przy wyjątku, z jego szczegółami); sesja zostaje otwarta
+                src = stack.enter_context(source) if source is not None else get_audio_session()
+                on_frame = None
+                if on_partial is not None:
+                    stream = backend.start_stream(src.SAMPLE_RATE)
+                if stream is not None:
+                    def on_frame(samples):
+                        partial = stream.accept(samples.tobytes())
+                        if partial:
+                            partial = spelled_to_digits(partial)
+                            log.debug("rozpoznawanie", "Hipoteza częściowa: '%s'", partial)
+                            on_partial(partial)
+                log.debug("rozpoznawanie", "Nasłuchuję... (timeout=5 sek ciszy)")
+                with span("recognition.capture"):
+                    if source is not None:
+                        audio = audio_pipeline.capture_utterance(src, energy_threshold=stored_threshold,
+                                                                 timeout=5, phrase_time_limit=5, on_frame=on_frame)
+                    else:
+                        audio = src.capture_utterance(energy_threshold=stored_threshold,
+                                                      timeout=5, phrase_time_limit=5, on_frame=on_frame)
+        # Backend strumieniowy ma już cały dźwięk – kończymy strumień zamiast rozpoznawać od nowa
+        with span("recognition.recognize"):
+            alternatives = stream.finish() if stream is not None else backend.recognize(audio)
+        log.info("rozpoznawanie", "Rozpoznany tekst (%s): '%s' (+%d alternatyw)", backend.name, alternatives[0], len(alternatives) - 1)
+        alternatives = [spelled_to_digits(t) for t in alternatives]
+        log.debug("rozpoznawanie", "Po zamianie słownych cyfr: '%s'", alternatives[0])
+        return alternatives if return_alternatives else alternatives[0]
+    except sr.WaitTimeoutError:
+        log.info("rozpoznawanie", "Nie wykryto mowy (timeout).")
+    except sr.UnknownValueError:
+        log.info("rozpoznawanie", "Nie udało się rozpoznać mowy.")
+    except sr.RequestError as e:
+        log.error("rozpoznawanie", "Błąd usługi rozpoznawania: %s", e)
+    except audio_pipeline.AudioSourceError as e:
+        # Kolejne nagranie otworzy mikrofon od nowa (get_audio_session)
+        log.error("rozpoznawanie", "%s", e)
+    return None
+
+def beep():
+    """Krótki sygnał po wykryciu hotwordu (tylko Windows)."""
+    if winsound is None:
+        return
+    try:
+        winsound.Beep(1000, 200)
+    except RuntimeError:
+        pass
 
 # --------------------
 #  remove_substring_once
@@ -289,13 +384,13 @@ def voice_search(query=""):
     """
     global voice_search_running, last_recognized_text
     if voice_search_running:
-        print("[DEBUG][voice_search] Trwa już voice_search. Pomijam.")
+        log.debug("voice_search", "Trwa już voice_search. Pomijam.")
         return
 
     try:
         init_learning_table()
     except Exception as e:
-        print(f"[DEBUG][voice_search] Błąd inicjalizacji learning_choices: {e}")
+        log.error("voice_search", "Błąd inicjalizacji learning_choices: %s", e)
 
     voice_search_running = True
     try:
@@ -308,50 +403,165 @@ def voice_search(query=""):
 
         last_recognized_text = recognized_text
         if recognized_text:
-            print(f"[DEBUG][voice_search] final recognized_text='{recognized_text}' -> wywołuję search_entries")
+            log.debug("voice_search", "final recognized_text='%s' -> wywołuję search_entries", recognized_text)
             results = search_entries(recognized_text)
             if results:
-                print("[DEBUG][voice_search] Wyniki search_entries:")
-                for r in results:
-                    print(f"  -> ID={r[0]}, LOGIN={r[1]}, OPIS={r[3]}")
+                log.debug("voice_search", "Wyniki search_entries (ID): %s", [r[0] for r in results])
             else:
-                print("[DEBUG][voice_search] Brak pasujących wpisów.")
+                log.info("voice_search", "Brak pasujących wpisów.")
         else:
-            print("[DEBUG][voice_search] recognized_text jest pusty.")
+            log.debug("voice_search", "recognized_text jest pusty.")
     finally:
         voice_search_running = False
 
 # --------------------
 #  hotword_callback
 # --------------------
+_hotword_cache = {"key": None, "choices": []}
+
+def get_possible_hotwords(app_state):
+    """Lista wariantów hotword (małymi literami), przeliczana tylko gdy zmieni się konfiguracja."""
+    base_hotword = app_state.get("hotword", "altbind")
+    samples = app_state.get("hotword_samples", [])
+    key = (base_hotword, tuple(samples))
+    if _hotword_cache["key"] != key:
+        _hotword_cache["choices"] = [h.lower() for h in [base_hotword] + list(samples)]
+        _hotword_cache["key"] = key
+    return _hotword_cache["choices"]
+
+_hotword_detector = hotword.HotwordDetector()
+
+def hotword_template_files(app_state):
+    """
+    Nagrane próbki bieżącego hotwordu. Próbki innej frazy (hotword zmieniony po nagraniu)
+    są pomijane – wtedy działa zwykłe dopasowanie tekstu, dopóki nie nagramy nowych.
+    """
+    phrase = app_state.get("hotword_sample_phrase")
+    if phrase is not None and phrase != app_state.get("hotword", "altbind"):
+        return ()
+    return tuple(app_state.get("hotword_sample_files", []))
+
+def add_hotword_sample(app_state, wav_path):
+    """Dopisuje nagraną próbkę do wzorców bieżącego hotwordu (próbki innej frazy usuwa)."""
+    if hotword_template_files(app_state) != tuple(app_state.get("hotword_sample_files", [])):
+        clear_hotword_samples(app_state)
+    app_state.setdefault("hotword_sample_files", []).append(wav_path)
+    app_state["hotword_sample_phrase"] = app_state.get("hotword", "altbind")
+
+def clear_hotword_samples(app_state):
+    """Usuwa nagrane wzorce hotwordu (pliki w HOTWORD_SAMPLES_DIR i wpisy w configu)."""
+    samples_dir = os.path.abspath(HOTWORD_SAMPLES_DIR)
+    for path in app_state.get("hotword_sample_files", []):
+        if os.path.dirname(os.path.abspath(path)) != samples_dir:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    removed = len(app_state.get("hotword_sample_files", []))
+    app_state["hotword_sample_files"] = []
+    app_state.pop("hotword_sample_phrase", None)
+    log.info("hotword", "Usunięto nagrane próbki hotword: %d", removed)
+    return removed
+
+def get_hotword_detector(app_state=None):
+    """Lokalny detektor hotwordu; wzorce przeładowujemy, gdy zmieni się lista nagranych próbek."""
+    app_state = app_state or load_config()
+    sample_files = hotword_template_files(app_state)
+    threshold = app_state.get("hotword_dtw_threshold")
+    if (sample_files != _hotword_detector.template_files
+            or threshold != _hotword_detector.configured_threshold):
+        _hotword_detector.configured_threshold = threshold
+        _hotword_detector.load_templates(sample_files, load_wav)
+    return _hotword_detector
+
+def record_hotword_sample():
+    """
+    Nagrywa jedną próbkę hotwordu, zapisuje ją jako WAV w HOTWORD_SAMPLES_DIR
+    i próbuje ją też rozpoznać. Zwraca (ścieżka_wav, tekst_lub_None) albo (None, None).
+    """
+    app_state = load_config()
+    backend = get_recognizer_backend()
+
+    try:
+        audio = backend.replay_audio()
+        if audio is None:
+            log.info("hotword", "Nagrywam próbkę hotword...")
+            audio = get_audio_session().capture_utterance(energy_threshold=app_state.get("mic_energy_threshold", 250),
+                                                          timeout=5, phrase_time_limit=3)
+    except sr.WaitTimeoutError:
+        log.info("hotword", "Nie wykryto mowy (timeout).")
+        return None, None
+    except audio_pipeline.AudioSourceError as e:
+        log.error("hotword", "%s", e)
+        return None, None
+
+    os.makedirs(HOTWORD_SAMPLES_DIR, exist_ok=True)
+    wav_path = os.path.join(HOTWORD_SAMPLES_DIR, f"hotword_{int(time.time() * 1000)}.wav")
+    with open(wav_path, "wb") as f:
+        f.write(audio.get_wav_data(convert_rate=hotword.SAMPLE_RATE, convert_width=2))
+
+    try:
+        text = backend.recognize(audio)[0]
+    except (sr.UnknownValueError, sr.RequestError):
+        text = None
+    log.info("hotword", "Zapisano próbkę hotword: %s (tekst: %s)", wav_path, text)
+    return wav_path, text
+
+def _on_local_hotword(audio, end_seconds):
+    """Wykryto hotword lokalnie – rozpoznajemy tylko to, co po nim zostało we frazie."""
+    beep()
+    leftover = ""
+    rest = hotword.audio_after(audio, end_seconds)
+    if rest is not None and len(rest.get_raw_data()) >= MIN_LEFTOVER_SECONDS * rest.sample_rate * rest.sample_width:
+        try:
+            with span("recognition.recognize"):
+                leftover = spelled_to_digits(get_recognizer_backend().recognize(rest)[0]).strip()
+        except (sr.UnknownValueError, sr.RequestError):
+            leftover = ""
+    log.debug("hotword_callback", "leftover (lokalnie): '%s'", leftover)
+    if hotword_callback.on_hotword_detected:
+        hotword_callback.on_hotword_detected(leftover)
+
 def hotword_callback(recognizer, audio):
     """
-    Nasłuch w tle: sprawdzamy, czy w rozpoznanym tekście pojawia się hotword,
+    Nasłuch w tle: sprawdzamy, czy fraza zaczyna się od hotwordu,
     jeśli tak – beep i przekazujemy leftover do voice_search.
+    Gdy są nagrane próbki hotwordu, decyzję podejmuje lokalny detektor (MFCC + DTW)
+    i do rozpoznawania mowy trafia wyłącznie dźwięk po hotwordzie.
+    Bez próbek – dotychczasowa ścieżka: rozpoznanie całej frazy i fuzzy match tekstu.
     """
     global voice_search_running
     if voice_search_running:
         return
 
     app_state = load_config()
-    base_hotword = app_state.get("hotword", "altbind")
-    possible_hotwords = [base_hotword] + app_state.get("hotword_samples", [])
+    detector = get_hotword_detector(app_state)
+    if detector.has_templates():
+        with span("hotword.detect"):
+            detected, distance, end_seconds = detector.detect(audio)
+        if detected:
+            log.info("hotword_callback", "Hotword wykryty lokalnie (DTW=%.3f)", distance)
+            _on_local_hotword(audio, end_seconds)
+        return
+
+    possible_hotwords = get_possible_hotwords(app_state)
 
     try:
-        text = recognizer.recognize_google(audio, language="pl-PL")
-        text_lower = text.lower()
-        print(f"[DEBUG][hotword_callback] Rozpoznano: '{text_lower}'")
-        best_match = process.extractOne(text_lower, possible_hotwords, scorer=fuzz.partial_ratio)
-        if best_match:
-            matched_text, score, _ = best_match
-            print(f"[DEBUG][hotword_callback] Najlepsze dopasowanie: '{matched_text}', score={score}")
+        alternatives = [t.lower() for t in recognize_alternatives(recognizer, audio)]
+        log.debug("hotword_callback", "Rozpoznano: %s", alternatives)
+        # Wszystkie hipotezy x wszystkie warianty hotword w jednym wywołaniu
+        scores = process.cdist(alternatives, possible_hotwords, scorer=fuzz.partial_ratio, workers=-1)
+        if scores.size:
+            alt_idx, hot_idx = np.unravel_index(int(np.argmax(scores)), scores.shape)
+            text_lower = alternatives[alt_idx]
+            matched_text = possible_hotwords[hot_idx]
+            score = scores[alt_idx, hot_idx]
+            log.debug("hotword_callback", "Najlepsze dopasowanie: '%s', score=%s", matched_text, score)
             if score >= 80:
-                try:
-                    winsound.Beep(1000, 200)
-                except:
-                    pass
+                beep()
                 leftover = remove_substring_once(text_lower, matched_text).strip()
-                print(f"[DEBUG][hotword_callback] leftover: '{leftover}'")
+                log.debug("hotword_callback", "leftover: '%s'", leftover)
                 if hotword_callback.on_hotword_detected:
                     hotword_callback.on_hotword_detected(leftover)
     except sr.UnknownValueError:
@@ -367,16 +577,65 @@ hotword_callback.on_hotword_detected = voice_search
 # --------------------
 def start_hotword_listening():
     """
-    Uruchamiamy nasłuch w tle (listen_in_background).
+    Uruchamiamy nasłuch w tle na ramkach ze wspólnej sesji audio
+    (ten sam strumień, z którego korzysta push-to-talk – bez ponownego otwierania mikrofonu).
+    Gdy sesja padnie (np. odłączony mikrofon), nasłuch otwiera ją ponownie co
+    AUDIO_RESTART_DELAY_SECONDS, aż się uda albo nasłuch zostanie zatrzymany.
+    Zwraca funkcję zatrzymującą nasłuch i zamykającą sesję.
     """
-    r = sr.Recognizer()
-    app_state = load_config()
-    stored_thr = app_state.get("mic_energy_threshold", 250)
-    r.energy_threshold = stored_thr
-    r.dynamic_energy_threshold = True
-    r.pause_threshold = 1.2
-
-    m = sr.Microphone()
-    print("[DEBUG] Uruchamiam nasłuch w tle.")
-    stop_fn = r.listen_in_background(m, hotword_callback)
+    stop_event = threading.Event()
+    state = {"session": get_audio_session()}
+    state["subscription"] = state["session"].subscribe()
+
+    def resubscribe():
+        state["session"].unsubscribe(state["subscription"])
+        while not stop_event.wait(AUDIO_RESTART_DELAY_SECONDS):
+            try:
+                session = get_audio_session()
+            except Exception as e:
+                log.warning("hotword", "Nie udało się ponownie otworzyć mikrofonu: %s", e)
+                continue
+            state["session"] = session
+            state["subscription"] = session.subscribe()
+            if stop_event.is_set():
+                session.unsubscribe(state["subscription"])
+                return False
+            log.info("hotword", "Wznowiono nasłuch po błędzie mikrofonu.")
+            return True
+        return False
+
+    def listener():
+        frames = iter(state["subscription"])
+        while not stop_event.is_set():
+            threshold = load_config().get("mic_energy_threshold", 250)
+            try:
+                audio = audio_pipeline.capture_utterance(state["session"], energy_threshold=threshold, timeout=None,
+                                                         phrase_time_limit=8, frames=frames)
+            except audio_pipeline.AudioSourceError as e:
+                log.warning("hotword", "%s – próbuję ponownie otworzyć mikrofon.", e)
+                if not resubscribe():
+                    break
+                frames = iter(state["subscription"])
+                continue
+            except sr.WaitTimeoutError:
+                # Strumień się skończył (zamknięta sesja / subskrypcja)
+                break
+            if stop_event.is_set():
+                break
+            try:
+                hotword_callback(None, audio)
+            except Exception as e:
+                log.error("hotword", "Błąd obsługi frazy: %s", e)
+
+    log.info("hotword", "Uruchamiam nasłuch w tle.")
+    thread = threading.Thread(target=listener, daemon=True)
+    thread.start()
+
+    def stop_fn(wait_for_stop=True):
+        stop_event.set()
+        state["session"].unsubscribe(state["subscription"])
+        if wait_for_stop:
+            thread.join(timeout=2.0)
+        close_audio_session()
+
     return stop_fn
@@ -0,0 +1,164 @@
+"""
+Zapis w tle (write-behind) dla drobnych, częstych zmian: uczenie wyborów i podświetlenia wpisów.
+
+Wątek GUI i hooki klawiatury tylko wrzucają zmianę do ograniczonej kolejki (submit) i wracają.
+Osobny wątek zbiera zmiany, łączy kolejne zmiany tego samego klucza w jedną i co
+FLUSH_INTERVAL_SECONDS (albo po MAX_BATCH zmianach) przekazuje paczkę do zarejestrowanego
+handlera danego rodzaju. flush() wymusza zapis i czeka na jego koniec (zamykanie, testy).
+"""
+
+import atexit
+import queue
+import threading
+import time
+
+from instrumentation import log, span
+
+QUEUE_SIZE = 1000
+FLUSH_INTERVAL_SECONDS = 1.0
+MAX_BATCH = 500
+
+_STOP = object()
+
+
+class _FlushRequest:
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class WriteBehindQueue:
+    """
+    Kolejka zmian (rodzaj, klucz, wartość) zapisywanych w tle.
+    Handler rodzaju dostaje listę [(klucz, wartość), ...] po połączeniu powtórzeń;
+    `merge(stara, nowa)` decyduje, jak łączyć wartości (domyślnie wygrywa nowa).
+    """
+
+    def __init__(self, maxsize=QUEUE_SIZE, flush_interval=FLUSH_INTERVAL_SECONDS, max_batch=MAX_BATCH):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._handlers = {}
+        self._pending = {}
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            "submitted": 0,
+            "merged": 0,
+            "blocked": 0,
+            "batches": 0,
+            "written": 0,
+            "errors": 0,
+            "last_flush_ms": 0.0,
+        }
+
+    def register(self, kind, handler, merge=None):
+        self._handlers[kind] = (handler, merge)
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._thread.start()
+        return self
+
+    def submit(self, kind, key, value):
+        """Dodaje zmianę do kolejki. Blokuje tylko, gdy kolejka jest pełna (backpressure)."""
+        if kind not in self._handlers:
+            raise KeyError(f"Brak handlera zapisu dla '{kind}'")
+        self.start()
+        self._count("submitted")
+        try:
+            self._queue.put_nowait((kind, key, value))
+        except queue.Full:
+            self._count("blocked")
+            self._queue.put((kind, key, value))
+
+    def flush(self, timeout=5.0):
+        """Zapisuje wszystkie zmiany przyjęte przed wywołaniem. Zwraca True, jeśli zdążył."""
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        request = _FlushRequest()
+        self._queue.put(request)
+        return request.done.wait(timeout)
+
+    def stop(self, timeout=5.0):
+        """Zapisuje zaległe zmiany i kończy wątek."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def metrics(self):
+        """Kopia liczników (plus bieżąca głębokość kolejki i liczba oczekujących kluczy)."""
+        with self._metrics_lock:
+            data = dict(self._metrics)
+        data["queue_depth"] = self._queue.qsize()
+        data["pending"] = len(self._pending)
+        return data
+
+    def _count(self, name, value=1):
+        with self._metrics_lock:
+            self._metrics[name] += value
+
+    def _run(self):
+        deadline = None
+        while True:
+            wait = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=wait)
+            except queue.Empty:
+                self._write()
+                deadline = None
+                continue
+
+            if item is _STOP:
+                self._write()
+                return
+            if isinstance(item, _FlushRequest):
+                self._write()
+                deadline = None
+                item.done.set()
+                continue
+
+            kind, key, value = item
+            merge = self._handlers[kind][1]
+            pending_key = (kind, key)
+            if pending_key in self._pending:
+                self._count("merged")
+                old = self._pending.pop(pending_key)
+                value = merge(old, value) if merge else value
+            # Przeniesienie na koniec – handler dostaje zmiany w kolejności ostatniej modyfikacji
+            self._pending[pending_key] = value
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+            if len(self._pending) >= self.max_batch:
+                self._write()
+                deadline = None
+
+    def _write(self):
+        if not self._pending:
+            return
+        pending = self._pending
+        self._pending = {}
+        by_kind = {}
+        for (kind, key), value in pending.items():
+            by_kind.setdefault(kind, []).append((key, value))
+
+        start = time.perf_counter()
+        for kind, items in by_kind.items():
+            try:
+                with span(f"write_behind.{kind}"):
+                    self._handlers[kind][0](items)
+                self._count("written", len(items))
+            except Exception as e:
+                self._count("errors")
+                log.error("write_behind", "Błąd zapisu '%s' (%d zmian): %s", kind, len(items), e)
+        with self._metrics_lock:
+            self._metrics["batches"] += 1
+            self._metrics["last_flush_ms"] = (time.perf_counter() - start) * 1000.0
+
+
+writer = WriteBehindQueue()
+atexit.register(writer.stop)